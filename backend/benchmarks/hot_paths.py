@@ -0,0 +1,281 @@
+"""Microbenchmarks for backend hot paths at production-sized data.
+
+Run from ``backend/``::
+
+  python -m benchmarks.hot_paths [--scale 1.0] [--only NAME ...] [--output results.json]
+                                 [--baseline baseline.json] [--tolerance 0.25]
+
+Seeds 10k books, 100k cached clips (index rows and files on disk) and 50k rate-limited clients
+(``--scale`` multiplies every size, so ``--scale 0.01`` is a quick smoke run), then times each
+hot path call by call. Every benchmark reports ops/sec, p50/p99 latency and the peak Python heap
+while it runs (a second, shorter pass under ``tracemalloc`` so tracing does not skew the timings).
+
+``--output`` writes the results as JSON; ``--baseline`` compares against such a file and exits
+non-zero when a benchmark's ops/sec or p50 is more than ``--tolerance`` worse than the baseline.
+Baselines are only comparable on the same machine and ``--scale``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from tts_service.audio_cache import AudioIndex, build_cache_key, resolve_cache_path, sanitize_voice_id  # noqa: E402
+from tts_service.library import LibraryStore  # noqa: E402
+from tts_service.rate_limit import RateLimiter  # noqa: E402
+from tts_service.settings import Settings, get_settings  # noqa: E402
+
+BOOKS = 10_000
+CLIPS = 100_000
+CLIENTS = 50_000
+VOICES = ("en_US-amy-medium", "en_US-ryan-high", "en_GB-alba-medium", "de_DE-thorsten-medium")
+AUTHORS = 400
+
+
+@dataclass
+class Result:
+  name: str
+  ops: int
+  ops_per_sec: float
+  p50_us: float
+  p99_us: float
+  peak_kib: float
+
+
+@dataclass
+class Benchmark:
+  name: str
+  ops: int
+  # Called with the op index; everything it needs is seeded before timing starts.
+  run: Callable[[int], object]
+  # Ops for the traced memory pass; tracemalloc is slow, so fewer than ``ops``.
+  memory_ops: int = 200
+
+
+def _percentile(sorted_ns: List[int], fraction: float) -> float:
+  index = min(len(sorted_ns) - 1, int(round(fraction * (len(sorted_ns) - 1))))
+  return sorted_ns[index] / 1000
+
+
+def measure(benchmark: Benchmark) -> Result:
+  timings: List[int] = []
+  clock = time.perf_counter_ns
+  run = benchmark.run
+  started = clock()
+  for index in range(benchmark.ops):
+    op_started = clock()
+    run(index)
+    timings.append(clock() - op_started)
+  elapsed = (clock() - started) / 1e9
+  timings.sort()
+
+  tracemalloc.start()
+  tracemalloc.reset_peak()
+  baseline_bytes = tracemalloc.get_traced_memory()[0]
+  for index in range(min(benchmark.ops, benchmark.memory_ops)):
+    run(benchmark.ops + index)
+  peak_bytes = tracemalloc.get_traced_memory()[1] - baseline_bytes
+  tracemalloc.stop()
+
+  return Result(
+      name=benchmark.name,
+      ops=benchmark.ops,
+      ops_per_sec=round(benchmark.ops / elapsed, 1) if elapsed else 0.0,
+      p50_us=round(_percentile(timings, 0.50), 2),
+      p99_us=round(_percentile(timings, 0.99), 2),
+      peak_kib=round(max(0, peak_bytes) / 1024, 1),
+  )
+
+
+def _scaled(count: int, scale: float) -> int:
+  return max(10, int(count * scale))
+
+
+def _settings(root: Path) -> Settings:
+  os.environ["MEDIA_DIR"] = str(root / "media")
+  os.environ["BOOKS_DIR"] = str(root / "books")
+  get_settings.cache_clear()
+  return get_settings()
+
+
+def _clip_names(count: int) -> List[str]:
+  return [f"{build_cache_key([str(index)])}-{VOICES[index % len(VOICES)]}.wav" for index in range(count)]
+
+
+def audio_index_benchmarks(settings: Settings, books: int, clips: int) -> Iterator[Benchmark]:
+  index = AudioIndex(settings.audio_index_db)
+  book_ids = [uuid.uuid4().hex for _ in range(books)]
+  names = _clip_names(clips)
+  pairs = [(book_ids[position % books], name) for position, name in enumerate(names)]
+  with index._transaction():
+    index._conn.executemany("INSERT OR IGNORE INTO book_audio (book_id, filename) VALUES (?, ?)", pairs)
+  # A long-running server has seen these pairs through add(), so they are in memory as well.
+  with index._known.lock:
+    for book_id, name in pairs:
+      index._known.add(book_id, name)
+  fresh = _clip_names(clips + 5_000)[clips:]
+
+  yield Benchmark("audio_index.add", 2_000, lambda op: index.add(book_ids[op % books], fresh[op % len(fresh)]))
+  yield Benchmark("audio_index.remove", 2_000, lambda op: index.remove(fresh[op % len(fresh)]))
+  yield Benchmark("audio_index.files_for_book", 5_000, lambda op: index.files_for_book(book_ids[op % books]))
+
+
+def library_benchmarks(settings: Settings, books: int) -> Iterator[Benchmark]:
+  store = LibraryStore(settings)
+  rng = random.Random(7)
+  now = int(time.time())
+  ids: List[str] = []
+  with store._lock, store._write() as rev:
+    for position in range(books):
+      entry = {
+          "id": uuid.uuid4().hex,
+          "title": f"Book {rng.randrange(books * 10):07d}",
+          "author": f"Author {position % AUTHORS}",
+          "filename": f"{uuid.uuid4().hex}.epub",
+          "content_type": "application/epub+zip",
+          "file_size": rng.randrange(100_000, 5_000_000),
+          "added_at": now - books + position,
+          "cover": None,
+          "last_read_location": None,
+      }
+      store._cache(entry, store._write_row(entry, rev))
+      ids.append(entry["id"])
+  first_page = store.query(limit=50, sort="title")
+
+  yield Benchmark("library.query.first_page", 2_000, lambda op: store.query(limit=50))
+  yield Benchmark(
+      "library.query.title_cursor",
+      2_000,
+      lambda op: store.query(limit=50, sort="title", cursor=first_page.next_cursor),
+  )
+  yield Benchmark("library.query.author_filter", 2_000, lambda op: store.query(limit=50, author=f"Author {op % AUTHORS}"))
+  yield Benchmark("library.get_entry", 20_000, lambda op: store.get_entry(ids[op % books]))
+  yield Benchmark(
+      "library.update_book",
+      500,
+      lambda op: store.update_book(ids[op % books], {"last_read_location": {"para": op % 400, "chars": op}}),
+      memory_ops=50,
+  )
+  yield Benchmark("library.changes_since", 2_000, lambda op: store.changes_since(store.revision - 100))
+
+
+def cache_key_benchmarks(settings: Settings) -> Iterator[Benchmark]:
+  texts = [f"Sentence {index} of a chapter, long enough to look like real narration text." for index in range(1_000)]
+
+  def lookup(op: int) -> object:
+    voice = VOICES[op % len(VOICES)]
+    key = build_cache_key([voice, "", "", texts[op % len(texts)]])
+    return resolve_cache_path(settings, f"{key}-{sanitize_voice_id(voice)}.wav")
+
+  yield Benchmark("cache_key.build_and_resolve", 50_000, lookup)
+
+
+def rate_limit_benchmarks(clients: int) -> Iterator[Benchmark]:
+  limiter = RateLimiter(max_requests=1_000_000, window_seconds=60)
+  keys = [f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}" for index in range(clients)]
+  for key in keys:
+    limiter.allow(key)
+  yield Benchmark("rate_limiter.allow", 200_000, lambda op: limiter.allow(keys[op % clients]))
+
+
+def status_benchmarks(settings: Settings, clips: int) -> Iterator[Benchmark]:
+  from tts_service.system import get_system_status, get_usage_counters
+
+  for name in _clip_names(clips):
+    (settings.media_dir / name).write_bytes(b"RIFF")
+  counters = get_usage_counters()
+  counters.reconcile()
+  yield Benchmark("system_status", 5_000, lambda op: get_system_status(settings))
+  yield Benchmark("system_status.reconcile", 5, lambda op: counters.reconcile(), memory_ops=1)
+
+
+def collect(root: Path, scale: float, only: Optional[List[str]] = None) -> Iterator[Benchmark]:
+  settings = _settings(root)
+  books, clips, clients = _scaled(BOOKS, scale), _scaled(CLIPS, scale), _scaled(CLIENTS, scale)
+  groups: Dict[str, Callable[[], Iterator[Benchmark]]] = {
+      "audio_index": lambda: audio_index_benchmarks(settings, books, clips),
+      "library": lambda: library_benchmarks(settings, books),
+      "cache_key": lambda: cache_key_benchmarks(settings),
+      "rate_limiter": lambda: rate_limit_benchmarks(clients),
+      "system_status": lambda: status_benchmarks(settings, clips),
+  }
+  for group, benchmarks in groups.items():
+    # Seeding is the slow part, so skip whole groups that --only rules out.
+    if only and not any(group.startswith(prefix) or prefix.startswith(group) for prefix in only):
+      continue
+    for benchmark in benchmarks():
+      if not only or any(benchmark.name.startswith(prefix) for prefix in only):
+        yield benchmark
+
+
+def compare(results: List[Result], baseline: Dict, tolerance: float) -> List[str]:
+  previous = {entry["name"]: entry for entry in baseline.get("results", [])}
+  regressions = []
+  for result in results:
+    before = previous.get(result.name)
+    if before is None:
+      continue
+    if result.ops_per_sec < before["ops_per_sec"] * (1 - tolerance):
+      regressions.append(f"{result.name}: {result.ops_per_sec:.0f} ops/s vs {before['ops_per_sec']:.0f} baseline")
+    if result.p50_us > before["p50_us"] * (1 + tolerance):
+      regressions.append(f"{result.name}: p50 {result.p50_us:.2f}us vs {before['p50_us']:.2f}us baseline")
+  return regressions
+
+
+def main() -> int:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--scale", type=float, default=1.0, help="multiplier for seeded data sizes")
+  parser.add_argument("--only", nargs="*", help="run benchmarks whose name starts with any of these")
+  parser.add_argument("--output", type=Path, help="write results as JSON")
+  parser.add_argument("--baseline", type=Path, help="compare against a previous --output file")
+  parser.add_argument("--tolerance", type=float, default=0.25, help="allowed fractional slowdown vs baseline")
+  args = parser.parse_args()
+
+  root = Path(tempfile.mkdtemp(prefix="tts-bench-"))
+  results: List[Result] = []
+  try:
+    for benchmark in collect(root, args.scale, args.only):
+      result = measure(benchmark)
+      results.append(result)
+      print(
+          f"{result.name:<32} {result.ops_per_sec:>12,.0f} ops/s  p50 {result.p50_us:>9.2f}us"
+          f"  p99 {result.p99_us:>9.2f}us  peak {result.peak_kib:>9.1f} KiB"
+      )
+  finally:
+    shutil.rmtree(root, ignore_errors=True)
+
+  report = {
+      "scale": args.scale,
+      "python": platform.python_version(),
+      "machine": platform.machine(),
+      "results": [asdict(result) for result in results],
+  }
+  if args.output:
+    args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+  if not args.baseline:
+    return 0
+  baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+  if baseline.get("scale") != args.scale:
+    print(f"warning: baseline was recorded at scale {baseline.get('scale')}, this run used {args.scale}")
+  regressions = compare(results, baseline, args.tolerance)
+  for line in regressions:
+    print(f"REGRESSION {line}")
+  return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,55 @@
+"""Microbenchmark: per-request cost of the rate limiter as the number of distinct clients grows.
+
+Run from ``backend/``::
+
+  python -m benchmarks.rate_limit_bench [--requests 200000] [--max-ratio 2.0]
+
+Each scenario spreads the same number of ``reserve`` calls over N distinct client keys. With
+constant state per key the cost per call should stay flat from 100 to 100k clients; the script
+exits non-zero when the slowest scenario is more than ``--max-ratio`` times the fastest.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from tts_service.rate_limit import RateLimiter  # noqa: E402
+
+CLIENT_COUNTS = (100, 1_000, 10_000, 100_000)
+
+
+def measure(clients: int, requests: int) -> float:
+  limiter = RateLimiter(max_requests=1_000_000, window_seconds=60)
+  keys = [f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}" for index in range(clients)]
+  for key in keys:
+    limiter.reserve(key)
+  rounds = max(1, requests // clients)
+  started = time.perf_counter()
+  for _ in range(rounds):
+    for key in keys:
+      limiter.reserve(key)
+  elapsed = time.perf_counter() - started
+  return elapsed / (rounds * clients) * 1e9
+
+
+def main() -> int:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--requests", type=int, default=200_000)
+  parser.add_argument("--max-ratio", type=float, default=2.0)
+  args = parser.parse_args()
+
+  results = {clients: measure(clients, args.requests) for clients in CLIENT_COUNTS}
+  for clients, ns_per_call in results.items():
+    print(f"{clients:>8} clients  {ns_per_call:8.0f} ns/request")
+  ratio = max(results.values()) / min(results.values())
+  print(f"slowest/fastest ratio: {ratio:.2f}")
+  return 0 if ratio <= args.max_ratio else 1
+
+
+if __name__ == "__main__":
+  sys.exit(main())
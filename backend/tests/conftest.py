@@ -1,5 +1,6 @@
 import importlib
 import sys
+import time
 from pathlib import Path
 
 import pytest
@@ -10,6 +11,16 @@ if str(BACKEND_ROOT) not in sys.path:
   sys.path.insert(0, str(BACKEND_ROOT))
 
 
+def wait_for(predicate, timeout=5.0):
+  """Polls ``predicate`` until it holds or ``timeout`` seconds pass; background work needs this."""
+  deadline = time.monotonic() + timeout
+  while time.monotonic() < deadline:
+    if predicate():
+      return True
+    time.sleep(0.01)
+  return False
+
+
 @pytest.fixture
 def client_builder(monkeypatch, tmp_path):
   def _build(**env_overrides):
@@ -29,10 +40,19 @@ def client_builder(monkeypatch, tmp_path):
 
     module_names = [
         "tts_service.settings",
+        "tts_service.system",
         "tts_service.audio_cache",
+        "tts_service.cache_eviction",
+        "tts_service.piper_pool",
         "tts_service.rate_limit",
+        "tts_service.admission",
         "tts_service.tts",
+        "tts_service.online_proxy",
+        "tts_service.prefetch",
+        "tts_service.render_jobs",
         "tts_service.library",
+        "tts_service.voices",
+        "tts_service.voice_downloads",
         "tts_service.main",
     ]
     for name in module_names:
@@ -46,3 +66,51 @@ def client_builder(monkeypatch, tmp_path):
     return client, media_dir_resolved, books_dir_resolved, main
 
   return _build
+
+
+FAKE_PIPER = '''#!{python}
+import json, os, sys, wave
+
+def log(text):
+  with open(os.environ["FAKE_PIPER_LOG"], "a") as handle:
+    handle.write(f"{{os.getpid()}} {{text}}\\n")
+
+def write(path, text):
+  if text == "crash":
+    sys.exit(3)
+  log(text)
+  with wave.open(path, "wb") as out:
+    out.setnchannels(1)
+    out.setsampwidth(2)
+    out.setframerate(16000)
+    out.writeframes(b"\\x00\\x00" * 1600)
+
+args = sys.argv[1:]
+if "--output_raw" in args:
+  log(sys.stdin.read())
+  for _ in range(4):
+    sys.stdout.buffer.write(b"\\x01\\x00" * 800)
+    sys.stdout.buffer.flush()
+elif "--json-input" in args:
+  if os.environ.get("FAKE_PIPER_NO_POOL"):
+    sys.exit(1)
+  for line in sys.stdin:
+    request = json.loads(line)
+    write(request["output_file"], request["text"])
+    print(request["output_file"], flush=True)
+else:
+  write(args[args.index("--output_file") + 1], sys.stdin.read())
+'''
+
+
+@pytest.fixture
+def fake_piper(tmp_path, monkeypatch):
+  """Executable stand-in for Piper that logs `<pid> <text>` per synthesis."""
+  script = tmp_path / "bin" / "piper"
+  script.parent.mkdir(parents=True, exist_ok=True)
+  script.write_text(FAKE_PIPER.format(python=sys.executable))
+  script.chmod(0o755)
+  log_path = tmp_path / "piper.log"
+  log_path.touch()
+  monkeypatch.setenv("FAKE_PIPER_LOG", str(log_path))
+  return script, log_path
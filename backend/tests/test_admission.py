@@ -0,0 +1,232 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from tts_service import admission
+
+
+def test_controller_queues_then_rejects_with_retry_after():
+  async def scenario():
+    controller = admission.AdmissionController(limit=1, queue_size=1)
+    await controller.acquire()
+    waiter = asyncio.create_task(controller.acquire())
+    await asyncio.sleep(0)
+    assert controller.queued == 1
+    with pytest.raises(HTTPException) as excinfo:
+      await controller.acquire()
+    assert excinfo.value.status_code == 503
+    assert int(excinfo.value.headers["Retry-After"]) >= 1
+
+    controller.release()
+    await asyncio.wait_for(waiter, timeout=1)
+    assert controller.active == 1
+    assert controller.queued == 0
+    controller.release()
+    assert controller.active == 0
+
+  asyncio.run(scenario())
+
+
+def test_cancelled_waiter_gives_up_its_place():
+  async def scenario():
+    controller = admission.AdmissionController(limit=1, queue_size=2)
+    await controller.acquire()
+    waiter = asyncio.create_task(controller.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+      await waiter
+    assert controller.queued == 0
+    controller.release()
+    assert controller.active == 0
+
+  asyncio.run(scenario())
+
+
+def test_abandoned_stream_closes_its_generator_off_the_event_loop(client_builder):
+  _, _, _, main = client_builder()
+  closed_on = []
+
+  def chunks():
+    try:
+      yield b"first"
+      yield b"second"
+    finally:
+      closed_on.append(threading.current_thread())
+
+  async def scenario():
+    controller = admission.AdmissionController(limit=1, queue_size=1)
+    await controller.acquire(1.0)
+    stream = main._admitted_stream(chunks(), controller, 1.0)
+    assert await stream.__anext__() == b"first"
+    await stream.aclose()
+    return controller.active
+
+  assert asyncio.run(scenario()) == 0
+  assert closed_on and closed_on[0] is not threading.main_thread()
+
+
+def test_streaming_cache_lookup_and_budget_charge_run_off_the_event_loop(client_builder, monkeypatch):
+  client, _, _, main = client_builder()
+  on_loop = []
+
+  def off_loop(function):
+    def wrapper(*args):
+      try:
+        asyncio.get_running_loop()
+        on_loop.append(function.__name__)
+      except RuntimeError:
+        pass
+      return function(*args)
+
+    return wrapper
+
+  monkeypatch.setattr(main, "stream_synthesis", off_loop(main.stream_synthesis))
+  monkeypatch.setattr(main, "uncached_chars", off_loop(main.uncached_chars))
+  monkeypatch.setattr(main, "is_cached", off_loop(main.is_cached))
+  payload = {"text": "streamed once", "voice_id": "en_US"}
+  for _ in range(2):
+    assert client.post("/tts", params={"stream": 1}, json=payload).status_code == 200
+  assert client.post("/tts", params={"json": 1}, json={"text": "not streamed", "voice_id": "en_US"}).status_code == 200
+  assert client.post("/tts/batch", json={"items": [{"text": "batched", "voice_id": "en_US"}]}).status_code == 200
+  assert on_loop == []
+
+
+def test_tts_sheds_load_when_queue_full_but_serves_cache_hits(client_builder):
+  client, _, _, main = client_builder(SYNTHESIS_CONCURRENCY="1", SYNTHESIS_QUEUE_SIZE="0")
+  cached = {"text": "already cached", "voice_id": "en_US"}
+  assert client.post("/tts", params={"json": 1}, json=cached).status_code == 200
+
+  controller = main.get_admission_controller()
+  asyncio.run(controller.acquire())
+  try:
+    busy = client.post("/tts", params={"json": 1}, json={"text": "new text", "voice_id": "en_US"})
+    assert busy.status_code == 503
+    assert busy.headers["retry-after"]
+    assert client.post("/tts", params={"json": 1}, json=cached).status_code == 200
+  finally:
+    controller.release()
+  assert client.post("/tts", params={"json": 1}, json={"text": "new text", "voice_id": "en_US"}).status_code == 200
+
+
+def test_async_path_runs_one_shot_piper_subprocess(client_builder, fake_piper):
+  script, log_path = fake_piper
+  client, _, _, _ = client_builder(PIPER_BIN=str(script), PIPER_POOL="0")
+  response = client.post("/tts", params={"json": 1}, json={"text": "async one shot", "voice_id": "en_US"})
+  assert response.status_code == 200
+  assert response.json()["duration_ms"] == 100
+  assert log_path.read_text().split(" ", 1)[1].strip() == "async one shot"
+
+
+def test_backlog_budget_rejects_heavy_work_but_admits_when_idle():
+  async def scenario():
+    controller = admission.AdmissionController(limit=1, queue_size=5, backlog_seconds=10)
+    await controller.acquire(50)
+    controller.release(50)
+    assert controller.backlog == 0
+
+    await controller.acquire(8)
+    with pytest.raises(HTTPException) as excinfo:
+      await controller.acquire(5)
+    assert excinfo.value.detail == "synthesis budget exhausted"
+    light = asyncio.create_task(controller.acquire(1))
+    await asyncio.sleep(0)
+    assert controller.backlog == 9
+    controller.release(8)
+    await asyncio.wait_for(light, timeout=1)
+    controller.release(1)
+    assert controller.backlog == 0
+
+  asyncio.run(scenario())
+
+
+def test_cost_model_learns_per_voice_rate():
+  model = admission.SynthesisCostModel(default_seconds_per_char=0.01, alpha=0.5)
+  assert model.estimate_seconds("en_US", 100) == pytest.approx(1.0)
+  model.record("en_US", 100, 3.0, audio_ms=6000)
+  assert model.estimate_seconds("en_US", 100) == pytest.approx(3.0)
+  model.record("en_US", 100, 1.0, audio_ms=2000)
+  assert model.estimate_seconds("en_US", 100) == pytest.approx(2.0)
+  assert model.estimate_seconds("de_DE", 100) == pytest.approx(1.0)
+  assert model.stats()["en_US"]["rtf"] == pytest.approx(0.5)
+
+
+def test_tts_charges_characters_only_for_synthesis(client_builder):
+  client, _, _, main = client_builder(TTS_CHAR_LIMIT="20")
+  first = {"text": "fifteen chars!!", "voice_id": "en_US"}
+  assert client.post("/tts", params={"json": 1}, json=first).status_code == 200
+  assert client.post("/tts", params={"json": 1}, json=first).status_code == 200
+  heavy = client.post("/tts", params={"json": 1}, json={"text": "another fifteen", "voice_id": "en_US"})
+  assert heavy.status_code == 429
+  assert int(heavy.headers["retry-after"]) >= 1
+  batch = client.post("/tts/batch", json={"items": [first, {"text": "x" * 10, "voice_id": "en_US"}]})
+  assert batch.status_code == 429
+  assert "en_US" in client.get("/readyz").json()["synthesis_costs"]
+
+
+def test_shed_requests_do_not_spend_the_character_budget(client_builder):
+  client, _, _, main = client_builder(SYNTHESIS_CONCURRENCY="1", SYNTHESIS_QUEUE_SIZE="0", TTS_CHAR_LIMIT="20")
+  payload = {"text": "fifteen chars!!", "voice_id": "en_US"}
+  controller = main.get_admission_controller()
+  asyncio.run(controller.acquire())
+  try:
+    for params in ({"json": 1}, {"stream": 1}):
+      assert client.post("/tts", params=params, json=payload).status_code == 503
+    assert client.post("/tts/batch", json={"items": [payload]}).status_code == 503
+  finally:
+    controller.release()
+  assert client.post("/tts", params={"json": 1}, json=payload).status_code == 200
+
+
+def test_streamed_batch_checks_the_budget_up_front_and_reports_shed_items(client_builder):
+  client, _, _, main = client_builder(SYNTHESIS_CONCURRENCY="1", SYNTHESIS_QUEUE_SIZE="0", TTS_CHAR_LIMIT="20")
+  cached = {"text": "cached", "voice_id": "en_US"}
+  assert client.post("/tts", params={"json": 1}, json=cached).status_code == 200
+  too_much = [{"text": "fifteen chars!!", "voice_id": "en_US"}, {"text": "x" * 10, "voice_id": "en_US"}]
+  assert client.post("/tts/batch", params={"stream": 1}, json={"items": too_much}).status_code == 429
+
+  controller = main.get_admission_controller()
+  asyncio.run(controller.acquire())
+  try:
+    response = client.post("/tts/batch", params={"stream": 1}, json={"items": [cached, {"text": "new", "voice_id": "en_US"}]})
+  finally:
+    controller.release()
+  assert response.status_code == 200
+  lines = [json.loads(line) for line in response.text.splitlines()]
+  assert lines[0]["index"] == 0 and lines[0]["audio_url"].startswith("/media/")
+  assert lines[1] == {"index": 1, "error": "synthesis queue full", "status": 503}
+
+
+def test_upload_bytes_charged_before_body_is_read(client_builder):
+  client, _, books_dir, _ = client_builder(UPLOAD_BYTE_LIMIT="3000")
+  files = {"file": ("story.txt", b"x" * 1500, "text/plain")}
+  assert client.post("/library/upload", files=files).status_code == 200
+  second = client.post("/library/upload", files={"file": ("other.txt", b"y" * 1500, "text/plain")})
+  assert second.status_code == 429
+  assert len(list(books_dir.glob("*.txt"))) == 1
+
+
+def test_chunked_upload_bytes_are_charged_as_they_stream(client_builder):
+  client, _, books_dir, _ = client_builder(UPLOAD_BYTE_LIMIT="3000")
+  boundary = "paperread-boundary"
+
+  def upload(name, body):
+    parts = [
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{name}\"\r\n".encode(),
+        b"Content-Type: text/plain\r\n\r\n",
+        body,
+        f"\r\n--{boundary}--\r\n".encode(),
+    ]
+    # A generator body is sent chunked, without a Content-Length to charge up front.
+    return client.post(
+        "/library/upload",
+        content=iter(parts),
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+    )
+
+  assert upload("story.txt", b"x" * 1500).status_code == 200
+  assert upload("other.txt", b"y" * 1500).status_code == 429
+  assert len(list(books_dir.glob("*.txt"))) == 1
@@ -0,0 +1,98 @@
+import io
+import math
+import struct
+import wave
+from array import array
+
+import pytest
+
+from tts_service import audio_codec
+
+
+@pytest.fixture
+def no_ffmpeg(monkeypatch):
+  monkeypatch.setattr(audio_codec, "_ffmpeg", lambda: None)
+  monkeypatch.setattr(audio_codec, "_ffmpeg_has_libopus", lambda: False)
+
+
+def _wav_bytes(samples, channels=1, framerate=22050):
+  buffer = io.BytesIO()
+  with wave.open(buffer, "wb") as wav_file:
+    wav_file.setnchannels(channels)
+    wav_file.setsampwidth(2)
+    wav_file.setframerate(framerate)
+    wav_file.writeframes(array("h", samples).tobytes())
+  return buffer.getvalue()
+
+
+@pytest.mark.parametrize("channels", [1, 2])
+def test_builtin_flac_round_trips_losslessly(tmp_path, channels):
+  samples = [int(9000 * math.sin(i / 17.0)) + (i * 7919) % 301 - 150 for i in range(9000 * channels)]
+  wav = _wav_bytes(samples, channels=channels)
+  encoded = audio_codec.flac_encode(wav)
+  assert encoded[:4] == b"fLaC"
+  assert len(encoded) < len(wav)
+  assert audio_codec.flac_decode(encoded) == wav
+
+  flac_path = tmp_path / "clip.flac"
+  flac_path.write_bytes(encoded)
+  assert audio_codec.read_duration_ms(flac_path) == int(9000 / 22050 * 1000)
+
+
+def test_opus_duration_reads_last_granule(tmp_path):
+  head = b"OggS" + bytes(24) + b"OpusHead" + bytes([1, 1]) + struct.pack("<H", 312) + bytes(10)
+  last_page = b"OggS" + bytes([0, 4]) + struct.pack("<Q", 312 + 48000 * 2) + bytes(16)
+  opus_path = tmp_path / "clip.opus"
+  opus_path.write_bytes(head + bytes(100) + last_page)
+  assert audio_codec.read_duration_ms(opus_path) == 2000
+
+
+def test_mp3_duration_uses_xing_frames_or_cbr_estimate(tmp_path):
+  header = bytes([0xFF, 0xFB, 0x90, 0x44])  # MPEG-1 layer III, 128 kbps, 44.1 kHz, joint stereo
+  id3 = b"ID3" + bytes([4, 0, 0, 0, 0, 0, 20]) + bytes(20)
+  cbr_path = tmp_path / "cbr.mp3"
+  cbr_path.write_bytes(id3 + (header + bytes(413)) * 10)
+  assert audio_codec.read_duration_ms(cbr_path) == int(4170 * 8 / 128000 * 1000)
+
+  xing_path = tmp_path / "vbr.mp3"
+  xing_path.write_bytes(header + bytes(32) + b"Xing" + struct.pack(">II", 1, 100) + bytes(400))
+  assert audio_codec.read_duration_ms(xing_path) == int(100 * 1152 / 44100 * 1000)
+
+
+def test_negotiate_prefers_stored_format_unless_asked(no_ffmpeg):
+  assert audio_codec.negotiate_format(None, None, "flac") == "flac"
+  assert audio_codec.negotiate_format("*/*", None, "flac") == "flac"
+  assert audio_codec.negotiate_format("audio/wav", None, "flac") == "wav"
+  assert audio_codec.negotiate_format("audio/wav;q=0.5, audio/flac", None, "wav") == "flac"
+  assert audio_codec.negotiate_format("audio/ogg", None, "wav") == "wav"
+  assert audio_codec.negotiate_format(None, "wav", "flac") == "wav"
+  assert audio_codec.negotiate_format(None, "opus", "flac") is None
+
+
+def test_flac_cache_reports_duration_and_negotiates_response(client_builder, no_ffmpeg):
+  client, media_dir, _, _ = client_builder(AUDIO_CACHE_FORMAT="opus")
+  payload = {"text": "compressed", "voice_id": "en_US"}
+  body = client.post("/tts", params={"json": 1}, json=payload).json()
+  assert body["audio_url"].endswith(".flac")
+  assert body["duration_ms"] == 500
+  filename = body["audio_url"].split("/media/")[-1]
+  assert (media_dir / filename).read_bytes()[:4] == b"fLaC"
+  assert not list(media_dir.glob("*.wav"))
+
+  default = client.post("/tts", json=payload)
+  assert default.headers["content-type"] == "audio/flac"
+  as_wav = client.post("/tts", json=payload, headers={"Accept": "audio/wav"})
+  assert as_wav.headers["content-type"] == "audio/wav"
+  with wave.open(io.BytesIO(as_wav.content), "rb") as wav_file:
+    assert wav_file.getnframes() == 11025
+  assert client.post("/tts", params={"format": "opus"}, json=payload).status_code == 406
+
+
+def test_stream_into_flac_cache_still_sends_wav(client_builder, no_ffmpeg):
+  client, media_dir, _, _ = client_builder(AUDIO_CACHE_FORMAT="flac")
+  payload = {"text": "stream compressed", "voice_id": "en_US"}
+  response = client.post("/tts", params={"stream": 1}, json=payload)
+  assert response.content[:4] == b"RIFF"
+  filename = response.headers["x-audio-url"].split("/media/")[-1]
+  decoded = audio_codec.flac_decode((media_dir / filename).read_bytes())
+  assert decoded[44:] == response.content[44:]
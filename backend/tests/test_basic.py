@@ -1,6 +1,9 @@
+import asyncio
 import json
-
-import httpx
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
 
 from tts_service.tts import _voice_model_path
 
@@ -28,9 +31,50 @@ def test_tts_json_response_tracks_audio_index(client_builder):
   assert response.status_code == 200
   body = response.json()
   assert body["audio_url"].startswith("/media/")
-  index_path = main.get_settings().audio_index_file
-  data = json.loads(index_path.read_text())
-  assert data["by_book"]["book-1"]
+  from tts_service import audio_cache
+
+  filename = body["audio_url"].split("/media/")[-1]
+  assert audio_cache.get_audio_index().files_for_book("book-1") == [filename]
+  assert audio_cache.get_audio_index().books_for_file(filename) == ["book-1"]
+
+
+def test_audio_index_migrates_legacy_json_once(client_builder, tmp_path):
+  media_dir = tmp_path / "media"
+  media_dir.mkdir()
+  legacy = {"by_book": {"book-1": ["aaaaaaaaaaaa-en_US.wav", "bbbbbbbbbbbb-en_US.wav"], "book-2": ["aaaaaaaaaaaa-en_US.wav"]}}
+  (media_dir / "audio_index.json").write_text(json.dumps(legacy))
+  client, media_dir, _, main = client_builder()
+  from tts_service import audio_cache
+
+  index = audio_cache.get_audio_index()
+  assert index.files_for_book("book-1") == ["aaaaaaaaaaaa-en_US.wav", "bbbbbbbbbbbb-en_US.wav"]
+  assert index.books_for_file("aaaaaaaaaaaa-en_US.wav") == ["book-1", "book-2"]
+  assert not (media_dir / "audio_index.json").exists()
+  assert (media_dir / "audio_index.json.migrated").exists()
+
+  index.remove("aaaaaaaaaaaa-en_US.wav")
+  assert index.pop_files_for_book("book-1") == ["bbbbbbbbbbbb-en_US.wav"]
+  assert index.books_by_file() == {}
+
+
+def test_audio_index_remembers_a_bounded_set_of_pairs(tmp_path):
+  from tts_service import audio_cache
+
+  index = audio_cache.AudioIndex(tmp_path / "audio_index.db", known_limit=3)
+  for book_id, filename in [("b1", "a.wav"), ("b2", "a.wav"), ("b1", "b.wav"), ("b1", "a.wav"), ("b3", "c.wav")]:
+    index.add(book_id, filename)
+  # ("b2", "a.wav") was least recently used and dropped from memory, not from the database.
+  assert len(index._known) == 3 and not index._known.hit("b2", "a.wav")
+  assert index.books_for_file("a.wav") == ["b1", "b2"]
+
+  index.remove("a.wav")
+  assert len(index._known) == 2
+  index.add("b1", "a.wav")
+  assert index.books_for_file("a.wav") == ["b1"]
+  assert index.pop_files_for_book("b1") == ["a.wav", "b.wav"]
+  assert len(index._known) == 1
+  index.add("b1", "b.wav")
+  assert index.files_for_book("b1") == ["b.wav"]
 
 
 def test_tts_rate_limit(client_builder):
@@ -39,6 +83,7 @@ def test_tts_rate_limit(client_builder):
   assert client.post("/tts", json=payload).status_code == 200
   second = client.post("/tts", json=payload)
   assert second.status_code == 429
+  assert 55 <= int(second.headers["retry-after"]) <= 60
 
 
 def test_delete_cache_entry_removes_file(client_builder):
@@ -61,38 +106,6 @@ def test_online_tts_disabled_without_flag(client_builder):
   assert response.status_code == 503
 
 
-def test_online_tts_forwarding_success(client_builder, monkeypatch):
-  class DummyClient:
-    def __init__(self):
-      self.called = False
-      self.url = None
-
-    def __enter__(self):
-      return self
-
-    def __exit__(self, exc_type, exc, tb):
-      return False
-
-    def post(self, url, json, headers):
-      self.called = True
-      self.url = url
-      return httpx.Response(200, json={"audio_url": "https://cdn/audio.wav", "duration_ms": 1234})
-
-  dummy = DummyClient()
-  monkeypatch.setattr("tts_service.tts.httpx.Client", lambda *args, **kwargs: dummy)
-  client, _, _, _ = client_builder(
-      ENABLE_ONLINE_PROXY="1",
-      ONLINE_TTS_BASE_URL="https://api.example.com",
-      ONLINE_TTS_API_KEY="secret",
-  )
-  payload = {"text": "hi", "voice_id": "en"}
-  response = client.post("/tts/generate", json=payload)
-  assert response.status_code == 200
-  assert response.json()["audio_url"].startswith("https://cdn")
-  assert dummy.called
-  assert dummy.url == "https://api.example.com/tts/generate"
-
-
 def test_voice_alias_maps_to_model_path(client_builder, tmp_path):
   voices_dir = tmp_path / "voices"
   voices_dir.mkdir()
@@ -103,3 +116,129 @@ def test_voice_alias_maps_to_model_path(client_builder, tmp_path):
   resolved = _voice_model_path(settings, "zh_CN_female")
   assert str(voices_dir) in resolved
   assert resolved.endswith("zh-cn-huayan.onnx")
+
+
+def test_concurrent_identical_requests_synthesize_once(client_builder, monkeypatch):
+  _, media_dir, _, main = client_builder()
+  import tts_service.tts as tts
+
+  calls = []
+  gate = threading.Event()
+  original = tts._run_piper
+
+  def slow_run_piper(settings, payload, output_path):
+    calls.append(payload.text)
+    gate.wait(timeout=5)
+    return original(settings, payload, output_path)
+
+  monkeypatch.setattr(tts, "_run_piper", slow_run_piper)
+  payload = tts.TTSRequest(text="same paragraph", voice_id="en_US", book_id="book-1")
+  settings = main.get_settings()
+  with ThreadPoolExecutor(max_workers=4) as pool:
+    futures = [pool.submit(tts.synthesize, settings, payload) for _ in range(4)]
+    time.sleep(0.2)
+    gate.set()
+    results = [future.result() for future in futures]
+
+  assert calls == ["same paragraph"]
+  assert len({result.filename for result in results}) == 1
+  assert all(result.duration_ms == 500 for result in results)
+  assert not list(media_dir.glob("*.tmp"))
+
+
+def test_tts_batch_returns_results_in_order(client_builder):
+  client, media_dir, _, _ = client_builder()
+  cached = client.post("/tts", params={"json": 1}, json={"text": "second", "voice_id": "en_US"}).json()
+  items = [{"text": text, "voice_id": "en_US", "book_id": "book-1"} for text in ("first", "second", "third", "first")]
+  response = client.post("/tts/batch", json={"items": items})
+  assert response.status_code == 200
+  results = response.json()["results"]
+  assert [item["index"] for item in results] == [0, 1, 2, 3]
+  assert results[1]["audio_url"] == cached["audio_url"]
+  assert results[0]["audio_url"] == results[3]["audio_url"]
+  assert len({item["audio_url"] for item in results}) == 3
+  assert all((media_dir / item["audio_url"].split("/media/")[-1]).exists() for item in results)
+
+
+def test_tts_batch_stream_emits_ndjson_lines(client_builder):
+  client, _, _, _ = client_builder()
+  items = [{"text": f"chunk {n}", "voice_id": "en_US"} for n in range(3)]
+  response = client.post("/tts/batch", params={"stream": 1}, json={"items": items})
+  assert response.status_code == 200
+  assert response.headers["content-type"].startswith("application/x-ndjson")
+  lines = [json.loads(line) for line in response.text.splitlines()]
+  assert sorted(line["index"] for line in lines) == [0, 1, 2]
+  assert all(line["duration_ms"] == 500 for line in lines)
+
+
+def test_tts_batch_enforces_item_limit(client_builder):
+  client, _, _, _ = client_builder(MAX_BATCH_ITEMS="2")
+  items = [{"text": "x", "voice_id": "en_US"}] * 3
+  assert client.post("/tts/batch", json={"items": items}).status_code == 413
+
+
+def test_tts_stream_sends_header_then_pcm_and_caches(client_builder, fake_piper):
+  script, log_path = fake_piper
+  client, media_dir, _, _ = client_builder(PIPER_BIN=str(script))
+  payload = {"text": "stream me", "voice_id": "en_US", "book_id": "book-1"}
+  response = client.post("/tts", params={"stream": 1}, json=payload)
+  assert response.status_code == 200
+  assert response.headers["content-type"] == "audio/wav"
+  assert response.content[:4] == b"RIFF"
+  assert len(response.content) == 44 + 4 * 1600
+
+  filename = response.headers["x-audio-url"].split("/media/")[-1]
+  with wave.open(str(media_dir / filename), "rb") as cached:
+    assert cached.getframerate() == 22050
+    assert cached.getnframes() == 4 * 800
+  assert (media_dir / filename).read_bytes()[44:] == response.content[44:]
+
+  again = client.post("/tts", params={"json": 1}, json=payload)
+  assert again.json()["audio_url"].endswith(filename)
+  assert len(log_path.read_text().splitlines()) == 1
+
+
+def test_tts_stream_without_piper_streams_stub(client_builder):
+  client, media_dir, _, _ = client_builder()
+  response = client.post("/tts", params={"stream": 1}, json={"text": "stub", "voice_id": "en_US"})
+  assert response.status_code == 200
+  filename = response.headers["x-audio-url"].split("/media/")[-1]
+  assert (media_dir / filename).read_bytes()[44:] == response.content[44:]
+
+
+def test_tts_stream_that_finds_audio_cached_still_indexes_it(client_builder):
+  client_builder()
+  from tts_service import audio_cache, tts
+  from tts_service.settings import get_settings
+
+  settings = get_settings()
+  streamed = tts.TTSRequest(text="raced", voice_id="en_US", book_id="book-2")
+  stream = tts.stream_synthesis(settings, streamed)
+  assert not stream.cached
+  # Another request finishes the same audio before this stream starts producing it.
+  tts.synthesize(settings, streamed.model_copy(update={"book_id": "book-1"}))
+  assert b"".join(stream.chunks)[:4] == b"RIFF"
+  assert audio_cache.get_audio_index().books_for_file(stream.filename) == ["book-1", "book-2"]
+
+
+def test_concurrent_async_requests_share_one_synthesis(client_builder, monkeypatch):
+  _, _, _, main = client_builder()
+  import tts_service.tts as tts
+
+  calls = []
+  original = tts._run_piper
+
+  def slow_run_piper(settings, payload, output_path):
+    calls.append(payload.text)
+    time.sleep(0.1)
+    return original(settings, payload, output_path)
+
+  monkeypatch.setattr(tts, "_run_piper", slow_run_piper)
+  payload = tts.TTSRequest(text="shared async", voice_id="en_US")
+
+  async def scenario():
+    return await asyncio.gather(*(tts.synthesize_async(main.get_settings(), payload) for _ in range(3)))
+
+  results = asyncio.run(scenario())
+  assert calls == ["shared async"]
+  assert {result.duration_ms for result in results} == {500}
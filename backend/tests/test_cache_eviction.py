@@ -0,0 +1,118 @@
+import time
+
+from tts_service import audio_cache, cache_eviction
+
+
+class FakeClock:
+  def __init__(self):
+    self.now = 1_000.0
+
+  def __call__(self):
+    return self.now
+
+
+def _evictor(tmp_path, clock, **limits):
+  media_dir = tmp_path / "media"
+  media_dir.mkdir()
+  index = audio_cache.AudioIndex(media_dir / "audio_index.db")
+  limits.setdefault("max_bytes", 0)
+  limits.setdefault("max_entries", 0)
+  evictor = cache_eviction.CacheEvictor(media_dir, index, grace_seconds=5, low_water=1.0, clock=clock, background=False, **limits)
+  evictor._scanned = True
+  return evictor, media_dir, index
+
+
+def _add(evictor, media_dir, clock, filename, book_id=None, size=100):
+  (media_dir / filename).write_bytes(b"x" * size)
+  if book_id:
+    evictor.audio_index.add(book_id, filename)
+  evictor.record_access(filename, book_id)
+  clock.now += 10
+
+
+def test_lru_evicts_oldest_and_updates_index(tmp_path):
+  clock = FakeClock()
+  evictor, media_dir, index = _evictor(tmp_path, clock, max_bytes=250)
+  _add(evictor, media_dir, clock, "aaaaaaaaaaaa-v.wav", "book-1")
+  _add(evictor, media_dir, clock, "bbbbbbbbbbbb-v.wav", "book-1")
+  evictor.record_access("aaaaaaaaaaaa-v.wav")
+  clock.now += 10
+  _add(evictor, media_dir, clock, "cccccccccccc-v.wav", "book-1")
+
+  assert evictor.run_once() == ["bbbbbbbbbbbb-v.wav"]
+  assert not (media_dir / "bbbbbbbbbbbb-v.wav").exists()
+  assert index.books_by_file() == {"aaaaaaaaaaaa-v.wav": ["book-1"], "cccccccccccc-v.wav": ["book-1"]}
+  assert evictor.stats()["bytes"] == 200
+
+
+def test_lfu_keeps_hot_entries(tmp_path):
+  clock = FakeClock()
+  evictor, media_dir, _ = _evictor(tmp_path, clock, max_entries=2, policy="lfu")
+  _add(evictor, media_dir, clock, "aaaaaaaaaaaa-v.wav")
+  for _ in range(3):
+    evictor.record_access("aaaaaaaaaaaa-v.wav")
+  _add(evictor, media_dir, clock, "bbbbbbbbbbbb-v.wav")
+  _add(evictor, media_dir, clock, "cccccccccccc-v.wav")
+  evictor.record_access("cccccccccccc-v.wav")
+  clock.now += 10
+  assert evictor.run_once() == ["bbbbbbbbbbbb-v.wav"]
+
+
+def test_files_of_recently_read_books_go_last(tmp_path):
+  clock = FakeClock()
+  evictor, media_dir, _ = _evictor(tmp_path, clock, max_entries=1, book_idle_seconds=3600)
+  _add(evictor, media_dir, clock, "aaaaaaaaaaaa-v.wav", "reading")
+  _add(evictor, media_dir, clock, "bbbbbbbbbbbb-v.wav", "shelved")
+  clock.now += 7200
+  evictor.touch_book("reading")
+  assert evictor.run_once() == ["bbbbbbbbbbbb-v.wav"]
+
+
+def test_grace_period_protects_fresh_files(tmp_path):
+  clock = FakeClock()
+  evictor, media_dir, _ = _evictor(tmp_path, clock, max_entries=1)
+  (media_dir / "aaaaaaaaaaaa-v.wav").write_bytes(b"x")
+  (media_dir / "bbbbbbbbbbbb-v.wav").write_bytes(b"x")
+  evictor.record_access("aaaaaaaaaaaa-v.wav")
+  evictor.record_access("bbbbbbbbbbbb-v.wav")
+  assert evictor.run_once() == []
+
+
+def test_derived_entries_go_first_and_expire_when_idle(tmp_path):
+  clock = FakeClock()
+  evictor, media_dir, _ = _evictor(tmp_path, clock, max_entries=2, derived_ttl_seconds=60)
+  _add(evictor, media_dir, clock, "aaaaaaaaaaaa-v.wav")
+  (media_dir / "bbbbbbbbbbbb-v.wav").write_bytes(b"x" * 100)
+  evictor.record_access("bbbbbbbbbbbb-v.wav", derived=True)
+  clock.now += 10
+  evictor.record_access("bbbbbbbbbbbb-v.wav")
+  _add(evictor, media_dir, clock, "cccccccccccc-v.wav")
+  assert evictor.run_once() == ["bbbbbbbbbbbb-v.wav"]
+
+  (tmp_path / "unbounded").mkdir()
+  unbounded, unbounded_dir, _ = _evictor(tmp_path / "unbounded", clock, derived_ttl_seconds=60)
+  (unbounded_dir / "dddddddddddd-v.wav").write_bytes(b"x")
+  unbounded.record_access("dddddddddddd-v.wav", derived=True)
+  _add(unbounded, unbounded_dir, clock, "eeeeeeeeeeee-v.wav")
+  assert unbounded.run_once() == []
+  clock.now += 60
+  assert unbounded.run_once() == ["dddddddddddd-v.wav"]
+  assert (unbounded_dir / "eeeeeeeeeeee-v.wav").exists()
+
+
+def test_background_eviction_bounds_media_dir(client_builder):
+  client, media_dir, _, main = client_builder(AUDIO_CACHE_MAX_ENTRIES="2")
+  (media_dir / "0123456789ab-en_US.wav").write_bytes(b"old entry from a previous run")
+  evictor = main.get_cache_evictor()
+  evictor.grace_seconds = 0
+  for text in ("one", "two", "three"):
+    assert client.post("/tts", params={"json": 1}, json={"text": text, "voice_id": "en_US", "book_id": "b"}).status_code == 200
+
+  deadline = time.monotonic() + 5
+  while len(list(media_dir.glob("*.wav"))) > 2 and time.monotonic() < deadline:
+    time.sleep(0.02)
+  assert len(list(media_dir.glob("*.wav"))) == 2
+  assert not (media_dir / "0123456789ab-en_US.wav").exists()
+  indexed = main.get_cache_evictor().audio_index.books_by_file()
+  assert sorted(indexed) == sorted(path.name for path in media_dir.glob("*.wav"))
+  assert client.get("/readyz").json()["audio_cache"]["entries"] == 2
@@ -1,3 +1,5 @@
+import json
+
 
 def _upload_sample(client, content: bytes, filename: str = "story.txt"):
   response = client.post(
@@ -65,3 +67,111 @@ def test_upload_respects_size_limit(client_builder):
       files={"file": ("big.epub", b"x" * 20, "application/epub+zip")},
   )
   assert response.status_code == 413
+
+
+def test_library_migrates_legacy_json(client_builder, tmp_path):
+  books_dir = tmp_path / "books"
+  books_dir.mkdir()
+  (books_dir / "abc.txt").write_bytes(b"legacy")
+  legacy = [{"id": "old-1", "title": "Legacy", "author": "A", "filename": "abc.txt", "content_type": "text/plain",
+             "file_size": 6, "added_at": 1, "cover": None, "last_read_location": {"para": 1, "chars": 2}}]
+  (books_dir / "library.json").write_text(json.dumps(legacy))
+  client, _, _, main = client_builder()
+  assert client.get("/library").json() == legacy
+  assert client.get("/library/old-1").content == b"legacy"
+  assert (books_dir / "library.json.migrated").exists()
+
+  client.patch("/library/old-1", json={"title": "Renamed"})
+  main.get_library_store.cache_clear()
+  assert client.get("/library").json()[0]["title"] == "Renamed"
+
+
+def test_deleting_duplicate_upload_keeps_shared_file(client_builder):
+  client, _, books_dir, _ = client_builder()
+  first = _upload_sample(client, b"Same bytes")
+  second = _upload_sample(client, b"Same bytes")
+  assert first["filename"] == second["filename"]
+  assert client.delete(f"/library/{first['id']}").status_code == 200
+  assert (books_dir / second["filename"]).exists()
+  assert client.get(f"/library/{second['id']}").content == b"Same bytes"
+  client.delete(f"/library/{second['id']}")
+  assert not (books_dir / second["filename"]).exists()
+
+
+def test_library_paginates_filters_and_projects(client_builder):
+  client, _, _, _ = client_builder()
+  for index, (title, author) in enumerate([("Beta", "Ann"), ("alpha", "Bob"), ("Gamma", "ann"), ("Alpine", "Ann")]):
+    _upload_sample(client, f"book {index}".encode())
+    book_id = client.get("/library").json()[-1]["id"]
+    client.patch(f"/library/{book_id}", json={"title": title, "author": author})
+
+  first = client.get("/library", params={"limit": 2, "sort": "title", "fields": "title"})
+  assert [entry["title"] for entry in first.json()] == ["alpha", "Alpine"]
+  assert set(first.json()[0]) == {"id", "title"}
+  cursor = first.headers["x-next-cursor"]
+  second = client.get("/library", params={"limit": 2, "sort": "title", "fields": "title", "cursor": cursor})
+  assert [entry["title"] for entry in second.json()] == ["Beta", "Gamma"]
+  assert "x-next-cursor" not in second.headers
+
+  newest = client.get("/library", params={"sort": "title", "order": "desc", "author": "ANN", "limit": 1})
+  assert [entry["title"] for entry in newest.json()] == ["Gamma"]
+  rest = client.get("/library", params={"sort": "title", "order": "desc", "author": "ANN", "cursor": newest.headers["x-next-cursor"]})
+  assert [entry["title"] for entry in rest.json()] == ["Beta", "Alpine"]
+
+  assert [entry["title"] for entry in client.get("/library", params={"title_prefix": "al", "sort": "title"}).json()] == ["alpha", "Alpine"]
+  assert client.get("/library", params={"added_before": 0}).json() == []
+  assert client.get("/library", params={"cursor": cursor, "sort": "added_at"}).status_code == 400
+  assert client.get("/library", params={"sort": "cover"}).status_code == 400
+
+
+def test_library_etag_tracks_revision(client_builder):
+  client, _, _, _ = client_builder()
+  entry = _upload_sample(client, b"Versioned")
+  listing = client.get("/library")
+  etag = listing.headers["etag"]
+  cached = client.get("/library", headers={"If-None-Match": etag})
+  assert cached.status_code == 304
+  assert cached.content == b""
+
+  client.patch(f"/library/{entry['id']}", json={"last_read_location": {"para": 1, "chars": 0}})
+  changed = client.get("/library", headers={"If-None-Match": etag})
+  assert changed.status_code == 200
+  assert changed.headers["etag"] != etag
+
+
+def test_change_feed_returns_only_deltas(client_builder):
+  client, _, _, main = client_builder()
+  first = _upload_sample(client, b"first book")
+  second = _upload_sample(client, b"second book")
+  start = client.get("/library/changes").json()
+  assert start["reset"] is False
+  assert [entry["id"] for entry in start["changed"]] == [first["id"], second["id"]]
+  since = start["revision"]
+
+  assert client.get("/library/changes", params={"since": since}).json()["changed"] == []
+  client.patch(f"/library/{first['id']}", json={"last_read_location": {"para": 2, "chars": 5}})
+  client.delete(f"/library/{second['id']}")
+  delta = client.get("/library/changes", params={"since": since}).json()
+  assert [entry["id"] for entry in delta["changed"]] == [first["id"]]
+  assert delta["changed"][0]["last_read_location"] == {"para": 2, "chars": 5}
+  assert delta["deleted"] == [second["id"]]
+  assert delta["revision"] == since + 2
+
+  ahead = client.get("/library/changes", params={"since": delta["revision"] + 10}).json()
+  assert ahead["reset"] is True
+
+
+def test_change_feed_compacts_old_tombstones(client_builder):
+  client, _, _, main = client_builder(LIBRARY_TOMBSTONE_DAYS="0")
+  doomed = _upload_sample(client, b"short lived")
+  kept = _upload_sample(client, b"long lived")
+  since = client.get("/library/changes").json()["revision"]
+  client.delete(f"/library/{doomed['id']}")
+  other = _upload_sample(client, b"another")
+  client.delete(f"/library/{other['id']}")
+
+  store = main.get_library_store()
+  assert store.compacted_revision > since
+  stale = client.get("/library/changes", params={"since": since}).json()
+  assert stale["reset"] is True
+  assert [entry["id"] for entry in stale["changed"]] == [kept["id"]]
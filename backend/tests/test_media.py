@@ -0,0 +1,79 @@
+import pytest
+
+from tts_service import media
+
+
+def _cached_audio(client, media_dir, text="media route"):
+  body = client.post("/tts", params={"json": 1}, json={"text": text, "voice_id": "en_US"}).json()
+  filename = body["audio_url"].split("/media/")[-1]
+  return filename, (media_dir / filename).read_bytes()
+
+
+def test_media_route_serves_cached_audio_with_validators(client_builder):
+  client, media_dir, _, _ = client_builder()
+  filename, content = _cached_audio(client, media_dir)
+  response = client.get(f"/media/{filename}")
+  assert response.status_code == 200
+  assert response.content == content
+  assert response.headers["content-type"] == "audio/wav"
+  assert response.headers["accept-ranges"] == "bytes"
+  assert "immutable" in response.headers["cache-control"]
+  etag = response.headers["etag"]
+
+  revalidated = client.get(f"/media/{filename}", headers={"If-None-Match": etag})
+  assert revalidated.status_code == 304
+  assert revalidated.content == b""
+  assert revalidated.headers["etag"] == etag
+
+  head = client.head(f"/media/{filename}")
+  assert head.status_code == 200
+  assert head.headers["content-length"] == str(len(content))
+  assert head.content == b""
+
+  assert client.get("/media/0123456789ab-en_US.wav").status_code == 404
+  assert client.get("/media/not-a-cache-file.txt").status_code == 400
+
+
+def test_media_route_honours_byte_ranges(client_builder):
+  client, media_dir, _, _ = client_builder()
+  filename, content = _cached_audio(client, media_dir)
+  size = len(content)
+
+  partial = client.get(f"/media/{filename}", headers={"Range": "bytes=44-143"})
+  assert partial.status_code == 206
+  assert partial.content == content[44:144]
+  assert partial.headers["content-range"] == f"bytes 44-143/{size}"
+
+  tail = client.get(f"/media/{filename}", headers={"Range": "bytes=-10"})
+  assert tail.content == content[-10:]
+
+  unsatisfiable = client.get(f"/media/{filename}", headers={"Range": f"bytes={size}-"})
+  assert unsatisfiable.status_code == 416
+  assert unsatisfiable.headers["content-range"] == f"bytes */{size}"
+
+  stale = client.get(f"/media/{filename}", headers={"Range": "bytes=0-9", "If-Range": '"other"'})
+  assert stale.status_code == 200
+  assert stale.content == content
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [("bytes=0-0", (0, 0)), ("bytes=5-", (5, 99)), ("bytes=90-500", (90, 99)), ("bytes=-200", (0, 99)),
+     ("bytes=0-1,4-5", None), ("items=0-1", None), ("bytes=9-2", None)],
+)
+def test_parse_range(header, expected):
+  assert media.parse_range(header, 100) == expected
+
+
+def test_book_download_supports_etag_and_range(client_builder):
+  client, _, _, _ = client_builder()
+  upload = client.post("/library/upload", files={"file": ("story.txt", b"Hello ranged world", "text/plain")}).json()
+  response = client.get(f"/library/{upload['id']}")
+  assert response.status_code == 200
+  assert response.headers["etag"] == f'"{upload["filename"].rsplit(".", 1)[0]}"'
+  assert "attachment" in response.headers["content-disposition"]
+
+  assert client.get(f"/library/{upload['id']}", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+  partial = client.get(f"/library/{upload['id']}", headers={"Range": "bytes=6-11"})
+  assert partial.status_code == 206
+  assert partial.content == b"ranged"
@@ -0,0 +1,72 @@
+from tts_service import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+  registry = metrics.Registry()
+  histogram = registry.register(metrics.Histogram("demo_seconds", "Demo.", ("voice",), buckets=(0.1, 1.0)))
+  histogram.observe(0.05, voice="a")
+  histogram.observe(0.5, voice="a")
+  histogram.observe(3, voice="a")
+
+  text = registry.render()
+  assert "# TYPE demo_seconds histogram" in text
+  assert 'demo_seconds_bucket{voice="a",le="0.1"} 1' in text
+  assert 'demo_seconds_bucket{voice="a",le="1"} 2' in text
+  assert 'demo_seconds_bucket{voice="a",le="+Inf"} 3' in text
+  assert 'demo_seconds_count{voice="a"} 3' in text
+  assert 'demo_seconds_sum{voice="a"} 3.55' in text
+
+
+def test_registry_keeps_first_registration_and_escapes_labels():
+  registry = metrics.Registry()
+  counter = registry.register(metrics.Counter("demo_total", "Demo.", ("path",)))
+  assert registry.register(metrics.Counter("demo_total", "Again.", ("path",))) is counter
+  counter.inc(path='a"b')
+  assert 'demo_total{path="a\\"b"} 1' in registry.render()
+
+
+def _sample(text: str, prefix: str) -> float:
+  for line in text.splitlines():
+    if line.startswith(prefix + " "):
+      return float(line.rsplit(" ", 1)[1])
+  return 0.0
+
+
+def test_metrics_endpoint_tracks_routes_cache_and_rejections(client_builder):
+  client, _, _, _ = client_builder(REQUEST_LIMIT="6", REQUEST_WINDOW_SECONDS="60")
+  before = client.get("/metrics").text
+  payload = {"text": "metered", "voice_id": "en_US"}
+  client.post("/tts", params={"json": 1}, json=payload)
+  client.post("/tts", params={"json": 1}, json=payload)
+  while client.get("/healthz").status_code != 429:
+    pass
+
+  resp = client.get("/metrics")
+  assert resp.status_code == 200
+  assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+  after = resp.text
+
+  route = 'http_requests_total{route="/tts",method="POST",status="200"}'
+  assert _sample(after, route) - _sample(before, route) == 2
+  hits = 'tts_cache_lookups_total{result="hit"}'
+  misses = 'tts_cache_lookups_total{result="miss"}'
+  assert _sample(after, hits) - _sample(before, hits) == 1
+  assert _sample(after, misses) - _sample(before, misses) == 1
+  rejected = 'rate_limit_rejections_total{reason="requests"}'
+  assert _sample(after, rejected) - _sample(before, rejected) >= 1
+  assert 'tts_synthesis_real_time_factor_count{voice="en_US"}' in after
+  assert "synthesis_active 0" in after
+  assert "http_requests_in_flight" in after
+
+
+def test_streamed_synthesis_is_timed_and_costed(client_builder):
+  client, _, _, main = client_builder()
+  before = client.get("/metrics").text
+  response = client.post("/tts", params={"stream": 1}, json={"text": "streamed and timed", "voice_id": "en_GB"})
+  assert response.status_code == 200
+  after = client.get("/metrics").text
+
+  count = 'tts_synthesis_duration_seconds_count{voice="en_GB"}'
+  assert _sample(after, count) - _sample(before, count) == 1
+  assert 'tts_synthesis_real_time_factor_count{voice="en_GB"}' in after
+  assert "en_GB" in main.get_synthesis_costs().stats()
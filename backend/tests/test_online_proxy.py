@@ -0,0 +1,305 @@
+import asyncio
+import io
+import json
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+
+def _wav(frames=1600, framerate=16000):
+  buffer = io.BytesIO()
+  with wave.open(buffer, "wb") as wav_file:
+    wav_file.setnchannels(1)
+    wav_file.setsampwidth(2)
+    wav_file.setframerate(framerate)
+    wav_file.writeframes(b"\x00\x00" * frames)
+  return buffer.getvalue()
+
+
+AUDIO = _wav()
+
+
+@pytest.fixture
+def upstream():
+  """Local stand-in for the online TTS API. Queue `(status, delay_seconds)` replies in `script`;
+  once it is empty every request succeeds immediately. Audio is served from `/audio/<text>.wav`,
+  or from `audio_url(base, text)` when set, with the `audio` content type and body."""
+  script = []
+  requests = []
+  audio_fetches = []
+  served = SimpleNamespace(audio=("audio/wav", AUDIO), audio_url=lambda base, text: f"/audio/{text}.wav")
+  lock = threading.Lock()
+
+  class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+      pass
+
+    def do_GET(self):
+      audio_fetches.append(self.path)
+      content_type, body = served.audio
+      self.send_response(200)
+      self.send_header("Content-Type", content_type)
+      self.send_header("Content-Length", str(len(body)))
+      self.end_headers()
+      self.wfile.write(body)
+
+    def do_POST(self):
+      body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+      with lock:
+        requests.append(SimpleNamespace(path=self.path, body=body, headers=dict(self.headers), port=self.client_address[1]))
+        status, delay = script.pop(0) if script else (200, 0)
+      time.sleep(delay)
+      payload = json.dumps({"audio_url": served.audio_url(base, body["text"]), "duration_ms": 100}).encode()
+      try:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+      except OSError:
+        pass  # The proxy gave up on this request (timeout or losing hedge).
+
+  server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+  server.daemon_threads = True
+  base = f"http://127.0.0.1:{server.server_address[1]}"
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  yield SimpleNamespace(base=base, script=script, requests=requests, audio_fetches=audio_fetches, served=served)
+  server.shutdown()
+  server.server_close()
+
+
+def _proxy_env(upstream, **overrides):
+  env = {
+      "ENABLE_ONLINE_PROXY": "1",
+      "ONLINE_TTS_BASE_URL": upstream.base,
+      "ONLINE_TTS_API_KEY": "secret",
+      "ONLINE_TTS_BACKOFF_MS": "1",
+  }
+  env.update(overrides)
+  return env
+
+
+def test_online_tts_forwarding_success(client_builder, upstream):
+  client, _, _, _ = client_builder(**_proxy_env(upstream, ONLINE_TTS_CACHE="0"))
+  response = client.post("/tts/generate", json={"text": "hi", "voice_id": "en"})
+  assert response.status_code == 200
+  assert response.json() == {"audio_url": "/audio/hi.wav", "duration_ms": 100}
+  (request,) = upstream.requests
+  assert request.path == "/tts/generate"
+  assert request.headers["Authorization"] == "Bearer secret"
+  assert request.body == {"text": "hi", "voice_id": "en"}
+
+
+def test_online_client_reuses_pooled_connections(client_builder, upstream):
+  _, _, _, main = client_builder(**_proxy_env(upstream))
+  from tts_service.online_proxy import OnlineTTSClient
+  from tts_service.tts import TTSRequest
+
+  async def run():
+    proxy = OnlineTTSClient(main.get_settings())
+    try:
+      for text in ("one", "two", "three"):
+        await proxy.generate(TTSRequest(text=text, voice_id="en"))
+    finally:
+      await proxy.aclose()
+
+  asyncio.run(run())
+  assert len({request.port for request in upstream.requests}) == 1
+
+
+def test_online_client_closes_the_pool_of_a_previous_loop(client_builder, upstream):
+  _, _, _, main = client_builder(**_proxy_env(upstream, ONLINE_TTS_CACHE="0"))
+  from tts_service.online_proxy import OnlineTTSClient
+  from tts_service.tts import TTSRequest
+
+  proxy = OnlineTTSClient(main.get_settings())
+  asyncio.run(proxy.generate(TTSRequest(text="one", voice_id="en")))
+  first = proxy._client
+
+  async def on_new_loop():
+    await proxy.generate(TTSRequest(text="two", voice_id="en"))
+    await asyncio.sleep(0)
+    await proxy.aclose()
+
+  asyncio.run(on_new_loop())
+  assert first.is_closed and proxy._client is None
+
+  # aclose on another loop than the client's also closes it.
+  asyncio.run(proxy.generate(TTSRequest(text="four", voice_id="en")))
+  orphan = proxy._client
+  asyncio.run(proxy.aclose())
+  assert orphan.is_closed
+
+  # A previous loop that is still running closes its own client.
+  owner = asyncio.new_event_loop()
+  threading.Thread(target=owner.run_forever, daemon=True).start()
+  try:
+    asyncio.run_coroutine_threadsafe(proxy.generate(TTSRequest(text="three", voice_id="en")), owner).result(5)
+    second = proxy._client
+    asyncio.run(on_new_loop())
+    deadline = time.monotonic() + 5
+    while not second.is_closed and time.monotonic() < deadline:
+      time.sleep(0.01)
+    assert second.is_closed
+  finally:
+    owner.call_soon_threadsafe(owner.stop)
+
+
+def test_online_tts_retries_transient_failures_only(client_builder, upstream):
+  client, _, _, _ = client_builder(**_proxy_env(upstream))
+  upstream.script.extend([(503, 0), (502, 0)])
+  assert client.post("/tts/generate", json={"text": "hi", "voice_id": "en"}).status_code == 200
+  assert len(upstream.requests) == 3
+
+  upstream.script.append((400, 0))
+  assert client.post("/tts/generate", json={"text": "bad", "voice_id": "en"}).status_code == 400
+  assert len(upstream.requests) == 4
+
+
+def test_online_tts_attempt_timeout_and_circuit_breaker(client_builder, upstream):
+  client, _, _, _ = client_builder(
+      **_proxy_env(upstream, ONLINE_TTS_TIMEOUT_SECONDS="0.2", ONLINE_TTS_RETRIES="1", ONLINE_TTS_BREAKER_FAILURES="2")
+  )
+  upstream.script.extend([(200, 1)] * 2 + [(503, 0)] * 2)
+  assert client.post("/tts/generate", json={"text": "slow", "voice_id": "en"}).status_code == 504
+  assert client.post("/tts/generate", json={"text": "down", "voice_id": "en"}).status_code == 503
+  assert len(upstream.requests) == 4
+
+  # Two failed calls open the circuit: the next one is refused without touching the upstream.
+  refused = client.post("/tts/generate", json={"text": "again", "voice_id": "en"})
+  assert refused.status_code == 503
+  assert int(refused.headers["Retry-After"]) >= 1
+  assert len(upstream.requests) == 4
+
+
+def test_online_tts_hedges_slow_attempts(client_builder, upstream):
+  client, _, _, _ = client_builder(**_proxy_env(upstream, ONLINE_TTS_HEDGE_MS="50", ONLINE_TTS_RETRIES="0"))
+  upstream.script.append((200, 2))
+  started = time.monotonic()
+  response = client.post("/tts/generate", json={"text": "tail", "voice_id": "en"})
+  assert response.status_code == 200
+  assert time.monotonic() - started < 1.5
+  assert len(upstream.requests) == 2
+
+
+def test_cancelled_caller_stops_the_unhedged_attempt(client_builder, upstream):
+  _, _, _, main = client_builder(**_proxy_env(upstream, ONLINE_TTS_HEDGE_MS="1000"))
+  from tts_service.online_proxy import OnlineTTSClient
+
+  proxy = OnlineTTSClient(main.get_settings())
+  cancelled = []
+
+  async def slow_post(endpoint, body, headers):
+    try:
+      await asyncio.sleep(10)
+    except asyncio.CancelledError:
+      cancelled.append(endpoint)
+      raise
+
+  proxy._post = slow_post
+
+  async def run():
+    attempt = asyncio.create_task(proxy._attempt("/tts/generate", {}, {}))
+    await asyncio.sleep(0.05)
+    attempt.cancel()
+    with pytest.raises(asyncio.CancelledError):
+      await attempt
+    await asyncio.sleep(0)
+    # Checked before asyncio.run cancels leftover tasks on its way out.
+    return list(cancelled)
+
+  assert asyncio.run(run()) == ["/tts/generate"]
+
+
+def test_circuit_breaker_half_opens_after_reset():
+  from tts_service.online_proxy import CircuitBreaker
+
+  now = [0.0]
+  breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10, clock=lambda: now[0])
+  breaker.record_failure()
+  assert (breaker.state, breaker.allow()) == ("open", False)
+  now[0] = 10
+  assert breaker.allow() is True
+  assert breaker.allow() is False  # only one probe at a time
+  breaker.record_failure()
+  assert breaker.state == "open"
+  now[0] = 20
+  assert breaker.allow() is True
+  breaker.record_success()
+  assert (breaker.state, breaker.allow()) == ("closed", True)
+
+
+def test_online_tts_audio_is_cached_locally_and_cleaned_with_its_book(client_builder, upstream):
+  client, media_dir, _, _ = client_builder(**_proxy_env(upstream))
+  book = client.post(
+      "/library/upload", data={"title": "Story"}, files={"file": ("story.txt", b"Once upon a time.", "text/plain")}
+  ).json()
+  payload = {"text": "Once  upon a time.", "voice_id": "en", "book_id": book["id"]}
+
+  first = client.post("/tts/generate", json=payload).json()
+  assert first["audio_url"].startswith("/media/") and first["audio_url"].endswith("-en.wav")
+  assert first["duration_ms"] == 100
+  assert upstream.audio_fetches == ["/audio/Once%20upon%20a%20time..wav"]
+  filename = first["audio_url"].rsplit("/", 1)[-1]
+  assert client.get(first["audio_url"]).content == AUDIO
+
+  # Normalized text hits the local copy: no upstream call, duration read from the file.
+  again = client.post("/tts/generate", json=dict(payload, text="Once upon a time."))
+  assert again.json() == first
+  assert (len(upstream.requests), len(upstream.audio_fetches)) == (1, 1)
+  # Offline synthesis of the same text uses a different cache entry.
+  offline = client.post("/tts", params={"json": 1}, json={"text": "Once upon a time.", "voice_id": "en"}).json()
+  assert offline["audio_url"] != first["audio_url"]
+
+  assert client.delete(f"/library/{book['id']}").status_code == 200
+  assert not (media_dir / filename).exists()
+
+
+def test_online_audio_is_only_fetched_from_trusted_origins(client_builder, upstream):
+  # Same server under another host name: a different origin unless it is allow-listed.
+  other = upstream.base.replace("127.0.0.1", "localhost")
+  upstream.served.audio_url = lambda base, text: f"{other}/audio/{text}.wav"
+  client, _, _, _ = client_builder(**_proxy_env(upstream))
+  relayed = client.post("/tts/generate", json={"text": "hi", "voice_id": "en"}).json()
+  assert relayed["audio_url"] == f"{other}/audio/hi.wav"
+  assert upstream.audio_fetches == []
+
+  upstream.served.audio_url = lambda base, text: f"file:///etc/{text}"
+  local = client.post("/tts/generate", json={"text": "passwd", "voice_id": "en"}).json()
+  assert local["audio_url"] == "file:///etc/passwd"
+
+  upstream.served.audio_url = lambda base, text: f"{other}/audio/{text}.wav"
+  client, _, _, _ = client_builder(**_proxy_env(upstream, ONLINE_TTS_AUDIO_ORIGINS=f"https://cdn.example, {other}"))
+  cached = client.post("/tts/generate", json={"text": "hi", "voice_id": "en"}).json()
+  assert cached["audio_url"].startswith("/media/")
+  assert upstream.audio_fetches == ["/audio/hi.wav"]
+
+
+def _ogg_page(packet, granule=0, header_type=0):
+  return (
+      b"OggS" + bytes([0, header_type]) + granule.to_bytes(8, "little") + b"\x01\x00\x00\x00" + b"\x00" * 8
+      + bytes([1, len(packet)]) + packet
+  )
+
+
+def test_online_ogg_audio_is_cached_as_opus_only_when_it_is_opus(client_builder, upstream):
+  client, media_dir, _, _ = client_builder(**_proxy_env(upstream))
+  vorbis = _ogg_page(b"\x01vorbis" + b"\x00" * 22, header_type=2) + _ogg_page(b"\x00" * 200, granule=22050)
+  upstream.served.audio = ("audio/ogg", vorbis)
+  relayed = client.post("/tts/generate", json={"text": "vorbis", "voice_id": "en"}).json()
+  assert relayed["audio_url"] == "/audio/vorbis.wav"
+  assert list(media_dir.glob("*.opus")) == [] and list(media_dir.glob("*.tmp")) == []
+
+  opus_head = b"OpusHead" + bytes([1, 1]) + (312).to_bytes(2, "little") + (48000).to_bytes(4, "little") + b"\x00" * 3
+  opus = _ogg_page(opus_head, header_type=2) + _ogg_page(b"\x00" * 250) + _ogg_page(b"\x00" * 250, granule=48312)
+  upstream.served.audio = ("audio/ogg", opus)
+  cached = client.post("/tts/generate", json={"text": "opus", "voice_id": "en"}).json()
+  assert cached["audio_url"].endswith("-en.opus")
+  # A later hit reads the duration from the stored file.
+  assert client.post("/tts/generate", json={"text": "opus", "voice_id": "en"}).json()["duration_ms"] == 1000
@@ -0,0 +1,83 @@
+import threading
+
+import pytest
+
+from tts_service import piper_pool
+
+
+def _log_lines(log_path):
+  return [line.split(" ", 1) for line in log_path.read_text().splitlines()]
+
+
+def test_pool_reuses_warm_worker_across_requests(client_builder, fake_piper):
+  script, log_path = fake_piper
+  client, _, _, _ = client_builder(PIPER_BIN=str(script))
+  for text in ("first paragraph", "second paragraph"):
+    response = client.post("/tts", params={"json": 1}, json={"text": text, "voice_id": "en_US"})
+    assert response.status_code == 200
+    assert response.json()["duration_ms"] == 100
+
+  pids = {pid for pid, _ in _log_lines(log_path)}
+  assert len(pids) == 1
+  ready = client.get("/readyz").json()
+  assert ready["piper_pool"]["workers"] == 1
+
+
+def test_pool_restarts_crashed_worker(tmp_path, fake_piper):
+  script, log_path = fake_piper
+  pool = piper_pool.PiperPool(script, max_workers=2, memory_budget_bytes=1 << 30, timeout_seconds=5)
+  try:
+    pool.synthesize("model.onnx", {}, "before", tmp_path / "a.wav")
+    with pytest.raises(piper_pool.PiperWorkerError):
+      pool.synthesize("model.onnx", {}, "crash", tmp_path / "b.wav")
+    pool.synthesize("model.onnx", {}, "after", tmp_path / "c.wav")
+  finally:
+    pool.close()
+
+  pids = [pid for pid, _ in _log_lines(log_path)]
+  assert len(pids) == 2
+  assert pids[0] != pids[1]
+
+
+def test_pool_evicts_least_recently_used_model_over_budget(tmp_path, fake_piper, monkeypatch):
+  script, _ = fake_piper
+  for name in ("a.onnx", "b.onnx"):
+    (tmp_path / name).write_bytes(b"m" * 600)
+  pool = piper_pool.PiperPool(script, max_workers=4, memory_budget_bytes=1000, timeout_seconds=5)
+  lock_free_on_close = []
+  real_close = piper_pool.PiperWorker.close
+
+  def close(worker):
+    # Evicted workers must be shut down without blocking other callers on the pool lock.
+    def probe():
+      acquired = pool._cond.acquire(timeout=1)
+      if acquired:
+        pool._cond.release()
+      lock_free_on_close.append(acquired)
+
+    thread = threading.Thread(target=probe)
+    thread.start()
+    thread.join()
+    real_close(worker)
+
+  monkeypatch.setattr(piper_pool.PiperWorker, "close", close)
+  try:
+    pool.synthesize(str(tmp_path / "a.onnx"), {}, "one", tmp_path / "1.wav")
+    pool.synthesize(str(tmp_path / "b.onnx"), {}, "two", tmp_path / "2.wav")
+    stats = pool.stats()
+  finally:
+    pool.close()
+  assert stats["workers"] == 1
+  assert stats["models"] == 1
+  assert lock_free_on_close and all(lock_free_on_close)
+
+
+def test_pool_failure_falls_back_to_one_shot(client_builder, fake_piper, monkeypatch):
+  script, log_path = fake_piper
+  monkeypatch.setenv("FAKE_PIPER_NO_POOL", "1")
+  client, media_dir, _, _ = client_builder(PIPER_BIN=str(script))
+  response = client.post("/tts", params={"json": 1}, json={"text": "fallback", "voice_id": "en_US"})
+  assert response.status_code == 200
+  filename = response.json()["audio_url"].split("/media/")[-1]
+  assert (media_dir / filename).exists()
+  assert [text for _, text in _log_lines(log_path)] == ["fallback"]
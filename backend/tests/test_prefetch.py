@@ -0,0 +1,94 @@
+import threading
+
+from conftest import wait_for
+
+
+def test_prefetch_warms_paragraphs_after_last_read_location(client_builder):
+  client, _, _, main = client_builder(SYNTHESIS_CONCURRENCY="2")
+  book = client.post(
+      "/library/upload",
+      data={"title": "Story"},
+      files={"file": ("story.txt", b"text", "text/plain")},
+  ).json()
+  client.patch(f"/library/{book['id']}", json={"last_read_location": {"para": 12, "chars": 0}})
+  chunks = [f"Paragraph number {index}." for index in range(10, 16)]
+
+  resp = client.post(
+      "/tts/prefetch",
+      json={"book_id": book["id"], "voice_id": "en_US", "chunks": chunks, "start_para": 10, "from_last_read": True, "count": 2},
+  )
+  assert resp.status_code == 202
+  job_id = resp.json()["job_id"]
+  assert resp.json()["total"] == 2
+  assert wait_for(lambda: client.get(f"/tts/prefetch/{job_id}").json()["status"] == "done")
+
+  settings = main.get_settings()
+  warm = [main.is_cached(settings, main.TTSRequest(text=chunk, voice_id="en_US", book_id=book["id"])) for chunk in chunks]
+  assert warm == [False, False, True, True, False, False]
+  assert client.post("/tts", params={"json": 1}, json={"text": chunks[2], "voice_id": "en_US"}).status_code == 200
+  assert client.get("/status").json()["cache_hits"] == 1
+
+
+def test_prefetch_requires_chunks_covering_read_position(client_builder):
+  client, _, _, _ = client_builder()
+  payload = {"voice_id": "en_US", "chunks": ["a"], "from_last_read": True}
+  assert client.post("/tts/prefetch", json=payload).status_code == 400
+  assert client.post("/tts/prefetch", json={**payload, "book_id": "missing"}).status_code == 404
+  assert client.get("/tts/prefetch/missing").status_code == 404
+
+
+def test_cancel_and_supersede_drop_pending_items(client_builder):
+  _, _, _, main = client_builder()
+  from tts_service import admission, prefetch
+
+  release = threading.Event()
+  synthesized = []
+
+  def slow_synthesize(settings, item):
+    synthesized.append(item.text)
+    release.wait(timeout=5)
+
+  prefetcher = prefetch.Prefetcher(main.get_settings(), admission.AdmissionController(4, 4), synthesize_item=slow_synthesize)
+  items = [main.TTSRequest(text=f"item {index}", voice_id="en_US", book_id="book") for index in range(5)]
+  first = prefetcher.submit("book", items)
+  assert wait_for(lambda: synthesized == ["item 0"])
+  assert prefetcher.cancel(first.id)["status"] == "cancelled"
+
+  second = prefetcher.submit("book", items[3:])
+  third = prefetcher.submit("book", items[4:])
+  assert prefetcher.get(second.id)["status"] == "cancelled"
+  release.set()
+  assert wait_for(lambda: prefetcher.get(third.id)["status"] == "done")
+  assert synthesized == ["item 0", "item 4"]
+
+
+def test_try_acquire_leaves_capacity_for_foreground_requests():
+  from tts_service import admission
+
+  controller = admission.AdmissionController(2, 4)
+  assert controller.try_acquire()
+  assert not controller.try_acquire()
+  controller.release()
+  assert controller.active == 0
+
+  # With a single slot, background work only gets it while the controller is idle.
+  single = admission.AdmissionController(1, 4)
+  assert single.try_acquire()
+  assert not single.try_acquire()
+  single.release()
+  assert single.active == 0
+
+
+def test_prefetch_completes_with_a_single_synthesis_slot(client_builder):
+  _, _, _, main = client_builder()
+  from tts_service import admission, prefetch
+
+  synthesized = []
+  controller = admission.AdmissionController(1, 4)
+  prefetcher = prefetch.Prefetcher(
+      main.get_settings(), controller, synthesize_item=lambda settings, item: synthesized.append(item.text)
+  )
+  items = [main.TTSRequest(text=f"item {index}", voice_id="en_US", book_id="book") for index in range(3)]
+  job = prefetcher.submit("book", items)
+  assert wait_for(lambda: prefetcher.get(job.id)["status"] == "done")
+  assert synthesized == ["item 0", "item 1", "item 2"]
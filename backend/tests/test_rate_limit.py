@@ -0,0 +1,34 @@
+from tts_service import rate_limit
+
+
+class FakeMonotonic:
+  def __init__(self, monkeypatch):
+    self.now = 100.0
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: self.now)
+
+
+def test_gcra_allows_burst_then_paces(monkeypatch):
+  clock = FakeMonotonic(monkeypatch)
+  limiter = rate_limit.RateLimiter(max_requests=3, window_seconds=30)
+  assert [limiter.allow("a") for _ in range(4)] == [True, True, True, False]
+  assert limiter.reserve("a") == 10.0
+  assert limiter.allow("b")
+
+  clock.now += 10
+  assert limiter.allow("a")
+  assert not limiter.allow("a")
+  clock.now += 30
+  assert [limiter.allow("a") for _ in range(4)] == [True, True, True, False]
+
+
+def test_idle_keys_are_swept(monkeypatch):
+  clock = FakeMonotonic(monkeypatch)
+  limiter = rate_limit.RateLimiter(max_requests=5, window_seconds=10, shards=4)
+  for index in range(1000):
+    limiter.allow(f"10.0.{index // 256}.{index % 256}")
+  assert len(limiter) == 1000
+
+  clock.now += 11
+  for index in range(64):
+    limiter.allow(f"fresh-{index}")
+  assert len(limiter) == 64
@@ -0,0 +1,178 @@
+import io
+import sqlite3
+import zipfile
+
+from conftest import wait_for
+
+PARAGRAPHS = [
+    "CHAPTER ONE",
+    "The first paragraph of the story is here.",
+    "A second paragraph follows with more words.",
+    "And a third one closes the opening chapter.",
+]
+
+
+def _epub_bytes() -> bytes:
+  buffer = io.BytesIO()
+  with zipfile.ZipFile(buffer, "w") as archive:
+    archive.writestr(
+        "META-INF/container.xml",
+        '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container"><rootfiles>'
+        '<rootfile full-path="OEBPS/content.opf"/></rootfiles></container>',
+    )
+    archive.writestr(
+        "OEBPS/content.opf",
+        '<package xmlns="http://www.idpf.org/2007/opf"><manifest>'
+        '<item id="c1" href="text/one.xhtml"/><item id="c2" href="text/two.xhtml"/></manifest>'
+        '<spine><itemref idref="c2"/><itemref idref="c1"/></spine></package>',
+    )
+    archive.writestr(
+        "OEBPS/text/one.xhtml",
+        "<html><body><h1>Chapter One</h1><p>Short.</p><p>This paragraph is long enough &amp; kept.</p></body></html>",
+    )
+    archive.writestr(
+        "OEBPS/text/two.xhtml",
+        "<html><body><div><p>Nested paragraph inside a wrapping div.</p></div></body></html>",
+    )
+  return buffer.getvalue()
+
+
+def test_parsers_match_the_reader_paragraphs(tmp_path):
+  from tts_service import book_text
+
+  txt = book_text.parse_txt("\n\n".join(PARAGRAPHS).encode() + b"\n\n\n")
+  assert txt.paragraphs == PARAGRAPHS
+  assert txt.chapters == [("CHAPTER ONE", 0)]
+
+  path = tmp_path / "book.epub"
+  path.write_bytes(_epub_bytes())
+  epub = book_text.parse_book(path)
+  # Like querySelectorAll, a div and the p inside it both count; spine order wins over manifest order.
+  assert epub.paragraphs == [
+      "Nested paragraph inside a wrapping div.",
+      "Nested paragraph inside a wrapping div.",
+      "This paragraph is long enough & kept.",
+  ]
+  assert epub.chapters == [("Chapter One", 2)]
+
+
+def test_split_for_synthesis_prefers_sentence_boundaries():
+  from tts_service import book_text
+
+  assert book_text.split_for_synthesis("Fits as is.", 50) == ["Fits as is."]
+  chunks = book_text.split_for_synthesis("One two three. Four five six. " + "x" * 25, 20)
+  assert chunks == ["One two three.", "Four five six.", "x" * 20, "x" * 5]
+
+
+def test_render_job_caches_whole_book_and_book_delete_cleans_up(client_builder):
+  client, media_dir, _, main = client_builder(SYNTHESIS_CONCURRENCY="2")
+  book = client.post(
+      "/library/upload",
+      data={"title": "Story"},
+      files={"file": ("story.txt", "\n\n".join(PARAGRAPHS).encode(), "text/plain")},
+  ).json()
+
+  resp = client.post(f"/library/{book['id']}/render", json={"voice_id": "en_US"})
+  assert resp.status_code == 202
+  job_id = resp.json()["job_id"]
+  path = f"/library/{book['id']}/render/{job_id}"
+  assert wait_for(lambda: client.get(path).json()["status"] == "done")
+  job = client.get(path).json()
+  assert (job["total"], job["completed"], job["checkpoint"], job["progress"]) == (4, 4, 4, 1.0)
+  assert client.post(f"/library/{book['id']}/render", json={"voice_id": "en_US"}).json()["job_id"] == job_id
+  assert client.get(f"/library/other/render/{job_id}").status_code == 404
+
+  from tts_service.audio_cache import get_audio_index
+
+  files = get_audio_index().files_for_book(book["id"])
+  assert len(files) == 4
+  assert client.post("/tts", params={"json": 1}, json={"text": PARAGRAPHS[1], "voice_id": "en_US"}).status_code == 200
+  assert client.get("/status").json()["cache_hits"] >= 1
+
+  assert client.delete(f"/library/{book['id']}").status_code == 200
+  assert not any((media_dir / name).exists() for name in files)
+  assert client.get(f"/library/{book['id']}/render").json() == []
+
+
+def test_render_job_resumes_from_checkpoint_after_restart(client_builder, tmp_path):
+  _, _, books_dir, main = client_builder()
+  from tts_service import admission, render_jobs
+
+  source = books_dir / "book.txt"
+  source.write_text("\n\n".join(PARAGRAPHS))
+  db_path = tmp_path / "render.db"
+  settings = main.get_settings()
+  first_run = []
+
+  def interrupted(settings, item):
+    first_run.append(item.text)
+    if len(first_run) == 2:
+      manager.pause(job_id)
+
+  manager = render_jobs.RenderJobManager(settings, db_path, admission.AdmissionController(2, 4), synthesize_item=interrupted)
+  job_id = manager.submit("book", source, "en_US")["job_id"]
+  assert wait_for(lambda: manager.get(job_id)["checkpoint"] == 2)
+  assert manager.get(job_id)["status"] == "paused"
+  # Pretend the process died mid-render.
+  with sqlite3.connect(db_path) as conn:
+    conn.execute("UPDATE render_jobs SET state = 'running' WHERE id = ?", (job_id,))
+
+  second_run = []
+  restarted = render_jobs.RenderJobManager(
+      settings, db_path, admission.AdmissionController(2, 4), synthesize_item=lambda settings, item: second_run.append(item.text)
+  )
+  assert restarted.get(job_id)["status"] == "queued"
+  assert restarted.resume_pending() == 1
+  assert wait_for(lambda: restarted.get(job_id)["status"] == "done")
+  assert first_run == PARAGRAPHS[:2]
+  assert second_run == PARAGRAPHS[2:]
+  assert restarted.get(job_id)["completed"] == 4
+
+
+def test_render_worker_stops_waiting_when_cancelled_and_survives_failures(client_builder, tmp_path):
+  _, _, books_dir, main = client_builder()
+  import asyncio
+
+  from tts_service import admission, render_jobs, tts
+
+  settings = main.get_settings()
+  waiting = books_dir / "waiting.txt"
+  waiting.write_text("Never gets an idle slot.")
+  cached = books_dir / "cached.txt"
+  cached.write_text("\n\n".join(PARAGRAPHS[:2]))
+  for text in PARAGRAPHS[:2]:
+    tts.synthesize(settings, tts.TTSRequest(text=text, voice_id="en_US"))
+
+  def broken(settings, item):
+    raise RuntimeError("synthesis exploded")
+
+  controller = admission.AdmissionController(2, 4)
+  # A foreground request holds the slot background work may use.
+  asyncio.run(controller.acquire())
+  manager = render_jobs.RenderJobManager(settings, tmp_path / "render.db", controller, synthesize_item=broken)
+  stuck = manager.submit("waiting", waiting, "en_US")["job_id"]
+  assert wait_for(lambda: manager.get(stuck)["total"] == 1)
+  manager.cancel(stuck)
+
+  job_id = manager.submit("cached", cached, "en_US")["job_id"]
+  assert wait_for(lambda: manager.get(job_id)["status"] == "done")
+  assert manager.get(job_id)["failed"] == 2
+  assert manager.get(job_id)["error"] == "synthesis exploded"
+  assert manager.get(stuck)["status"] == "cancelled"
+  assert controller.active == 1
+
+
+def test_render_job_completes_with_a_single_synthesis_slot(client_builder, tmp_path):
+  _, _, books_dir, main = client_builder()
+  from tts_service import admission, render_jobs
+
+  source = books_dir / "book.txt"
+  source.write_text("\n\n".join(PARAGRAPHS))
+  rendered = []
+  controller = admission.AdmissionController(1, 4)
+  manager = render_jobs.RenderJobManager(
+      main.get_settings(), tmp_path / "render.db", controller, synthesize_item=lambda settings, item: rendered.append(item.text)
+  )
+  job_id = manager.submit("book", source, "en_US")["job_id"]
+  assert wait_for(lambda: manager.get(job_id)["status"] == "done")
+  assert rendered == PARAGRAPHS
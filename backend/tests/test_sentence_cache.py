@@ -0,0 +1,83 @@
+import time
+import wave
+
+from tts_service import text_segments
+
+
+def _synthesized(log_path):
+  return [line.split(" ", 1)[1] for line in log_path.read_text().splitlines()]
+
+
+def test_normalize_text_folds_unicode_and_whitespace():
+  assert text_segments.normalize_text("  Café au\n\tlait  ") == "Café au lait"
+
+
+def test_split_sentences_keeps_abbreviations_and_lowercase_continuations():
+  text = 'Dr. Smith met J. R. Tolkien. "Really?" she asked. It was odd… and late! e.g. this stays.'
+  assert text_segments.split_sentences(text) == [
+      "Dr. Smith met J. R. Tolkien.",
+      '"Really?" she asked.',
+      "It was odd… and late! e.g. this stays.",
+  ]
+  assert text_segments.split_sentences("No terminal punctuation") == ["No terminal punctuation"]
+
+
+def test_sentences_are_cached_separately_and_stitched(client_builder, fake_piper):
+  script, log_path = fake_piper
+  client, media_dir, _, _ = client_builder(PIPER_BIN=str(script))
+
+  def tts(text):
+    resp = client.post("/tts", params={"json": 1}, json={"text": text, "voice_id": "en_US"})
+    assert resp.status_code == 200
+    return resp.json()
+
+  first = tts("The rain fell. The wind howled.")
+  assert _synthesized(log_path) == ["The rain fell.", "The wind howled."]
+  # Two 100 ms segments spliced with the default 200 ms pause.
+  assert first["duration_ms"] == 400
+  with wave.open(str(media_dir / first["audio_url"].rsplit("/", 1)[-1]), "rb") as stitched:
+    assert (stitched.getframerate(), stitched.getnframes()) == (16000, 6400)
+
+  # Different whitespace and chunk boundaries reuse the cached sentences.
+  assert tts("The  rain fell.\nThe wind howled. ")["audio_url"] == first["audio_url"]
+  tts("The wind howled.")
+  tts("The wind howled. The rain fell. Night came.")
+  assert _synthesized(log_path) == ["The rain fell.", "The wind howled.", "Night came."]
+  # One lookup per request, however many sentences it was split into.
+  status = client.get("/status").json()
+  assert (status["cache_hits"], status["cache_misses"]) == (2, 2)
+
+
+def test_sentence_cache_can_be_disabled(client_builder, fake_piper):
+  script, log_path = fake_piper
+  client, _, _, _ = client_builder(PIPER_BIN=str(script), SENTENCE_CACHE="0")
+  client.post("/tts", params={"json": 1}, json={"text": "One. Two.", "voice_id": "en_US"})
+  assert _synthesized(log_path) == ["One. Two."]
+
+
+def test_one_shot_piper_synthesizes_text_as_one_unit(client_builder, fake_piper):
+  script, log_path = fake_piper
+  client, _, _, _ = client_builder(PIPER_BIN=str(script), PIPER_POOL="0")
+  client.post("/tts", params={"json": 1}, json={"text": "One. Two.", "voice_id": "en_US"})
+  assert _synthesized(log_path) == ["One. Two."]
+
+
+def test_stitched_copy_is_a_short_lived_derivative(client_builder, fake_piper):
+  script, _ = fake_piper
+  client, media_dir, _, main = client_builder(PIPER_BIN=str(script))
+  stitched = client.post("/tts", params={"json": 1}, json={"text": "One. Two.", "voice_id": "en_US"}).json()
+  assert stitched["duration_ms"] == 400
+  filename = stitched["audio_url"].rsplit("/", 1)[-1]
+
+  evictor = main.get_cache_evictor()
+  evictor.grace_seconds = evictor.derived_ttl_seconds = 0
+  time.sleep(0.01)
+  # The spliced copy expires (here or on the evictor thread); the two sentence entries stay.
+  evictor.run_once()
+  assert not (media_dir / filename).exists()
+  assert len(list(media_dir.glob("*.wav"))) == 2
+
+
+def test_whitespace_only_text_is_rejected(client_builder):
+  client, _, _, _ = client_builder()
+  assert client.post("/tts", json={"text": " \n ", "voice_id": "en_US"}).status_code == 422
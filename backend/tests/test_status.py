@@ -1,3 +1,7 @@
+import time
+
+from conftest import wait_for
+
 
 def test_status_reports_usage(client_builder, tmp_path):
   voices_dir = tmp_path / 'voice_models'
@@ -8,7 +12,44 @@ def test_status_reports_usage(client_builder, tmp_path):
 
   resp = client.get('/status')
   assert resp.status_code == 200
-  payload = resp.json()
-  assert payload['disk_free_mb'] > 0
-  assert payload['cache_usage_mb'] >= 1
-  assert payload['model_usage_mb'] >= 2
+  assert resp.json()['disk_free_mb'] > 0
+  # The first scan runs in the background rather than inside the request.
+  assert wait_for(lambda: client.get('/status').json()['cache_usage_mb'] >= 1)
+  assert client.get('/status').json()['model_usage_mb'] >= 2
+
+
+def test_status_counters_track_writes_without_rescanning(client_builder, monkeypatch):
+  client, media_dir, _, main = client_builder()
+  from tts_service import system
+
+  assert client.get('/status').json()['cache_entries'] == 0
+  assert wait_for(lambda: system.get_usage_counters()._reconciled_at is not None)
+  monkeypatch.setattr(system, '_scan_cache', lambda media_dir: (_ for _ in ()).throw(AssertionError('rescanned')))
+
+  payload = {'text': 'counted', 'voice_id': 'en_US'}
+  filename = client.post('/tts', params={'json': 1}, json=payload).json()['audio_url'].split('/media/')[-1]
+  client.post('/tts', params={'json': 1}, json=payload)
+  status = client.get('/status').json()
+  assert status['cache_entries'] == 1
+  assert status['cache_hits'] == 1
+  assert status['cache_misses'] == 1
+  assert status['cache_hit_rate'] == 0.5
+  size = (media_dir / filename).stat().st_size
+  assert system.get_usage_counters().cache_bytes == size
+
+  client.delete(f'/tts/cache/{filename}')
+  assert system.get_usage_counters().cache_bytes == 0
+
+
+def test_status_reconciles_in_background_when_stale(client_builder):
+  client, media_dir, _, _ = client_builder(STATUS_RECONCILE_SECONDS='0')
+  from tts_service import system
+
+  counters = system.get_usage_counters()
+  client.get('/status')
+  (media_dir / 'stray.wav').write_bytes(b'z' * 2048)
+  client.get('/status')
+  deadline = time.monotonic() + 2
+  while counters.cache_bytes != 2048 and time.monotonic() < deadline:
+    time.sleep(0.01)
+  assert counters.cache_entries == 1
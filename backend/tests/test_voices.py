@@ -1,6 +1,14 @@
+import hashlib
 import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
 
-import httpx
+import pytest
+from conftest import wait_for
 
 
 def _manifest(entries):
@@ -36,28 +44,243 @@ def test_voice_listing_marks_installation(client_builder, tmp_path):
   assert resp_second.json()['voices'][0]['installed'] is True
 
 
-def test_voice_download_fetches_file(client_builder, tmp_path, monkeypatch):
+@pytest.fixture
+def voice_server():
+  """Local HTTP server for voice files that honours ``Range``/``If-Range`` and can fail, drop or
+  stall mid-body."""
+  files = {}
+  requests = []
+  if_ranges = []
+  state = {'drop_after': None, 'hold': None, 'status': None}
+
+  class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+      pass
+
+    def do_GET(self):
+      body = files.get(self.path)
+      requests.append((self.path, self.headers.get('Range')))
+      if body is None:
+        self.send_error(404)
+        return
+      failure, state['status'] = state['status'], None
+      if failure:
+        self.send_error(failure)
+        return
+      etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+      if_range = self.headers.get('If-Range')
+      if_ranges.append(if_range)
+      start = 0
+      match = re.fullmatch(r'bytes=(\d+)-', self.headers.get('Range') or '')
+      if match and if_range in (None, etag):
+        start = int(match.group(1))
+        if start >= len(body):
+          self.send_response(416)
+          self.send_header('Content-Range', f'bytes */{len(body)}')
+          self.send_header('Content-Length', '0')
+          self.end_headers()
+          return
+        self.send_response(206)
+        self.send_header('Content-Range', f'bytes {start}-{len(body) - 1}/{len(body)}')
+      else:
+        self.send_response(200)
+      self.send_header('ETag', etag)
+      self.send_header('Content-Length', str(len(body) - start))
+      self.end_headers()
+      drop_after, state['drop_after'] = state['drop_after'], None
+      if state['hold'] is not None:
+        # Send a first slice, then stall until the test releases the transfer.
+        self.wfile.write(body[start:start + 1000])
+        self.wfile.flush()
+        state['hold'].wait(timeout=5)
+        start += 1000
+      self.wfile.write(body[start:start + drop_after] if drop_after else body[start:])
+      if drop_after:
+        self.close_connection = True
+
+  server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+  thread = threading.Thread(target=server.serve_forever, daemon=True)
+  thread.start()
+  base = f'http://127.0.0.1:{server.server_address[1]}'
+  yield SimpleNamespace(base=base, files=files, requests=requests, if_ranges=if_ranges, state=state)
+  server.shutdown()
+  server.server_close()
+
+
+def _download_setup(client_builder, tmp_path, voice_server, body, env=None, voice_ids=('en_US',), **extra):
+  entries = []
+  for voice_id in voice_ids:
+    voice_server.files[f'/{voice_id}.onnx'] = body
+    entry = _voice_entry(voice_id, filename=f'{voice_id}.onnx', download_url=f'{voice_server.base}/{voice_id}.onnx')
+    entry.update(extra)
+    entries.append(entry)
   manifest_path = tmp_path / 'manifest.json'
-  manifest_path.write_text(_manifest([_voice_entry('en_US', filename='en_US.onnx', download_url='https://voice.example/en_US.onnx')]))
+  manifest_path.write_text(_manifest(entries))
   voices_dir = tmp_path / 'voices'
   voices_dir.mkdir()
+  client, _, _, _ = client_builder(VOICE_MANIFEST_PATH=str(manifest_path), VOICE_DIR=str(voices_dir), **(env or {}))
+  return client, voices_dir
+
+
+def _download(client, voice_id='en_US'):
+  resp = client.post('/voices/download', json={'voice_id': voice_id})
+  assert resp.status_code == 202
+  job_id = resp.json()['job_id']
+  assert wait_for(lambda: client.get(f'/voices/download/{job_id}').json()['status'] not in ('queued', 'running'))
+  return client.get(f'/voices/download/{job_id}').json()
+
+
+def test_voice_download_fetches_file(client_builder, tmp_path, voice_server):
+  body = b'onnx-bytes' * 1000
+  client, voices_dir = _download_setup(client_builder, tmp_path, voice_server, body, sha256=hashlib.sha256(body).hexdigest())
+
+  job = _download(client)
+  assert (job['status'], job['bytes_done'], job['bytes_total'], job['progress']) == ('done', len(body), len(body), 1.0)
+  assert (voices_dir / 'en_US.onnx').read_bytes() == body
+  assert not (voices_dir / 'en_US.onnx.download').exists()
+  assert client.get('/voices').json()['voices'][0]['status'] == 'installed'
+  # An installed voice answers with a finished job straight away.
+  assert client.post('/voices/download', json={'voice_id': 'en_US'}).json()['status'] == 'done'
+  assert client.post('/voices/download', json={'voice_id': 'missing'}).status_code == 404
+
+
+def test_voice_download_resumes_partial_and_dropped_transfers(client_builder, tmp_path, voice_server):
+  body = bytes(range(256)) * 64
+  client, voices_dir = _download_setup(client_builder, tmp_path, voice_server, body, sha256=hashlib.sha256(body).hexdigest())
+  # A previous process got the first 1000 bytes; this attempt then loses its connection again.
+  (voices_dir / 'en_US.onnx.download').write_bytes(body[:1000])
+  voice_server.state['drop_after'] = 3000
+
+  assert _download(client)['status'] == 'done'
+  assert (voices_dir / 'en_US.onnx').read_bytes() == body
+  assert voice_server.requests == [('/en_US.onnx', 'bytes=1000-'), ('/en_US.onnx', 'bytes=4000-')]
+
+
+def test_voice_download_restarts_partial_of_a_changed_or_shorter_file(client_builder, tmp_path, voice_server):
+  old, new = b'old-version' * 300, b'new-version' * 200
+  client, voices_dir = _download_setup(client_builder, tmp_path, voice_server, old)
+  partial = voices_dir / 'en_US.onnx.download'
+  # A dropped transfer resumes with If-Range set to the ETag the partial was started with.
+  voice_server.state['drop_after'] = 1000
+  assert _download(client)['status'] == 'done'
+  etag = voice_server.if_ranges[1]
+  assert voice_server.if_ranges[0] is None and etag.startswith('"')
+
+  # Half of the old version is left over when the upstream file changes.
+  client.delete('/voices/en_US')
+  partial.write_bytes(old[:1000])
+  (voices_dir / 'en_US.onnx.download.validator').write_text(etag)
+  voice_server.files['/en_US.onnx'] = new
+  assert _download(client)['status'] == 'done'
+  assert (voices_dir / 'en_US.onnx').read_bytes() == new
+  assert not (voices_dir / 'en_US.onnx.download.validator').exists()
+
+  # A leftover partial longer than the current file gets 416 "bytes */N" and starts over.
+  client.delete('/voices/en_US')
+  partial.write_bytes(old)
+  assert _download(client)['status'] == 'done'
+  assert (voices_dir / 'en_US.onnx').read_bytes() == new
+  assert voice_server.requests[-2:] == [('/en_US.onnx', f'bytes={len(old)}-'), ('/en_US.onnx', None)]
+
+
+def test_voice_download_keeps_partial_after_retryable_failure(client_builder, tmp_path, voice_server):
+  body = b'v' * 4000
+  client, voices_dir = _download_setup(client_builder, tmp_path, voice_server, body, sha256=hashlib.sha256(body).hexdigest())
+  partial = voices_dir / 'en_US.onnx.download'
+  partial.write_bytes(body[:1500])
+  voice_server.state['status'] = 503
+  assert _download(client)['status'] == 'failed'
+  assert partial.read_bytes() == body[:1500]
 
-  class DummyClient:
-    def __enter__(self):
-      return self
+  assert _download(client)['status'] == 'done'
+  assert voice_server.requests[-1] == ('/en_US.onnx', 'bytes=1500-')
 
-    def __exit__(self, exc_type, exc, tb):
-      return False
+  client.delete('/voices/en_US')
+  partial.write_bytes(body[:1500])
+  voice_server.state['status'] = 403
+  assert _download(client)['status'] == 'failed'
+  assert not partial.exists()
 
-    def get(self, url):
-      self.url = url
-      return httpx.Response(200, content=b'onnx-bytes')
 
-  monkeypatch.setattr('tts_service.voices.httpx.Client', lambda timeout: DummyClient())
+def test_voice_download_rejects_checksum_mismatch(client_builder, tmp_path, voice_server):
+  client, voices_dir = _download_setup(client_builder, tmp_path, voice_server, b'tampered', sha256='0' * 64)
+
+  job = _download(client)
+  assert (job['status'], job['error']) == ('failed', 'voice download failed checksum verification')
+  assert list(voices_dir.iterdir()) == []
+  assert client.get('/voices').json()['voices'][0]['installed'] is False
+
+
+def test_voice_downloads_are_deduplicated_capped_and_cancellable(client_builder, tmp_path, voice_server):
+  body = b'x' * 5000
+  client, voices_dir = _download_setup(
+      client_builder, tmp_path, voice_server, body, env={'VOICE_DOWNLOAD_CONCURRENCY': '1'}, voice_ids=('en_US', 'fr_FR')
+  )
+  voice_server.state['hold'] = threading.Event()
+
+  first = client.post('/voices/download', json={'voice_id': 'en_US'}).json()
+  assert client.post('/voices/download', json={'voice_id': 'en_US'}).json()['job_id'] == first['job_id']
+  second = client.post('/voices/download', json={'voice_id': 'fr_FR'}).json()
+  job_path = f"/voices/download/{first['job_id']}"
+  assert wait_for(lambda: client.get(job_path).json()['bytes_done'] == 1000)
+  listed = {voice['id']: voice for voice in client.get('/voices').json()['voices']}
+  assert listed['en_US']['status'] == 'downloading'
+  assert listed['en_US']['download']['bytes_total'] == len(body)
+  # One worker: the second voice waits its turn.
+  assert client.get(f"/voices/download/{second['job_id']}").json()['status'] == 'queued'
+
+  assert client.delete(job_path).json()['status'] == 'cancelled'
+  voice_server.state['hold'].set()
+  assert _download(client, 'fr_FR')['status'] == 'done'
+  assert client.get(job_path).json()['status'] == 'cancelled'
+  assert sorted(path.name for path in voices_dir.iterdir()) == ['fr_FR.onnx']
+  assert client.delete('/voices/download/unknown').status_code == 404
+
+
+def test_voice_catalog_is_cached_indexed_and_tracks_deletes(client_builder, tmp_path, monkeypatch):
+  manifest_path = tmp_path / 'manifest.json'
+  manifest_path.write_text(_manifest([dict(_voice_entry('en_US', 'en_US.onnx'), language='en-US'), dict(_voice_entry('fr_FR', 'fr_FR.onnx'), language='fr-FR')]))
+  voices_dir = tmp_path / 'voices'
+  voices_dir.mkdir()
+  (voices_dir / 'en_US.onnx').write_bytes(b'voice')
   client, _, _, _ = client_builder(VOICE_MANIFEST_PATH=str(manifest_path), VOICE_DIR=str(voices_dir))
+  from tts_service import voices
+
+  parses = []
+  original_parse = voices._parse_manifest
+  monkeypatch.setattr(voices, '_parse_manifest', lambda raw: parses.append(raw) or original_parse(raw))
+
+  assert [voice['id'] for voice in client.get('/voices').json()['voices']] == ['en_US', 'fr_FR']
+  assert [voice['id'] for voice in client.get('/voices', params={'language': 'fr'}).json()['voices']] == ['fr_FR']
+  assert [voice['id'] for voice in client.get('/voices', params={'language': 'en_us'}).json()['voices']] == ['en_US']
+  assert len(parses) == 1
 
-  resp = client.post('/voices/download', json={'voice_id': 'en_US'})
+  # Touching the file without changing it re-hashes but does not re-parse; an edit does.
+  os.utime(manifest_path, ns=(time.time_ns(), time.time_ns() + 10**9))
+  client.get('/voices')
+  assert len(parses) == 1
+  manifest_path.write_text(_manifest([_voice_entry('en_US', 'en_US.onnx')]))
+  os.utime(manifest_path, ns=(time.time_ns(), time.time_ns() + 2 * 10**9))
+  assert [voice['id'] for voice in client.get('/voices').json()['voices']] == ['en_US']
+  assert len(parses) == 2
+
+  assert client.get('/voices').json()['voices'][0]['installed'] is True
+  resp = client.delete('/voices/en_US')
   assert resp.status_code == 200
-  payload = resp.json()
-  assert payload['status'] == 'ready'
-  assert (voices_dir / 'en_US.onnx').read_bytes() == b'onnx-bytes'
+  assert resp.json()['installed'] is False
+  assert not (voices_dir / 'en_US.onnx').exists()
+  assert client.get('/voices').json()['voices'][0]['status'] == 'available'
+  assert client.delete('/voices/missing').status_code == 404
+
+
+def test_voice_catalog_matches_underscore_style_languages(client_builder, tmp_path):
+  manifest_path = tmp_path / 'manifest.json'
+  manifest_path.write_text(_manifest([dict(_voice_entry('en_US', 'en_US.onnx'), language='en_US'), dict(_voice_entry('en_GB', 'en_GB.onnx'), language='en-GB')]))
+  client, _, _, _ = client_builder(VOICE_MANIFEST_PATH=str(manifest_path), VOICE_DIR=str(tmp_path / 'voices'))
+
+  def ids(language):
+    return [voice['id'] for voice in client.get('/voices', params={'language': language}).json()['voices']]
+
+  assert ids('en_US') == ids('en-us') == ['en_US']
+  assert ids('en_gb') == ['en_GB']
+  assert ids('en') == ['en_US', 'en_GB']
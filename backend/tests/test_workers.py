@@ -0,0 +1,48 @@
+import threading
+import time
+
+from conftest import wait_for
+from tts_service.workers import BackgroundWorkers
+
+
+def _workers(idle_seconds, keep_alive=None):
+  lock = threading.Lock()
+  queue, done = [], []
+  workers = BackgroundWorkers(
+      "test-worker",
+      lock,
+      lambda: queue.pop(0) if queue else None,
+      done.append,
+      limit=2,
+      idle_seconds=idle_seconds,
+      keep_alive=keep_alive,
+  )
+
+  def submit(item):
+    with lock:
+      queue.append(item)
+      workers.wake()
+
+  return workers, submit, done
+
+
+def test_work_queued_around_an_idle_timeout_is_never_lost():
+  workers, submit, done = _workers(idle_seconds=0.001)
+  for item in range(200):
+    submit(item)
+    # Lands before, during or after the worker's timed-out wait.
+    time.sleep(0.001 * (item % 3))
+  assert wait_for(lambda: len(done) == 200)
+  assert sorted(done) == list(range(200))
+  assert wait_for(lambda: not workers._threads)
+
+
+def test_keep_alive_holds_idle_threads():
+  alive = [True]
+  workers, submit, done = _workers(idle_seconds=0.01, keep_alive=lambda: alive[0])
+  submit("x")
+  assert wait_for(lambda: done == ["x"])
+  time.sleep(0.05)
+  assert len(workers._threads) == 1
+  alive[0] = False
+  assert wait_for(lambda: not workers._threads)
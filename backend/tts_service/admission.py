@@ -0,0 +1,198 @@
+"""CPU-aware admission control for synthesis: bounded concurrency, a bounded wait queue and a
+budget of estimated synthesis seconds."""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Deque, Dict, Optional
+
+from fastapi import HTTPException, status
+
+from .metrics import RATE_LIMIT_REJECTIONS
+from .settings import get_settings
+
+
+class AdmissionController:
+  """Admits up to ``limit`` concurrent syntheses and parks at most ``queue_size`` more.
+
+  Anything beyond that is rejected immediately with 503 and a ``Retry-After`` estimated
+  from the recent service time, so throughput stays flat past saturation instead of every
+  request slowing down together.
+
+  Each request also declares its estimated synthesis seconds. When ``backlog_seconds`` is set,
+  work that would push the admitted-plus-queued estimate past it is rejected up front, so a
+  few very long texts cannot fill the queue that short ones are waiting in. An idle controller
+  always admits, however large the request.
+  """
+
+  def __init__(self, limit: int, queue_size: int, backlog_seconds: float = 0.0):
+    self.limit = max(1, limit)
+    self.queue_size = max(0, queue_size)
+    self.backlog_seconds = max(0.0, backlog_seconds)
+    self.active = 0
+    self.backlog = 0.0
+    self._waiters: Deque[asyncio.Future] = deque()
+    self._lock = threading.Lock()
+    self._avg_service_seconds = 1.0
+
+  @property
+  def queued(self) -> int:
+    return len(self._waiters)
+
+  def retry_after_seconds(self) -> int:
+    backlog = self.queued + self.active
+    by_count = backlog * self._avg_service_seconds / self.limit
+    return max(1, math.ceil(max(by_count, self.backlog / self.limit)))
+
+  def _reject(self, detail: str, reason: str) -> HTTPException:
+    RATE_LIMIT_REJECTIONS.inc(reason=reason)
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=detail,
+        headers={"Retry-After": str(self.retry_after_seconds())},
+    )
+
+  async def acquire(self, cost_seconds: float = 0.0) -> None:
+    with self._lock:
+      busy = self.active or self._waiters
+      if self.backlog_seconds and busy and self.backlog + cost_seconds > self.backlog_seconds:
+        raise self._reject("synthesis budget exhausted", "synthesis_backlog")
+      if self.active < self.limit and not self._waiters:
+        self.active += 1
+        self.backlog += cost_seconds
+        return
+      if len(self._waiters) >= self.queue_size:
+        raise self._reject("synthesis queue full", "synthesis_queue")
+      waiter = asyncio.get_running_loop().create_future()
+      self._waiters.append(waiter)
+      self.backlog += cost_seconds
+    try:
+      await waiter
+    except asyncio.CancelledError:
+      with self._lock:
+        granted = waiter.done() and not waiter.cancelled()
+        if not granted:
+          if waiter in self._waiters:
+            self._waiters.remove(waiter)
+          self.backlog = max(0.0, self.backlog - cost_seconds)
+      if granted:
+        # The slot was handed over just as we were cancelled; pass it on.
+        self.release(cost_seconds)
+      raise
+
+  def try_acquire(self, cost_seconds: float = 0.0, reserve: int = 1) -> bool:
+    """Takes a slot only if nobody is waiting and ``reserve`` slots stay free for callers of
+    ``acquire``; never queues. Background work uses this so it only fills idle capacity. A fully
+    idle controller always grants the slot, so background work still progresses when
+    ``limit <= reserve``."""
+    with self._lock:
+      if self._waiters or (self.active and self.active >= self.limit - reserve):
+        return False
+      if self.backlog_seconds and self.active and self.backlog + cost_seconds > self.backlog_seconds:
+        return False
+      self.active += 1
+      self.backlog += cost_seconds
+      return True
+
+  def release(self, cost_seconds: float = 0.0) -> None:
+    with self._lock:
+      self.backlog = max(0.0, self.backlog - cost_seconds)
+      while self._waiters:
+        waiter = self._waiters.popleft()
+        if waiter.done():
+          continue
+        # Hand the slot straight to the next waiter; ``active`` stays the same.
+        loop = waiter.get_loop()
+        if _running_loop() is loop:
+          waiter.set_result(None)
+        else:
+          loop.call_soon_threadsafe(self._grant, waiter)
+        return
+      self.active = max(0, self.active - 1)
+
+  def _grant(self, waiter: asyncio.Future) -> None:
+    if waiter.done():
+      # Cancelled while the hand-off was in flight.
+      self.release()
+    else:
+      waiter.set_result(None)
+
+  def record_service_time(self, seconds: float) -> None:
+    self._avg_service_seconds = 0.8 * self._avg_service_seconds + 0.2 * seconds
+
+  @asynccontextmanager
+  async def slot(self, cost_seconds: float = 0.0) -> AsyncIterator[None]:
+    await self.acquire(cost_seconds)
+    started = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.record_service_time(time.perf_counter() - started)
+      self.release(cost_seconds)
+
+
+class SynthesisCostModel:
+  """Per-voice estimate of synthesis seconds per character, learned from finished syntheses.
+
+  Also tracks the real-time factor (synthesis time / audio time) per voice for reporting.
+  Voices without measurements use ``default_seconds_per_char``.
+  """
+
+  def __init__(self, default_seconds_per_char: float, alpha: float = 0.2):
+    self.default_seconds_per_char = default_seconds_per_char
+    self.alpha = alpha
+    self._seconds_per_char: Dict[str, float] = {}
+    self._rtf: Dict[str, float] = {}
+    self._lock = threading.Lock()
+
+  def estimate_seconds(self, voice_id: str, chars: int) -> float:
+    with self._lock:
+      rate = self._seconds_per_char.get(voice_id, self.default_seconds_per_char)
+    return rate * chars
+
+  def record(self, voice_id: str, chars: int, seconds: float, audio_ms: Optional[int] = None) -> None:
+    if chars <= 0 or seconds <= 0:
+      return
+    with self._lock:
+      previous = self._seconds_per_char.get(voice_id)
+      sample = seconds / chars
+      self._seconds_per_char[voice_id] = sample if previous is None else (1 - self.alpha) * previous + self.alpha * sample
+      if audio_ms:
+        rtf = seconds / (audio_ms / 1000)
+        previous_rtf = self._rtf.get(voice_id)
+        self._rtf[voice_id] = rtf if previous_rtf is None else (1 - self.alpha) * previous_rtf + self.alpha * rtf
+
+  def stats(self) -> Dict[str, Dict[str, float]]:
+    with self._lock:
+      return {
+          voice_id: {"seconds_per_char": round(rate, 6), "rtf": round(self._rtf.get(voice_id, 0.0), 4)}
+          for voice_id, rate in self._seconds_per_char.items()
+      }
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+  try:
+    return asyncio.get_running_loop()
+  except RuntimeError:
+    return None
+
+
+@lru_cache(maxsize=1)
+def get_admission_controller() -> AdmissionController:
+  settings = get_settings()
+  return AdmissionController(
+      settings.synthesis_concurrency,
+      settings.synthesis_queue_size,
+      backlog_seconds=settings.synthesis_backlog_seconds,
+  )
+
+
+@lru_cache(maxsize=1)
+def get_synthesis_costs() -> SynthesisCostModel:
+  return SynthesisCostModel(get_settings().synthesis_seconds_per_char)
@@ -4,17 +4,20 @@ from __future__ import annotations
 
 import json
 import re
+import sqlite3
 import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from functools import lru_cache
 from hashlib import sha1
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 from fastapi import HTTPException, status
 
 from .settings import Settings, get_settings
 
-CACHE_FILENAME_PATTERN = re.compile(r"^[a-f0-9]{12}-[A-Za-z0-9_-]+\.wav$", re.IGNORECASE)
+CACHE_FILENAME_PATTERN = re.compile(r"^[a-f0-9]{12}-[A-Za-z0-9_-]+\.(wav|flac|opus|mp3)$", re.IGNORECASE)
 
 
 def build_cache_key(parts: List[str]) -> str:
@@ -38,60 +41,170 @@ def resolve_cache_path(settings: Settings, filename: str) -> Path:
   return candidate
 
 
+class _KnownPairs:
+  """Bounded LRU of (book, file) pairs known to be stored, indexed by file and by book so removals
+  only touch the affected pairs. Callers hold the lock."""
+
+  def __init__(self, limit: int):
+    self.limit = max(1, limit)
+    self.lock = threading.Lock()
+    self._pairs: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+    self._by_file: Dict[str, Set[str]] = {}
+    self._by_book: Dict[str, Set[str]] = {}
+
+  def __len__(self) -> int:
+    return len(self._pairs)
+
+  def hit(self, book_id: str, filename: str) -> bool:
+    pair = (book_id, filename)
+    if pair not in self._pairs:
+      return False
+    self._pairs.move_to_end(pair)
+    return True
+
+  def add(self, book_id: str, filename: str) -> None:
+    self._pairs[(book_id, filename)] = None
+    self._by_file.setdefault(filename, set()).add(book_id)
+    self._by_book.setdefault(book_id, set()).add(filename)
+    while len(self._pairs) > self.limit:
+      old_book, old_file = self._pairs.popitem(last=False)[0]
+      self._unlink(self._by_file, old_file, old_book)
+      self._unlink(self._by_book, old_book, old_file)
+
+  def forget_file(self, filename: str) -> None:
+    for book_id in self._by_file.pop(filename, ()):
+      del self._pairs[(book_id, filename)]
+      self._unlink(self._by_book, book_id, filename)
+
+  def forget_book(self, book_id: str) -> None:
+    for filename in self._by_book.pop(book_id, ()):
+      del self._pairs[(book_id, filename)]
+      self._unlink(self._by_file, filename, book_id)
+
+  @staticmethod
+  def _unlink(mapping: Dict[str, Set[str]], key: str, value: str) -> None:
+    values = mapping.get(key)
+    if values is not None:
+      values.discard(value)
+      if not values:
+        del mapping[key]
+
+
 class AudioIndex:
-  """Persists the mapping of book_id → cached filenames for cleanup."""
+  """Persists the mapping of book_id → cached filenames for cleanup.
 
-  def __init__(self, path: Path):
-    self.path = path
-    self._lock = threading.Lock()
-    self._ensure_store()
+  Backed by SQLite in WAL mode with one row per (book, file) pair, indexed both ways, so adding
+  or removing a clip touches a single row instead of rewriting the whole index. A legacy
+  ``audio_index.json`` next to the database is imported once and renamed to ``*.migrated``.
+  """
 
-  def _ensure_store(self) -> None:
-    if not self.path.exists():
-      self.path.write_text(json.dumps({"by_book": {}}, indent=2))
+  _SCHEMA_VERSION = 1
+  # Pairs remembered as already stored; older ones just cost one INSERT OR IGNORE when seen again.
+  KNOWN_PAIRS_LIMIT = 100_000
 
-  def _load(self) -> Dict[str, List[str]]:
+  def __init__(self, path: Path, legacy_json: Optional[Path] = None, known_limit: int = KNOWN_PAIRS_LIMIT):
+    self.path = path
+    self._lock = threading.Lock()
+    # Pairs already on disk; repeat cache hits for the same book skip the write entirely. Its own
+    # lock is only held for dictionary updates, so hits never wait behind a database query.
+    self._known = _KnownPairs(known_limit)
+    self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+    self._conn.execute("PRAGMA journal_mode=WAL")
+    self._conn.execute("PRAGMA synchronous=NORMAL")
+    self._ensure_store(legacy_json)
+
+  def _ensure_store(self, legacy_json: Optional[Path]) -> None:
+    with self._lock:
+      version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+      if version >= self._SCHEMA_VERSION:
+        return
+      with self._transaction():
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS book_audio ("
+            " book_id TEXT NOT NULL, filename TEXT NOT NULL, PRIMARY KEY (book_id, filename)"
+            ") WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS book_audio_by_file ON book_audio (filename)")
+        if legacy_json is not None and legacy_json.exists():
+          self._import_legacy(legacy_json)
+        self._conn.execute(f"PRAGMA user_version = {self._SCHEMA_VERSION}")
+      if legacy_json is not None and legacy_json.exists():
+        legacy_json.replace(legacy_json.with_name(legacy_json.name + ".migrated"))
+
+  def _import_legacy(self, legacy_json: Path) -> None:
     try:
-      data = json.loads(self.path.read_text())
-    except FileNotFoundError:
-      data = {"by_book": {}}
-    return data.get("by_book", {})
-
-  def _save(self, content: Dict[str, List[str]]) -> None:
-    self.path.write_text(json.dumps({"by_book": content}, indent=2))
+      by_book = json.loads(legacy_json.read_text() or "{}").get("by_book", {})
+    except ValueError:
+      by_book = {}
+    rows = [(book_id, filename) for book_id, files in by_book.items() for filename in files]
+    self._conn.executemany("INSERT OR IGNORE INTO book_audio (book_id, filename) VALUES (?, ?)", rows)
+
+  @contextmanager
+  def _transaction(self) -> Iterator[None]:
+    self._conn.execute("BEGIN IMMEDIATE")
+    try:
+      yield
+    except BaseException:
+      self._conn.execute("ROLLBACK")
+      raise
+    self._conn.execute("COMMIT")
 
   def add(self, book_id: Optional[str], filename: str) -> None:
     if not book_id:
       return
+    with self._known.lock:
+      if self._known.hit(book_id, filename):
+        return
     with self._lock:
-      data = self._load()
-      entries = data.setdefault(book_id, [])
-      if filename not in entries:
-        entries.append(filename)
-        self._save(data)
+      self._conn.execute("INSERT OR IGNORE INTO book_audio (book_id, filename) VALUES (?, ?)", (book_id, filename))
+      with self._known.lock:
+        self._known.add(book_id, filename)
 
   def remove(self, filename: str) -> None:
+    self.remove_many([filename])
+
+  def remove_many(self, filenames: Iterable[str]) -> None:
+    doomed = set(filenames)
+    if not doomed:
+      return
+    with self._lock, self._transaction():
+      self._conn.executemany("DELETE FROM book_audio WHERE filename = ?", [(name,) for name in doomed])
+      with self._known.lock:
+        for name in doomed:
+          self._known.forget_file(name)
+
+  def files_for_book(self, book_id: str) -> List[str]:
     with self._lock:
-      data = self._load()
-      changed = False
-      for book_id, files in list(data.items()):
-        if filename in files:
-          files.remove(filename)
-          changed = True
-        if not files:
-          data.pop(book_id, None)
-      if changed:
-        self._save(data)
+      rows = self._conn.execute("SELECT filename FROM book_audio WHERE book_id = ? ORDER BY filename", (book_id,))
+      return [row[0] for row in rows]
 
-  def pop_files_for_book(self, book_id: str) -> List[str]:
+  def books_for_file(self, filename: str) -> List[str]:
+    with self._lock:
+      rows = self._conn.execute("SELECT book_id FROM book_audio WHERE filename = ? ORDER BY book_id", (filename,))
+      return [row[0] for row in rows]
+
+  def books_by_file(self) -> Dict[str, List[str]]:
+    owners: Dict[str, List[str]] = {}
     with self._lock:
-      data = self._load()
-      files = data.pop(book_id, [])
-      self._save(data)
+      for book_id, filename in self._conn.execute("SELECT book_id, filename FROM book_audio"):
+        owners.setdefault(filename, []).append(book_id)
+    return owners
+
+  def pop_files_for_book(self, book_id: str) -> List[str]:
+    with self._lock, self._transaction():
+      rows = self._conn.execute("SELECT filename FROM book_audio WHERE book_id = ? ORDER BY filename", (book_id,))
+      files = [row[0] for row in rows]
+      self._conn.execute("DELETE FROM book_audio WHERE book_id = ?", (book_id,))
+      with self._known.lock:
+        self._known.forget_book(book_id)
       return files
 
+  def close(self) -> None:
+    with self._lock:
+      self._conn.close()
+
 
 @lru_cache(maxsize=1)
 def get_audio_index() -> AudioIndex:
   settings = get_settings()
-  return AudioIndex(settings.audio_index_file)
+  return AudioIndex(settings.audio_index_db, legacy_json=settings.audio_index_file)
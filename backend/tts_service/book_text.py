@@ -0,0 +1,180 @@
+"""Server-side book text extraction, paragraph-for-paragraph with the reader's parsers.
+
+``last_read_location.para`` indexes the paragraphs the frontend builds in
+``public/js/parser/{txt,epub}.js``; these functions reproduce those rules so a paragraph index
+means the same thing on both sides and server-rendered audio hits the reader's cache keys.
+"""
+
+from __future__ import annotations
+
+import posixpath
+import re
+import zipfile
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote
+from xml.etree import ElementTree
+
+_BLANK_LINES = re.compile(r"\r?\n\s*\r?\n+")
+_WHITESPACE = re.compile(r"\s+")
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+_EPUB_BLOCKS = {"h1", "h2", "h3", "p", "div", "section"}
+_EPUB_HEADINGS = {"h1", "h2", "h3"}
+
+
+class BookParseError(ValueError):
+  """The stored file could not be read as a book."""
+
+
+@dataclass
+class BookText:
+  paragraphs: List[str] = field(default_factory=list)
+  # (title, index of the first paragraph after the heading)
+  chapters: List[Tuple[str, int]] = field(default_factory=list)
+
+
+def _looks_like_heading(line: str) -> bool:
+  if re.match(r"chapter\b", line, re.IGNORECASE):
+    return True
+  letters = re.sub(r"[^A-Za-z]", "", line)
+  if not letters:
+    return False
+  return len(re.sub(r"[^A-Z]", "", line)) / len(letters) > 0.6
+
+
+def parse_txt(data: bytes) -> BookText:
+  text = data.decode("utf-8", errors="replace")
+  paragraphs = [para.strip() for para in _BLANK_LINES.split(text)]
+  paragraphs = [para for para in paragraphs if para]
+  chapters = [(para[:80], index) for index, para in enumerate(paragraphs) if _looks_like_heading(para)]
+  return BookText(paragraphs, chapters)
+
+
+class _BlockExtractor(HTMLParser):
+  """Collects the text of every block element in document order, nested ones included, the way
+  ``querySelectorAll('h1, h2, h3, p, div, section')`` followed by ``textContent`` does."""
+
+  def __init__(self) -> None:
+    super().__init__(convert_charrefs=True)
+    self.blocks: List[Tuple[str, List[str]]] = []
+    self._open: List[Tuple[str, List[str]]] = []
+    self._in_body = False
+
+  def handle_starttag(self, tag: str, attrs) -> None:
+    tag = tag.lower().rsplit(":", 1)[-1]
+    if tag == "body":
+      self._in_body = True
+    elif self._in_body and tag in _EPUB_BLOCKS:
+      block: Tuple[str, List[str]] = (tag, [])
+      self.blocks.append(block)
+      self._open.append(block)
+
+  def handle_startendtag(self, tag: str, attrs) -> None:
+    # Self-closing blocks (``<div/>``) are empty; do not leave them open.
+    tag = tag.lower().rsplit(":", 1)[-1]
+    if self._in_body and tag in _EPUB_BLOCKS:
+      self.blocks.append((tag, []))
+
+  def handle_endtag(self, tag: str) -> None:
+    tag = tag.lower().rsplit(":", 1)[-1]
+    if tag == "body":
+      self._in_body = False
+      self._open.clear()
+      return
+    for position in range(len(self._open) - 1, -1, -1):
+      if self._open[position][0] == tag:
+        del self._open[position:]
+        break
+
+  def handle_data(self, data: str) -> None:
+    for _, parts in self._open:
+      parts.append(data)
+
+
+def _extract_blocks(markup: str, book: BookText) -> None:
+  parser = _BlockExtractor()
+  parser.feed(markup)
+  parser.close()
+  for tag, parts in parser.blocks:
+    text = _WHITESPACE.sub(" ", "".join(parts)).strip()
+    if not text:
+      continue
+    if tag in _EPUB_HEADINGS:
+      if len(text) >= 3:
+        book.chapters.append((text, len(book.paragraphs)))
+    elif len(text) > 20:
+      book.paragraphs.append(text)
+
+
+def _local(tag: str) -> str:
+  return tag.rsplit("}", 1)[-1]
+
+
+def parse_epub(data_path: Path) -> BookText:
+  try:
+    with zipfile.ZipFile(data_path) as archive:
+      container = ElementTree.fromstring(archive.read("META-INF/container.xml"))
+      rootfile = next((el for el in container.iter() if _local(el.tag) == "rootfile"), None)
+      if rootfile is None or not rootfile.get("full-path"):
+        raise BookParseError("rootfile missing")
+      root_path = rootfile.get("full-path")
+      package = ElementTree.fromstring(archive.read(root_path))
+      manifest: Dict[str, str] = {}
+      spine: List[str] = []
+      for element in package.iter():
+        name = _local(element.tag)
+        if name == "item" and element.get("id"):
+          manifest[element.get("id")] = element.get("href", "")
+        elif name == "itemref" and element.get("idref"):
+          spine.append(element.get("idref"))
+      book = BookText()
+      base = posixpath.dirname(root_path)
+      for idref in spine:
+        href: Optional[str] = manifest.get(idref)
+        if not href:
+          continue
+        full_path = posixpath.normpath(posixpath.join(base, unquote(href)))
+        try:
+          markup = archive.read(full_path).decode("utf-8", errors="replace")
+        except KeyError:
+          continue
+        _extract_blocks(markup, book)
+      return book
+  except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as exc:
+    raise BookParseError(f"unreadable epub: {exc}") from exc
+
+
+def parse_book(path: Path) -> BookText:
+  if path.suffix.lower() == ".epub":
+    return parse_epub(path)
+  if path.suffix.lower() == ".txt":
+    return parse_txt(path.read_bytes())
+  raise BookParseError(f"unsupported book format {path.suffix!r}")
+
+
+def split_for_synthesis(paragraph: str, max_chars: int) -> List[str]:
+  """Keeps a paragraph whole when it fits (so it shares the reader's cache key), otherwise splits
+  at sentence ends, and mid-sentence only when a single sentence is longer than ``max_chars``."""
+  if len(paragraph) <= max_chars:
+    return [paragraph]
+  chunks: List[str] = []
+  current = ""
+  for sentence in _SENTENCE_END.split(paragraph):
+    while len(sentence) > max_chars:
+      if current:
+        chunks.append(current)
+        current = ""
+      cut = sentence.rfind(" ", 0, max_chars)
+      cut = cut if cut > 0 else max_chars
+      chunks.append(sentence[:cut].strip())
+      sentence = sentence[cut:].strip()
+    if current and len(current) + 1 + len(sentence) > max_chars:
+      chunks.append(current)
+      current = sentence
+    else:
+      current = f"{current} {sentence}" if current else sentence
+  if current:
+    chunks.append(current)
+  return [chunk for chunk in chunks if chunk]
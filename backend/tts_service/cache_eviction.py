@@ -0,0 +1,236 @@
+"""Size-bounded audio cache: access tracking plus background LRU/LFU eviction."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .audio_cache import CACHE_FILENAME_PATTERN, AudioIndex, get_audio_index
+from .metrics import CACHE_EVICTIONS
+from .settings import get_settings
+from .system import get_usage_counters
+from .workers import BackgroundWorkers
+
+LOGGER = logging.getLogger(__name__)
+
+EVICTION_POLICIES = ("lru", "lfu")
+
+
+@dataclass
+class CacheEntry:
+  size: int
+  last_access: float
+  hits: int = 0
+  # Rebuildable from other entries (e.g. stitched sentences); evicted first and after an idle TTL.
+  derived: bool = False
+
+
+class CacheEvictor:
+  """Tracks cache entries in memory and trims ``media_dir`` back under budget off the request path.
+
+  Requests only update a dict under a lock and, when a limit is crossed, wake a daemon thread.
+  That thread scans the directory once (so files from earlier runs are accounted for), then evicts
+  down to ``low_water`` of each limit. Files owned by books read within ``book_idle_seconds`` go
+  last; within each group the policy picks least recently or least frequently used first.
+  Entries touched within ``grace_seconds`` are never evicted so a file handed out by a request is
+  still there when the client fetches it. Derived entries go before everything else and are
+  removed once idle for ``derived_ttl_seconds`` even under the limits; they are tracked even when
+  no limit is set.
+  """
+
+  def __init__(
+      self,
+      media_dir: Path,
+      audio_index: AudioIndex,
+      max_bytes: int,
+      max_entries: int,
+      policy: str = "lru",
+      book_idle_seconds: float = 86400,
+      grace_seconds: float = 10,
+      low_water: float = 0.9,
+      derived_ttl_seconds: float = 600,
+      clock: Callable[[], float] = time.time,
+      background: bool = True,
+  ):
+    if policy not in EVICTION_POLICIES:
+      raise ValueError(f"unknown eviction policy {policy!r}")
+    self.media_dir = media_dir
+    self.audio_index = audio_index
+    self.max_bytes = max(0, max_bytes)
+    self.max_entries = max(0, max_entries)
+    self.policy = policy
+    self.book_idle_seconds = book_idle_seconds
+    self.grace_seconds = grace_seconds
+    self.low_water = low_water
+    self.derived_ttl_seconds = derived_ttl_seconds
+    self.clock = clock
+    self.background = background
+    self.evicted = 0
+    self._entries: Dict[str, CacheEntry] = {}
+    self._book_reads: Dict[str, float] = {}
+    self._total_bytes = 0
+    self._scanned = False
+    self._lock = threading.Lock()
+    self._pending = False
+    self._workers = BackgroundWorkers(
+        "audio-cache-evictor", self._lock, self._claim_run, lambda _: self.run_once(), keep_alive=self._has_derived
+    )
+
+  @property
+  def enabled(self) -> bool:
+    return bool(self.max_bytes or self.max_entries)
+
+  def record_access(self, filename: str, book_id: Optional[str] = None, derived: bool = False) -> None:
+    """Counts a use of ``filename``; ``derived`` marks it as rebuildable for good."""
+    if not self.enabled and not derived:
+      return
+    now = self.clock()
+    with self._lock:
+      entry = self._entries.get(filename)
+      if entry is None:
+        try:
+          size = (self.media_dir / filename).stat().st_size
+        except FileNotFoundError:
+          return
+        entry = self._entries[filename] = CacheEntry(size=size, last_access=now)
+        self._total_bytes += size
+      entry.last_access = now
+      entry.hits += 1
+      entry.derived = entry.derived or derived
+      if book_id:
+        self._book_reads[book_id] = now
+      over = derived or not self._scanned or self._over_limit()
+    if over and self.background:
+      self._kick()
+
+  def touch_book(self, book_id: str) -> None:
+    with self._lock:
+      self._book_reads[book_id] = self.clock()
+
+  def forget(self, filename: str) -> None:
+    with self._lock:
+      entry = self._entries.pop(filename, None)
+      if entry is not None:
+        self._total_bytes -= entry.size
+
+  def stats(self) -> dict:
+    with self._lock:
+      return {
+          "entries": len(self._entries),
+          "bytes": self._total_bytes,
+          "max_bytes": self.max_bytes,
+          "max_entries": self.max_entries,
+          "policy": self.policy,
+          "evicted": self.evicted,
+      }
+
+  def _over_limit(self, factor: float = 1.0) -> bool:
+    if self.max_bytes and self._total_bytes > self.max_bytes * factor:
+      return True
+    return bool(self.max_entries and len(self._entries) > self.max_entries * factor)
+
+  def _kick(self) -> None:
+    with self._lock:
+      self._pending = True
+      self._workers.wake()
+
+  def _expired_derived(self) -> List[str]:
+    expire_before = self.clock() - max(self.derived_ttl_seconds, self.grace_seconds)
+    return [name for name, entry in self._entries.items() if entry.derived and entry.last_access < expire_before]
+
+  def _claim_run(self) -> Optional[bool]:
+    # Called under the lock: a pass is due when kicked or when a derived entry has expired.
+    if self._pending or self._expired_derived():
+      self._pending = False
+      return True
+    return None
+
+  def _has_derived(self) -> bool:
+    # Keeps the thread polling while derived entries are waiting to expire.
+    return any(entry.derived for entry in self._entries.values())
+
+  def _scan(self) -> None:
+    found: Dict[str, CacheEntry] = {}
+    for path in self.media_dir.iterdir():
+      if not CACHE_FILENAME_PATTERN.fullmatch(path.name):
+        continue
+      try:
+        stat = path.stat()
+      except FileNotFoundError:
+        continue
+      found[path.name] = CacheEntry(size=stat.st_size, last_access=stat.st_mtime)
+    with self._lock:
+      for filename, entry in found.items():
+        if filename not in self._entries:
+          self._entries[filename] = entry
+          self._total_bytes += entry.size
+      self._scanned = True
+
+  def _eviction_order(self) -> List[str]:
+    owners = self.audio_index.books_by_file()
+    now = self.clock()
+    with self._lock:
+      active_books = {book for book, read_at in self._book_reads.items() if now - read_at < self.book_idle_seconds}
+      candidates: List[Tuple[Tuple, str]] = []
+      for filename, entry in self._entries.items():
+        if now - entry.last_access < self.grace_seconds:
+          continue
+        in_active_book = any(book in active_books for book in owners.get(filename, ()))
+        usage = (entry.last_access,) if self.policy == "lru" else (entry.hits, entry.last_access)
+        candidates.append(((not entry.derived, in_active_book, *usage), filename))
+    candidates.sort()
+    return [filename for _, filename in candidates]
+
+  def run_once(self) -> List[str]:
+    """Drops expired derived entries, then evicts until both limits are under ``low_water``;
+    returns what went."""
+    if not self._scanned:
+      self._scan()
+    victims: List[str] = []
+    with self._lock:
+      expired = self._expired_derived()
+    for filename in expired:
+      self._remove(filename, victims)
+    with self._lock:
+      over = self._over_limit()
+    if over:
+      for filename in self._eviction_order():
+        with self._lock:
+          if not self._over_limit(self.low_water):
+            break
+        self._remove(filename, victims)
+    if victims:
+      self.audio_index.remove_many(victims)
+      self.evicted += len(victims)
+      CACHE_EVICTIONS.inc(len(victims))
+      LOGGER.info("evicted %d cached audio files", len(victims))
+    return victims
+
+  def _remove(self, filename: str, victims: List[str]) -> None:
+    with self._lock:
+      entry = self._entries.pop(filename, None)
+      if entry is None:
+        return
+      self._total_bytes -= entry.size
+    (self.media_dir / filename).unlink(missing_ok=True)
+    get_usage_counters().cache_removed(entry.size)
+    victims.append(filename)
+
+
+@lru_cache(maxsize=1)
+def get_cache_evictor() -> CacheEvictor:
+  settings = get_settings()
+  return CacheEvictor(
+      settings.media_dir,
+      get_audio_index(),
+      max_bytes=settings.audio_cache_max_mb * 1024 * 1024,
+      max_entries=settings.audio_cache_max_entries,
+      policy=settings.audio_cache_policy,
+      book_idle_seconds=settings.audio_cache_book_idle_seconds,
+      derived_ttl_seconds=settings.sentence_stitch_ttl_seconds,
+  )
@@ -2,13 +2,18 @@
 
 from __future__ import annotations
 
+import base64
+import bisect
 import hashlib
 import json
+import sqlite3
 import time
 import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
 from threading import Lock
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
 
 from fastapi import HTTPException, UploadFile, status
 
@@ -33,49 +38,293 @@ def _validate_last_read_location(value: Any) -> Optional[Dict[str, int]]:
   return {"para": para, "chars": chars}
 
 
+@dataclass
+class LibraryPage:
+  entries: List[Dict]
+  next_cursor: Optional[str]
+  revision: int
+
+
+@dataclass
+class LibraryChanges:
+  revision: int
+  changed: List[Dict]
+  deleted: List[str]
+  reset: bool
+
+
+def _sort_value(entry: Dict, sort: str) -> Any:
+  if sort == "added_at":
+    return entry.get("added_at") or 0
+  return (entry.get(sort) or "").casefold()
+
+
+def _project(entry: Dict, fields: Optional[Set[str]]) -> Dict:
+  if not fields:
+    return dict(entry)
+  return {key: value for key, value in entry.items() if key in fields or key == "id"}
+
+
+def _encode_cursor(sort: str, descending: bool, value: Any, seq: int) -> str:
+  raw = json.dumps([sort, descending, value, seq], separators=(",", ":")).encode("utf-8")
+  return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort: str, descending: bool) -> Tuple[Any, int]:
+  try:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    cursor_sort, cursor_descending, value, seq = json.loads(raw)
+  except (ValueError, TypeError):
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid cursor")
+  expected_type = int if sort == "added_at" else str
+  if not isinstance(value, expected_type) or not isinstance(seq, int):
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid cursor")
+  if cursor_sort != sort or cursor_descending != descending:
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="cursor does not match sort order")
+  return (value, seq)
+
+
 class LibraryStore:
+  """Book metadata in SQLite (WAL, full sync) fronted by an in-memory copy of every entry.
+
+  Reads never touch disk: entries live in ``_entries`` keyed by id in insertion order, with a
+  filename → ids index for shared uploads. Each write commits one row in its own transaction
+  before the cache is updated, so a crash never leaves a half-written library. An existing
+  ``library.json`` is imported on first start and renamed to ``library.json.migrated``.
+
+  Every write stamps its row (or a tombstone, for deletes) with the next library revision so
+  ``changes_since`` can serve delta sync; tombstones older than ``LIBRARY_TOMBSTONE_DAYS`` are
+  compacted away.
+  """
+
+  _SCHEMA_VERSION = 3
+  SORT_KEYS = ("added_at", "title", "author")
+
   def __init__(self, settings: Settings):
     self.settings = settings
     self.metadata_file = settings.library_metadata_file
+    self.db_file = settings.library_db_file
     self.books_dir = settings.books_dir
     self._lock = Lock()
-    self.metadata_file.touch(exist_ok=True)
+    self._conn = sqlite3.connect(str(self.db_file), check_same_thread=False, isolation_level=None)
+    self._conn.execute("PRAGMA journal_mode=WAL")
+    self._conn.execute("PRAGMA synchronous=FULL")
+    self._ensure_schema()
+    self._entries: Dict[str, Dict] = {}
+    self._by_filename: Dict[str, Set[str]] = {}
+    # Insertion order; ties in every sort fall back to it, so the unparameterised list is unchanged.
+    self._seq: Dict[str, int] = {}
+    # sort key → (revision it was built at, ascending (value, seq) keys, matching ids).
+    self._orderings: Dict[str, Tuple[int, List[Tuple[Any, int]], List[str]]] = {}
+    for seq, data in self._conn.execute("SELECT seq, data FROM books ORDER BY seq"):
+      self._cache(json.loads(data), seq)
+    self.revision = self._meta("revision")
+    # Deletions at or before this revision have been compacted away; older cursors must resync.
+    self.compacted_revision = self._meta("compacted_revision")
 
-  def _load(self) -> List[Dict]:
+  def _ensure_schema(self) -> None:
+    version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= self._SCHEMA_VERSION:
+      return
+    with self._transaction():
+      if version < 1:
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS books ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " id TEXT NOT NULL UNIQUE,"
+            " title TEXT, author TEXT, added_at INTEGER, filename TEXT NOT NULL,"
+            " data TEXT NOT NULL)"
+        )
+        for column in ("title", "author", "added_at", "filename"):
+          self._conn.execute(f"CREATE INDEX IF NOT EXISTS books_by_{column} ON books ({column})")
+      if version < 2:
+        self._conn.execute("CREATE TABLE IF NOT EXISTS library_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.execute("INSERT OR IGNORE INTO library_meta (key, value) VALUES ('revision', 1)")
+      if version < 3:
+        # Rows written before the change feed existed count as changed at the current revision.
+        self._conn.execute("ALTER TABLE books ADD COLUMN rev INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("UPDATE books SET rev = (SELECT value FROM library_meta WHERE key = 'revision')")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS books_by_rev ON books (rev)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS book_tombstones (id TEXT PRIMARY KEY, rev INTEGER NOT NULL, deleted_at INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS book_tombstones_by_rev ON book_tombstones (rev)")
+        self._conn.execute("INSERT OR IGNORE INTO library_meta (key, value) VALUES ('compacted_revision', 0)")
+      if version < 1:
+        revision = self._conn.execute("SELECT value FROM library_meta WHERE key = 'revision'").fetchone()[0]
+        for entry in self._legacy_entries():
+          self._write_row(entry, revision)
+      self._conn.execute(f"PRAGMA user_version = {self._SCHEMA_VERSION}")
+    if version < 1 and self.metadata_file.exists():
+      self.metadata_file.replace(self.metadata_file.with_name(self.metadata_file.name + ".migrated"))
+
+  def _legacy_entries(self) -> List[Dict]:
+    if not self.metadata_file.exists():
+      return []
     content = self.metadata_file.read_text().strip()
     if not content:
       return []
     return json.loads(content)
 
-  def _save(self, entries: List[Dict]) -> None:
-    self.metadata_file.write_text(json.dumps(entries, indent=2))
+  @contextmanager
+  def _transaction(self) -> Iterator[None]:
+    self._conn.execute("BEGIN IMMEDIATE")
+    try:
+      yield
+    except BaseException:
+      self._conn.execute("ROLLBACK")
+      raise
+    self._conn.execute("COMMIT")
+
+  def _meta(self, key: str) -> int:
+    return self._conn.execute("SELECT value FROM library_meta WHERE key = ?", (key,)).fetchone()[0]
+
+  def _write_row(self, entry: Dict, rev: int) -> int:
+    self._conn.execute("DELETE FROM book_tombstones WHERE id = ?", (entry["id"],))
+    return self._conn.execute(
+        "INSERT INTO books (id, title, author, added_at, filename, data, rev) VALUES (?, ?, ?, ?, ?, ?, ?)"
+        " ON CONFLICT (id) DO UPDATE SET title = excluded.title, author = excluded.author,"
+        " added_at = excluded.added_at, filename = excluded.filename, data = excluded.data, rev = excluded.rev",
+        (entry["id"], entry.get("title"), entry.get("author"), entry.get("added_at"), entry["filename"], json.dumps(entry), rev),
+    ).lastrowid
+
+  @contextmanager
+  def _write(self) -> Iterator[int]:
+    """A transaction stamped with the next library revision, which doubles as the list ETag."""
+    with self._transaction():
+      yield self.revision + 1
+      self._conn.execute("UPDATE library_meta SET value = value + 1 WHERE key = 'revision'")
+    self.revision += 1
+
+  def _compact_tombstones(self) -> None:
+    cutoff = int(time.time()) - self.settings.library_tombstone_days * 86400
+    row = self._conn.execute("SELECT MAX(rev) FROM book_tombstones WHERE deleted_at <= ?", (cutoff,)).fetchone()
+    if row[0] is None:
+      return
+    self._conn.execute("DELETE FROM book_tombstones WHERE rev <= ?", (row[0],))
+    self._conn.execute(
+        "UPDATE library_meta SET value = MAX(value, ?) WHERE key = 'compacted_revision'", (row[0],)
+    )
+    self.compacted_revision = max(self.compacted_revision, row[0])
+
+  def _cache(self, entry: Dict, seq: int) -> None:
+    self._entries[entry["id"]] = entry
+    self._seq[entry["id"]] = seq
+    self._by_filename.setdefault(entry["filename"], set()).add(entry["id"])
+
+  def _uncache(self, entry: Dict) -> None:
+    self._entries.pop(entry["id"], None)
+    self._seq.pop(entry["id"], None)
+    owners = self._by_filename.get(entry["filename"], set())
+    owners.discard(entry["id"])
+    if not owners:
+      self._by_filename.pop(entry["filename"], None)
 
   def list_books(self) -> List[Dict]:
-    return self._load()
+    with self._lock:
+      return [dict(entry) for entry in self._entries.values()]
+
+  def _ordering(self, sort: str) -> Tuple[List[Tuple[Any, int]], List[str]]:
+    built_at, keys, ids = self._orderings.get(sort, (-1, [], []))
+    if built_at != self.revision:
+      ranked = sorted(((_sort_value(entry, sort), self._seq[book_id]), book_id) for book_id, entry in self._entries.items())
+      keys = [key for key, _ in ranked]
+      ids = [book_id for _, book_id in ranked]
+      self._orderings[sort] = (self.revision, keys, ids)
+    return keys, ids
+
+  def query(
+      self,
+      *,
+      limit: Optional[int] = None,
+      cursor: Optional[str] = None,
+      sort: str = "added_at",
+      descending: bool = False,
+      author: Optional[str] = None,
+      title_prefix: Optional[str] = None,
+      added_since: Optional[int] = None,
+      added_before: Optional[int] = None,
+      fields: Optional[Set[str]] = None,
+  ) -> LibraryPage:
+    """Keyset-paginated listing over a cached sort order; the cursor is the last (key, seq) seen."""
+    if sort not in self.SORT_KEYS:
+      raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"sort must be one of {', '.join(self.SORT_KEYS)}")
+    author_key = author.casefold() if author is not None else None
+    prefix_key = title_prefix.casefold() if title_prefix else None
+    with self._lock:
+      keys, ids = self._ordering(sort)
+      if cursor:
+        after = _decode_cursor(cursor, sort, descending)
+        start = bisect.bisect_left(keys, after) - 1 if descending else bisect.bisect_right(keys, after)
+      else:
+        start = len(keys) - 1 if descending else 0
+      step = -1 if descending else 1
+      items: List[Dict] = []
+      next_cursor = None
+      position = start
+      while 0 <= position < len(keys):
+        entry = self._entries[ids[position]]
+        position += step
+        if author_key is not None and (entry.get("author") or "").casefold() != author_key:
+          continue
+        if prefix_key and not (entry.get("title") or "").casefold().startswith(prefix_key):
+          continue
+        added_at = entry.get("added_at") or 0
+        if (added_since is not None and added_at < added_since) or (added_before is not None and added_at >= added_before):
+          continue
+        if limit is not None and len(items) == limit:
+          last_id = items[-1]["id"]
+          next_cursor = _encode_cursor(sort, descending, _sort_value(self._entries[last_id], sort), self._seq[last_id])
+          break
+        items.append(_project(entry, fields))
+      return LibraryPage(entries=items, next_cursor=next_cursor, revision=self.revision)
+
+  def changes_since(self, since: int) -> LibraryChanges:
+    """Entries written and ids deleted after revision ``since``, read through the rev indexes.
+
+    A cursor older than the compaction horizon (or from a different database) cannot be served
+    incrementally, so it gets every live entry with ``reset`` set and should replace its copy.
+    """
+    with self._lock:
+      if since < self.compacted_revision or since > self.revision:
+        return LibraryChanges(
+            revision=self.revision,
+            changed=[dict(entry) for entry in self._entries.values()],
+            deleted=[],
+            reset=True,
+        )
+      changed_ids = self._conn.execute("SELECT id FROM books WHERE rev > ? ORDER BY rev", (since,)).fetchall()
+      deleted = self._conn.execute("SELECT id FROM book_tombstones WHERE rev > ? ORDER BY rev", (since,)).fetchall()
+      return LibraryChanges(
+          revision=self.revision,
+          changed=[dict(self._entries[book_id]) for (book_id,) in changed_ids if book_id in self._entries],
+          deleted=[book_id for (book_id,) in deleted],
+          reset=False,
+      )
 
   def get_entry(self, book_id: str) -> Optional[Dict]:
-    for entry in self._load():
-      if entry["id"] == book_id:
-        return entry
-    return None
+    with self._lock:
+      entry = self._entries.get(book_id)
+      return dict(entry) if entry else None
 
   def delete_book(self, book_id: str) -> Dict:
     with self._lock:
-      entries = self._load()
-      remaining = []
-      deleted_entry = None
-      for entry in entries:
-        if entry["id"] == book_id:
-          deleted_entry = entry
-        else:
-          remaining.append(entry)
+      deleted_entry = self._entries.get(book_id)
       if not deleted_entry:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="book not found")
-      file_path = self.books_dir / deleted_entry["filename"]
-      file_path.unlink(missing_ok=True)
-      self._save(remaining)
+      with self._write() as rev:
+        self._conn.execute("DELETE FROM books WHERE id = ?", (book_id,))
+        self._conn.execute(
+            "INSERT OR REPLACE INTO book_tombstones (id, rev, deleted_at) VALUES (?, ?, ?)",
+            (book_id, rev, int(time.time())),
+        )
+        self._compact_tombstones()
+      self._uncache(deleted_entry)
+      # Uploads are stored by content hash, so another entry may still point at the same file.
+      if deleted_entry["filename"] not in self._by_filename:
+        (self.books_dir / deleted_entry["filename"]).unlink(missing_ok=True)
     remove_cached_audio_for_book(self.settings, book_id)
-    return deleted_entry
+    return dict(deleted_entry)
 
   def store_upload(self, upload: UploadFile, title: Optional[str], author: Optional[str], cover: Optional[str]) -> Dict:
     extension = Path(upload.filename or "").suffix.lower()
@@ -102,10 +351,6 @@ class LibraryStore:
         destination.write(chunk)
     final_filename = f"{hasher.hexdigest()}{extension}"
     final_path = self.books_dir / final_filename
-    if final_path.exists():
-      tmp_path.unlink(missing_ok=True)
-    else:
-      tmp_path.rename(final_path)
     book_id = uuid.uuid4().hex
     entry = {
         "id": book_id,
@@ -119,10 +364,15 @@ class LibraryStore:
         "last_read_location": None,
     }
     with self._lock:
-      entries = self._load()
-      entries.append(entry)
-      self._save(entries)
-    return entry
+      # Placed under the lock so a concurrent delete of a same-content book cannot unlink it.
+      if final_path.exists():
+        tmp_path.unlink(missing_ok=True)
+      else:
+        tmp_path.rename(final_path)
+      with self._write() as rev:
+        seq = self._write_row(entry, rev)
+      self._cache(entry, seq)
+    return dict(entry)
 
   def update_book(self, book_id: str, updates: Dict[str, Any]) -> Dict:
     allowed_keys = {"title", "author", "cover", "last_read_location"}
@@ -132,15 +382,13 @@ class LibraryStore:
     if "last_read_location" in updates:
       updates["last_read_location"] = _validate_last_read_location(updates["last_read_location"])
     with self._lock:
-      entries = self._load()
-      updated_entry = None
-      for entry in entries:
-        if entry["id"] == book_id:
-          updated_entry = entry
-          break
-      if not updated_entry:
+      current = self._entries.get(book_id)
+      if not current:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="book not found")
+      updated_entry = dict(current)
       updated_entry.update({k: v for k, v in updates.items() if v is not None or k in {"last_read_location", "cover"}})
       updated_entry["updated_at"] = int(time.time())
-      self._save(entries)
-    return updated_entry
+      with self._write() as rev:
+        self._write_row(updated_entry, rev)
+      self._entries[book_id] = updated_entry
+    return dict(updated_entry)
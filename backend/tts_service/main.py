@@ -5,9 +5,12 @@ from __future__ import annotations
 import json
 import logging
 import time
+from contextlib import asynccontextmanager
 from functools import lru_cache
-from typing import Optional
+from pathlib import Path as PathType
+from typing import AsyncContextManager, AsyncIterator, Generator, List, Optional, Union
 
+import anyio
 from fastapi import (
     FastAPI,
     File,
@@ -20,15 +23,45 @@ from fastapi import (
     Form,
 )
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, ConfigDict, Field
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from .admission import AdmissionController, get_admission_controller, get_synthesis_costs
+from .audio_codec import AUDIO_MEDIA_TYPES, format_for_path, negotiate_format, to_format
+from .audio_cache import resolve_cache_path
+from .cache_eviction import get_cache_evictor
 from .library import LibraryStore
-from .rate_limit import enforce_rate_limit
+from .media import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, etag_matches, file_response, strong_etag
+from .metrics import (
+    HTTP_INFLIGHT,
+    HTTP_LATENCY,
+    HTTP_REQUESTS,
+    HTTP_RESPONSE_BYTES,
+    METRICS_CONTENT_TYPE,
+    REGISTRY,
+    register_gauge,
+)
+from .online_proxy import get_online_client
+from .piper_pool import get_piper_pool
+from .prefetch import get_prefetcher
+from .rate_limit import enforce_rate_limit, get_client_budgets
+from .render_jobs import get_render_jobs
 from .settings import Settings, get_settings
-from .system import get_system_status
-from .tts import TTSRequest, delete_cache_file, forward_online_tts, synthesize
-from .voices import download_voice_pack, list_voices
+from .system import get_system_status, get_usage_counters
+from .tts import (
+    SynthesisResult,
+    TTSRequest,
+    delete_cache_file,
+    is_cached,
+    stream_synthesis,
+    synthesize_async,
+    synthesize_batch,
+    uncached_chars,
+)
+from .voice_downloads import get_voice_downloads
+from .voices import delete_voice_pack, list_voices
 
 class LastReadLocation(BaseModel):
   para: int
@@ -43,6 +76,28 @@ class BookUpdate(BaseModel):
   last_read_location: Optional[LastReadLocation] = None
 
 
+class TTSBatchRequest(BaseModel):
+  items: List[TTSRequest] = Field(..., min_length=1)
+
+
+class PrefetchRequest(BaseModel):
+  voice_id: str = Field(..., min_length=1)
+  rate: Optional[float] = None
+  pitch: Optional[float] = None
+  book_id: Optional[str] = None
+  chunks: List[str] = Field(..., min_length=1)
+  # Paragraph index of ``chunks[0]``, so the read position can be located within them.
+  start_para: int = Field(default=0, ge=0)
+  from_last_read: bool = False
+  count: Optional[int] = Field(default=None, ge=1)
+
+
+class RenderRequest(BaseModel):
+  voice_id: str = Field(..., min_length=1)
+  rate: Optional[float] = None
+  pitch: Optional[float] = None
+
+
 class VoiceDownloadRequest(BaseModel):
   voice_id: str = Field(..., min_length=1)
 
@@ -61,7 +116,17 @@ def get_library_store() -> LibraryStore:
   return LibraryStore(get_settings())
 
 
-app = FastAPI(title="PaperRead TTS Service", version="0.3.0")
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+  # Book renders interrupted by a restart pick up from their last checkpoint.
+  get_render_jobs().resume_pending()
+  # The first directory scan for /status runs in the background instead of inside a request.
+  get_usage_counters().start_reconcile()
+  yield
+  await get_online_client().aclose()
+
+
+app = FastAPI(title="PaperRead TTS Service", version="0.3.0", lifespan=lifespan)
 
 # Add CORS middleware to allow frontend access from different origins
 app.add_middleware(
@@ -70,14 +135,56 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "x-audio-url", "Retry-After"],
 )
 
 
+class _StreamedUploadBudget:
+  """Charges ``upload_bytes`` for body bytes that arrive beyond the declared Content-Length.
+
+  Bodies with an honest Content-Length were already charged up front; chunked uploads declare
+  none, so they are charged as they stream in and cut off once the client's budget runs out.
+  """
+
+  def __init__(self, app: ASGIApp):
+    self.app = app
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+    if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != "/library/upload":
+      await self.app(scope, receive, send)
+      return
+    request = Request(scope)
+    client_ip = request.client.host if request.client else "unknown"
+    paid = _content_length(request)
+    received = 0
+
+    async def counted_receive() -> Message:
+      nonlocal paid, received
+      message = await receive()
+      if message["type"] == "http.request":
+        received += len(message.get("body", b""))
+        if received > paid:
+          get_client_budgets().charge("upload_bytes", client_ip, received - paid)
+          paid = received
+      return message
+
+    await self.app(scope, counted_receive, send)
+
+
+app.add_middleware(_StreamedUploadBudget)
+
+
 @app.middleware("http")
 async def logging_and_rate_limit(request: Request, call_next):
   client_ip = request.client.host if request.client else "unknown"
+  if request.url.path == "/metrics":
+    # Scrapes must keep working while clients are being throttled; that is when they matter.
+    return await call_next(request)
   try:
     enforce_rate_limit(client_ip)
+    if request.method == "POST" and request.url.path == "/library/upload":
+      # Charged from Content-Length before the body is read, so an over-budget upload costs nothing.
+      get_client_budgets().charge("upload_bytes", client_ip, _content_length(request))
   except HTTPException as exc:
     LOGGER.warning(
         json.dumps(
@@ -90,14 +197,16 @@ async def logging_and_rate_limit(request: Request, call_next):
             }
         )
     )
-    response = JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+    response = JSONResponse(status_code=exc.status_code, content={"detail": exc.detail}, headers=exc.headers)
     response.headers["x-request-duration-ms"] = "0.00"
     return response
   start = time.perf_counter()
+  HTTP_INFLIGHT.inc()
   try:
     response = await call_next(request)
   except Exception as exc:  # pragma: no cover - logging path
     duration_ms = (time.perf_counter() - start) * 1000
+    HTTP_REQUESTS.inc(route=_route_template(request), method=request.method, status="500")
     LOGGER.exception(
         "request_failed",
         extra={
@@ -109,8 +218,11 @@ async def logging_and_rate_limit(request: Request, call_next):
         },
     )
     raise
+  finally:
+    HTTP_INFLIGHT.dec()
   duration_ms = (time.perf_counter() - start) * 1000
   response.headers["x-request-duration-ms"] = f"{duration_ms:.2f}"
+  _record_request_metrics(request, response, duration_ms / 1000)
   LOGGER.info(
       json.dumps(
           {
@@ -126,6 +238,22 @@ async def logging_and_rate_limit(request: Request, call_next):
   return response
 
 
+def _route_template(request: Request) -> str:
+  # The matched route's template keeps label cardinality bounded; raw paths would not.
+  route = request.scope.get("route")
+  return getattr(route, "path", "unmatched")
+
+
+def _record_request_metrics(request: Request, response: Response, seconds: float) -> None:
+  route = _route_template(request)
+  HTTP_REQUESTS.inc(route=route, method=request.method, status=str(response.status_code))
+  # Streaming responses return once headers are ready, so this is time to first byte for them.
+  HTTP_LATENCY.observe(seconds, route=route, method=request.method)
+  content_length = response.headers.get("content-length")
+  if content_length and content_length.isdigit() and request.method != "HEAD":
+    HTTP_RESPONSE_BYTES.inc(int(content_length), route=route)
+
+
 @app.get("/healthz", tags=["health"])
 def healthz() -> dict:
   return {"status": "ok"}
@@ -135,37 +263,272 @@ def healthz() -> dict:
 def readyz() -> dict:
   settings = get_settings()
   piper_available = bool(settings.piper_bin and settings.piper_bin.exists())
-  return {"status": _get_status_label(piper_available, settings), "piper_available": piper_available}
+  body = {"status": _get_status_label(piper_available, settings), "piper_available": piper_available}
+  pool = get_piper_pool() if piper_available else None
+  if pool is not None:
+    pool.health_check()
+    body["piper_pool"] = pool.stats()
+  evictor = get_cache_evictor()
+  if evictor.enabled:
+    body["audio_cache"] = evictor.stats()
+  costs = get_synthesis_costs().stats()
+  if costs:
+    body["synthesis_costs"] = costs
+  return body
+
+
+@app.get("/metrics", tags=["health"], include_in_schema=False)
+def metrics() -> Response:
+  admission = get_admission_controller()
+  register_gauge("synthesis_active", "Synthesis slots in use.", lambda: admission.active)
+  register_gauge("synthesis_queued", "Synthesis requests waiting for a slot.", lambda: admission.queued)
+  register_gauge("synthesis_backlog_seconds", "Estimated seconds of admitted synthesis work.", lambda: admission.backlog)
+  return Response(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+def _content_length(request: Request) -> int:
+  try:
+    return max(0, int(request.headers.get("content-length") or 0))
+  except ValueError:
+    return 0
+
+
+def _charge_synthesis(request: Request, items: List[TTSRequest]) -> None:
+  """Charges the client's character budget for the items that will actually be synthesized.
+
+  Called once the work holds an admission slot, so requests shed with a 503 cost nothing. It
+  checks the cache on disk, so async handlers run it in a worker thread.
+  """
+  settings = get_settings()
+  chars = sum(uncached_chars(settings, item) for item in items)
+  client_ip = request.client.host if request.client else "unknown"
+  get_client_budgets().charge("tts_chars", client_ip, chars)
+
+
+def _estimated_seconds(payload: TTSRequest) -> float:
+  return get_synthesis_costs().estimate_seconds(payload.voice_id, len(payload.text))
+
+
+def _synthesis_slot(payload: TTSRequest) -> AsyncContextManager[None]:
+  return get_admission_controller().slot(_estimated_seconds(payload))
+
+
+async def _admitted_stream(
+    chunks: Generator[bytes, None, None], admission: AdmissionController, cost_seconds: float
+) -> AsyncIterator[bytes]:
+  try:
+    while True:
+      # Not cancellable: a disconnect waits out the current read, so the generator is idle below.
+      chunk = await anyio.to_thread.run_sync(next, chunks, None)
+      if chunk is None:
+        return
+      yield chunk
+  finally:
+    # Closing kills a streaming Piper and releases its single-flight claim, which can block.
+    with anyio.CancelScope(shield=True):
+      await anyio.to_thread.run_sync(chunks.close)
+    admission.release(cost_seconds)
+
+
+async def _audio_response(request: Request, file_path: PathType, filename: str, audio_format: Optional[str]) -> Response:
+  stored = format_for_path(file_path)
+  chosen = negotiate_format(request.headers.get("accept"), audio_format, stored)
+  if chosen is None:
+    raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail="unsupported audio format")
+  headers = {"Vary": "Accept"}
+  if chosen == stored:
+    return FileResponse(file_path, media_type=AUDIO_MEDIA_TYPES[stored], filename=filename, headers=headers)
+  body = await run_in_threadpool(to_format, file_path, chosen)
+  stem = filename.rsplit(".", 1)[0]
+  headers["Content-Disposition"] = f'attachment; filename="{stem}.{chosen}"'
+  return Response(body, media_type=AUDIO_MEDIA_TYPES[chosen], headers=headers)
 
 
 @app.post("/tts", tags=["tts"])
-def create_tts(payload: TTSRequest, json: int = Query(default=0, alias="json")):
+async def create_tts(
+    payload: TTSRequest,
+    request: Request,
+    json: int = Query(default=0, alias="json"),
+    stream: int = Query(default=0),
+    audio_format: Optional[str] = Query(default=None, alias="format"),
+):
   settings = get_settings()
   if len(payload.text) > settings.max_chars:
     raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="text exceeds MAX_CHARS")
-  result = synthesize(settings, payload)
+  admission = get_admission_controller()
+  if stream and not json:
+    # The cache lookup, index update and evictor bookkeeping all touch disk.
+    audio = await anyio.to_thread.run_sync(stream_synthesis, settings, payload)
+    headers = {"x-audio-url": audio.audio_url}
+    if audio.cached:
+      return StreamingResponse(audio.chunks, media_type=audio.media_type, headers=headers)
+    cost_seconds = _estimated_seconds(payload)
+    await admission.acquire(cost_seconds)
+    try:
+      await anyio.to_thread.run_sync(_charge_synthesis, request, [payload])
+    except HTTPException:
+      admission.release(cost_seconds)
+      raise
+    chunks = _admitted_stream(audio.chunks, admission, cost_seconds)
+    return StreamingResponse(chunks, media_type=audio.media_type, headers=headers)
+  if await anyio.to_thread.run_sync(is_cached, settings, payload):
+    result = await synthesize_async(settings, payload)
+  else:
+    async with _synthesis_slot(payload):
+      await anyio.to_thread.run_sync(_charge_synthesis, request, [payload])
+      result = await synthesize_async(settings, payload)
   if json:
     return JSONResponse({"audio_url": result.audio_url, "duration_ms": result.duration_ms})
-  return FileResponse(result.file_path, media_type="audio/wav", filename=result.filename)
+  return await _audio_response(request, result.file_path, result.filename, audio_format)
 
 
-@app.post("/tts/generate", tags=["tts"])
-def create_online_tts(payload: TTSRequest):
+def _batch_item(index: int, result: Union[SynthesisResult, Exception]) -> dict:
+  if isinstance(result, HTTPException):
+    return {"index": index, "error": result.detail, "status": result.status_code}
+  if isinstance(result, Exception):
+    LOGGER.error("Batch item %d failed", index, exc_info=result)
+    return {"index": index, "error": "synthesis failed", "status": status.HTTP_500_INTERNAL_SERVER_ERROR}
+  return {"index": index, "audio_url": result.audio_url, "duration_ms": result.duration_ms}
+
+
+@app.post("/tts/batch", tags=["tts"])
+async def create_tts_batch(payload: TTSBatchRequest, request: Request, stream: int = Query(default=0)):
   settings = get_settings()
-  normalized = forward_online_tts(settings, payload)
+  if len(payload.items) > settings.max_batch_items:
+    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="batch exceeds MAX_BATCH_ITEMS")
+  if any(len(item.text) > settings.max_chars for item in payload.items):
+    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="text exceeds MAX_CHARS")
+  if stream:
+    # Budget errors must surface before the 200 headers go out, so the whole batch is charged
+    # here; only admission can still fail per item, and that is reported on the item's line.
+    await anyio.to_thread.run_sync(_charge_synthesis, request, payload.items)
+    results = synthesize_batch(settings, payload.items, _synthesis_slot, return_exceptions=True)
+
+    async def lines() -> AsyncIterator[str]:
+      async for index, result in results:
+        yield json.dumps(_batch_item(index, result)) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+  @asynccontextmanager
+  async def admit_and_charge(item: TTSRequest) -> AsyncIterator[None]:
+    async with _synthesis_slot(item):
+      await anyio.to_thread.run_sync(_charge_synthesis, request, [item])
+      yield
+
+  results = synthesize_batch(settings, payload.items, admit_and_charge)
+  ordered: List[Optional[dict]] = [None] * len(payload.items)
+  async for index, result in results:
+    ordered[index] = _batch_item(index, result)
+  return {"results": ordered}
+
+
+def _prefetch_window(payload: PrefetchRequest, settings: Settings) -> List[str]:
+  count = min(payload.count or settings.prefetch_paragraphs, settings.max_batch_items)
+  offset = 0
+  if payload.from_last_read:
+    if not payload.book_id:
+      raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="from_last_read requires book_id")
+    entry = get_library_store().get_entry(payload.book_id)
+    if entry is None:
+      raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="book not found")
+    location = entry.get("last_read_location") or {"para": payload.start_para}
+    offset = location["para"] - payload.start_para
+    if offset < 0 or offset >= len(payload.chunks):
+      raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="chunks do not cover the last read paragraph")
+  return [chunk for chunk in payload.chunks[offset : offset + count] if chunk.strip()]
+
+
+@app.post("/tts/prefetch", tags=["tts"], status_code=status.HTTP_202_ACCEPTED)
+def create_prefetch(payload: PrefetchRequest, request: Request):
+  settings = get_settings()
+  if any(len(chunk) > settings.max_chars for chunk in payload.chunks):
+    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="text exceeds MAX_CHARS")
+  items = [
+      TTSRequest(text=chunk, voice_id=payload.voice_id, rate=payload.rate, pitch=payload.pitch, book_id=payload.book_id)
+      for chunk in _prefetch_window(payload, settings)
+  ]
+  _charge_synthesis(request, items)
+  return get_prefetcher().submit(payload.book_id, items).as_dict()
+
+
+@app.get("/tts/prefetch/{job_id}", tags=["tts"])
+def get_prefetch(job_id: str = Path(...)):
+  job = get_prefetcher().get(job_id)
+  if job is None:
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="prefetch job not found")
+  return job
+
+
+@app.delete("/tts/prefetch/{job_id}", tags=["tts"])
+def cancel_prefetch(job_id: str = Path(...)):
+  job = get_prefetcher().cancel(job_id)
+  if job is None:
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="prefetch job not found")
+  return job
+
+
+@app.post("/tts/generate", tags=["tts"])
+async def create_online_tts(payload: TTSRequest):
+  normalized = await get_online_client().generate(payload)
   return JSONResponse(normalized)
 
 
 @app.get("/voices", tags=["voices"])
-def get_voices():
+def get_voices(language: Optional[str] = Query(None, description="Language tag such as en-US, or a primary subtag such as en")):
   settings = get_settings()
-  return {"voices": list_voices(settings)}
+  voices = list_voices(settings, language)
+  downloads = get_voice_downloads().active_by_voice()
+  for voice in voices:
+    job = downloads.get(voice["id"])
+    if job is not None:
+      voice["status"] = "downloading"
+      voice["download"] = job
+  return {"voices": voices}
 
 
-@app.post("/voices/download", tags=["voices"])
+@app.post("/voices/download", tags=["voices"], status_code=status.HTTP_202_ACCEPTED)
 def download_voice(payload: VoiceDownloadRequest):
+  return get_voice_downloads().submit(payload.voice_id).as_dict()
+
+
+@app.get("/voices/download/{job_id}", tags=["voices"])
+def get_voice_download(job_id: str = Path(...)):
+  job = get_voice_downloads().get(job_id)
+  if job is None:
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="voice download not found")
+  return job
+
+
+@app.delete("/voices/download/{job_id}", tags=["voices"])
+def cancel_voice_download(job_id: str = Path(...)):
+  job = get_voice_downloads().cancel(job_id)
+  if job is None:
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="voice download not found")
+  return job
+
+
+@app.delete("/voices/{voice_id}", tags=["voices"])
+def delete_voice(voice_id: str = Path(...)):
+  get_voice_downloads().cancel_voice(voice_id)
+  return delete_voice_pack(get_settings(), voice_id)
+
+
+@app.api_route("/media/{filename}", methods=["GET", "HEAD"], tags=["tts"])
+def get_media(request: Request, filename: str = Path(..., description="Cached audio filename")):
   settings = get_settings()
-  return download_voice_pack(settings, payload.voice_id)
+  file_path = resolve_cache_path(settings, filename)
+  if not file_path.is_file():
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="audio not cached")
+  get_cache_evictor().record_access(filename)
+  # Cache filenames are content-addressed, so the name itself is a strong validator.
+  return file_response(
+      request,
+      file_path,
+      etag=strong_etag(filename),
+      media_type=AUDIO_MEDIA_TYPES[format_for_path(file_path)],
+      cache_control=IMMUTABLE_CACHE_CONTROL,
+  )
 
 
 @app.delete("/tts/cache/{filename}", tags=["tts"])
@@ -187,13 +550,55 @@ def upload_book(
 
 
 @app.get("/library", tags=["library"])
-def list_library():
+def list_library(
+    request: Request,
+    limit: Optional[int] = Query(default=None, ge=1, le=500),
+    cursor: Optional[str] = Query(default=None),
+    sort: str = Query(default="added_at"),
+    order: str = Query(default="asc", pattern="^(asc|desc)$"),
+    author: Optional[str] = Query(default=None),
+    title_prefix: Optional[str] = Query(default=None),
+    added_since: Optional[int] = Query(default=None),
+    added_before: Optional[int] = Query(default=None),
+    fields: Optional[str] = Query(default=None, description="Comma-separated fields to return; id is always included"),
+):
+  store = get_library_store()
+  # The revision changes on every write, so one ETag covers every page, filter and projection.
+  etag = f'"library-{store.revision}"'
+  headers = {"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL}
+  if etag_matches(request.headers.get("if-none-match") or "", etag):
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+  page = store.query(
+      limit=limit,
+      cursor=cursor,
+      sort=sort,
+      descending=order == "desc",
+      author=author,
+      title_prefix=title_prefix,
+      added_since=added_since,
+      added_before=added_before,
+      fields={name.strip() for name in fields.split(",") if name.strip()} if fields else None,
+  )
+  headers["ETag"] = f'"library-{page.revision}"'
+  if page.next_cursor:
+    headers["X-Next-Cursor"] = page.next_cursor
+  return JSONResponse(page.entries, headers=headers)
+
+
+@app.get("/library/changes", tags=["library"])
+def library_changes(since: int = Query(default=0, ge=0)):
   store = get_library_store()
-  return store.list_books()
+  changes = store.changes_since(since)
+  return {
+      "revision": changes.revision,
+      "reset": changes.reset,
+      "changed": changes.changed,
+      "deleted": changes.deleted,
+  }
 
 
-@app.get("/library/{book_id}", tags=["library"])
-def get_book(book_id: str = Path(...)):
+@app.api_route("/library/{book_id}", methods=["GET", "HEAD"], tags=["library"])
+def get_book(request: Request, book_id: str = Path(...)):
   store = get_library_store()
   entry = store.get_entry(book_id)
   if not entry:
@@ -201,20 +606,80 @@ def get_book(book_id: str = Path(...)):
   file_path = store.books_dir / entry["filename"]
   if not file_path.exists():
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="book missing on disk")
-  return FileResponse(file_path, media_type=entry.get("content_type") or "application/octet-stream", filename=file_path.name)
+  # Stored books are named by their SHA-1; the entry can still be deleted, so clients revalidate.
+  return file_response(
+      request,
+      file_path,
+      etag=strong_etag(file_path.stem),
+      media_type=entry.get("content_type") or "application/octet-stream",
+      cache_control=REVALIDATE_CACHE_CONTROL,
+      filename=file_path.name,
+  )
 
 
 @app.delete("/library/{book_id}", tags=["library"])
 def delete_book(book_id: str = Path(...)):
   store = get_library_store()
+  get_render_jobs().forget_book(book_id)
   entry = store.delete_book(book_id)
+  get_prefetcher().cancel_book(book_id)
   return {"deleted": True, "book": entry}
 
 
+def _book_render_job(book_id: str, job: Optional[dict]) -> dict:
+  if job is None or job["book_id"] != book_id:
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="render job not found")
+  return job
+
+
+@app.post("/library/{book_id}/render", tags=["library"], status_code=status.HTTP_202_ACCEPTED)
+def create_render_job(payload: RenderRequest, book_id: str = Path(...)):
+  store = get_library_store()
+  entry = store.get_entry(book_id)
+  if entry is None:
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="book not found")
+  source = store.books_dir / entry["filename"]
+  return get_render_jobs().submit(book_id, source, payload.voice_id, payload.rate, payload.pitch)
+
+
+@app.get("/library/{book_id}/render", tags=["library"])
+def list_render_jobs(book_id: str = Path(...)):
+  return get_render_jobs().list_for_book(book_id)
+
+
+@app.get("/library/{book_id}/render/{job_id}", tags=["library"])
+def get_render_job(book_id: str = Path(...), job_id: str = Path(...)):
+  return _book_render_job(book_id, get_render_jobs().get(job_id))
+
+
+@app.post("/library/{book_id}/render/{job_id}/pause", tags=["library"])
+def pause_render_job(book_id: str = Path(...), job_id: str = Path(...)):
+  jobs = get_render_jobs()
+  _book_render_job(book_id, jobs.get(job_id))
+  return jobs.pause(job_id)
+
+
+@app.post("/library/{book_id}/render/{job_id}/resume", tags=["library"])
+def resume_render_job(book_id: str = Path(...), job_id: str = Path(...)):
+  jobs = get_render_jobs()
+  _book_render_job(book_id, jobs.get(job_id))
+  return jobs.resume(job_id)
+
+
+@app.delete("/library/{book_id}/render/{job_id}", tags=["library"])
+def cancel_render_job(book_id: str = Path(...), job_id: str = Path(...)):
+  jobs = get_render_jobs()
+  _book_render_job(book_id, jobs.get(job_id))
+  return jobs.cancel(job_id)
+
+
 @app.patch("/library/{book_id}", tags=["library"])
 def update_book_entry(payload: BookUpdate, book_id: str = Path(...)):
   store = get_library_store()
   entry = store.update_book(book_id, payload.model_dump(exclude_unset=True))
+  if payload.last_read_location is not None:
+    # A progress update means the book is being read; keep its audio off the eviction shortlist.
+    get_cache_evictor().touch_book(book_id)
   return entry
 
 
@@ -0,0 +1,140 @@
+"""Conditional and byte-range file responses for cached audio and book downloads."""
+
+from __future__ import annotations
+
+import re
+from email.utils import formatdate
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import anyio
+from fastapi import Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class FileRangeResponse(Response):
+  """Sends ``path[start:end + 1]`` without loading it into memory; HEAD gets headers only."""
+
+  chunk_size = 64 * 1024
+
+  def __init__(
+      self,
+      path: Path,
+      start: int,
+      end: int,
+      status_code: int,
+      headers: Dict[str, str],
+      media_type: Optional[str],
+  ):
+    self.path = path
+    self.start = start
+    self.end = end
+    self.status_code = status_code
+    self.media_type = media_type
+    self.background = None
+    headers = dict(headers)
+    headers["content-length"] = str(max(0, end - start + 1))
+    self.init_headers(headers)
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+    await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+    if scope.get("method") == "HEAD" or self.end < self.start:
+      await send({"type": "http.response.body", "body": b"", "more_body": False})
+      return
+    remaining = self.end - self.start + 1
+    async with await anyio.open_file(self.path, "rb") as handle:
+      await handle.seek(self.start)
+      while remaining > 0:
+        chunk = await handle.read(min(self.chunk_size, remaining))
+        if not chunk:
+          break
+        remaining -= len(chunk)
+        await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+    if remaining > 0:
+      # File shrank underneath us; close the body rather than hang the client.
+      await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def strong_etag(token: str) -> str:
+  return f'"{token}"'
+
+
+def etag_matches(header: str, etag: str) -> bool:
+  if header.strip() == "*":
+    return True
+  bare = etag.removeprefix("W/")
+  return any(candidate.strip().removeprefix("W/") == bare for candidate in header.split(","))
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+  """Returns the inclusive byte span for a single ``bytes=`` range.
+
+  ``None`` means "ignore the header and send the whole file" (malformed or multi-range);
+  a ``ValueError`` means the range cannot be satisfied.
+  """
+  match = _RANGE_PATTERN.fullmatch(header.strip())
+  if not match:
+    return None
+  first, last = match.groups()
+  if not first and not last:
+    return None
+  if not first:
+    suffix = int(last)
+    if suffix == 0 or size == 0:
+      raise ValueError("unsatisfiable range")
+    return max(0, size - suffix), size - 1
+  start = int(first)
+  end = min(int(last), size - 1) if last else size - 1
+  if last and int(last) < start:
+    return None
+  if start >= size:
+    raise ValueError("unsatisfiable range")
+  return start, end
+
+
+def file_response(
+    request: Request,
+    path: Path,
+    *,
+    etag: str,
+    media_type: Optional[str],
+    cache_control: str,
+    filename: Optional[str] = None,
+    extra_headers: Optional[Dict[str, str]] = None,
+) -> Response:
+  """Serves ``path`` honouring ``If-None-Match``, ``Range`` and ``If-Range``."""
+  stat = path.stat()
+  headers = {
+      "etag": etag,
+      "cache-control": cache_control,
+      "last-modified": formatdate(stat.st_mtime, usegmt=True),
+      "accept-ranges": "bytes",
+  }
+  if extra_headers:
+    headers.update(extra_headers)
+  if_none_match = request.headers.get("if-none-match")
+  if if_none_match and etag_matches(if_none_match, etag):
+    return Response(status_code=304, headers=headers)
+  if filename:
+    headers["content-disposition"] = f'attachment; filename="{filename}"'
+
+  size = stat.st_size
+  range_header = request.headers.get("range")
+  if_range = request.headers.get("if-range")
+  if range_header and (if_range is None or if_range.strip() == etag):
+    try:
+      span = parse_range(range_header, size)
+    except ValueError:
+      headers["content-range"] = f"bytes */{size}"
+      return Response(status_code=416, headers=headers)
+    if span is not None:
+      start, end = span
+      headers["content-range"] = f"bytes {start}-{end}/{size}"
+      return FileRangeResponse(path, start, end, 206, headers, media_type)
+  return FileRangeResponse(path, 0, size - 1, 200, headers, media_type)
@@ -0,0 +1,237 @@
+"""Process-wide metrics rendered in the Prometheus text exposition format.
+
+Recording is a dict lookup plus an add under a per-metric lock (histograms add a bisect), so
+it stays on in production. Label values are joined into a tuple key; keep them low-cardinality
+(route templates, voice ids, fixed reasons), never raw paths or client addresses.
+"""
+
+from __future__ import annotations
+
+import bisect
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SYNTHESIS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+RTF_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 5.0)
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+  return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+  parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+  if extra:
+    parts.append(extra)
+  return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+  if math.isinf(value):
+    return "+Inf" if value > 0 else "-Inf"
+  if float(value).is_integer():
+    return str(int(value))
+  return repr(float(value))
+
+
+class _Metric:
+  kind = ""
+
+  def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+    self.name = name
+    self.documentation = documentation
+    self.labelnames = tuple(labelnames)
+    self._lock = threading.Lock()
+
+  def _key(self, labels: Dict[str, str]) -> LabelValues:
+    return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+  def samples(self) -> Iterable[str]:  # pragma: no cover - overridden
+    return ()
+
+  def render(self) -> List[str]:
+    lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+    lines.extend(self.samples())
+    return lines
+
+
+class Counter(_Metric):
+  kind = "counter"
+
+  def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+    super().__init__(name, documentation, labelnames)
+    self._values: Dict[LabelValues, float] = {}
+
+  def inc(self, amount: float = 1.0, **labels: str) -> None:
+    key = self._key(labels)
+    with self._lock:
+      self._values[key] = self._values.get(key, 0.0) + amount
+
+  def value(self, **labels: str) -> float:
+    with self._lock:
+      return self._values.get(self._key(labels), 0.0)
+
+  def samples(self) -> Iterable[str]:
+    with self._lock:
+      items = sorted(self._values.items())
+    for key, value in items:
+      yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+  """A settable gauge, or one read from ``callback`` at scrape time so the hot path pays nothing."""
+
+  kind = "gauge"
+
+  def __init__(
+      self,
+      name: str,
+      documentation: str,
+      labelnames: Sequence[str] = (),
+      callback: Optional[Callable[[], float]] = None,
+  ):
+    super().__init__(name, documentation, labelnames)
+    self._values: Dict[LabelValues, float] = {}
+    self.callback = callback
+
+  def inc(self, amount: float = 1.0, **labels: str) -> None:
+    key = self._key(labels)
+    with self._lock:
+      self._values[key] = self._values.get(key, 0.0) + amount
+
+  def dec(self, amount: float = 1.0, **labels: str) -> None:
+    self.inc(-amount, **labels)
+
+  def set(self, value: float, **labels: str) -> None:
+    with self._lock:
+      self._values[self._key(labels)] = value
+
+  def value(self, **labels: str) -> float:
+    if self.callback is not None:
+      return float(self.callback())
+    with self._lock:
+      return self._values.get(self._key(labels), 0.0)
+
+  def samples(self) -> Iterable[str]:
+    if self.callback is not None:
+      yield f"{self.name} {_format_value(float(self.callback()))}"
+      return
+    with self._lock:
+      items = sorted(self._values.items())
+    for key, value in items:
+      yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+  kind = "histogram"
+
+  def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+    super().__init__(name, documentation, labelnames)
+    self.buckets = tuple(sorted(buckets))
+    # label values → [per-bucket counts (last is +Inf), sum]
+    self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+  def observe(self, value: float, **labels: str) -> None:
+    key = self._key(labels)
+    index = bisect.bisect_left(self.buckets, value)
+    with self._lock:
+      counts, total = self._values.get(key) or self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+      counts[index] += 1
+      total[0] += value
+
+  def count(self, **labels: str) -> int:
+    with self._lock:
+      entry = self._values.get(self._key(labels))
+      return sum(entry[0]) if entry else 0
+
+  def samples(self) -> Iterable[str]:
+    with self._lock:
+      items = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._values.items())
+    for key, (counts, total) in items:
+      cumulative = 0
+      for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+        cumulative += bucket_count
+        labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+        yield f"{self.name}_bucket{labels} {cumulative}"
+      plain = _format_labels(self.labelnames, key)
+      yield f"{self.name}_sum{plain} {_format_value(total)}"
+      yield f"{self.name}_count{plain} {cumulative}"
+
+
+class Registry:
+  def __init__(self) -> None:
+    self._metrics: Dict[str, _Metric] = {}
+    self._lock = threading.Lock()
+
+  def register(self, metric: _Metric) -> _Metric:
+    with self._lock:
+      # Re-registering by name returns the existing series so module reloads keep counting.
+      return self._metrics.setdefault(metric.name, metric)
+
+  def get(self, name: str) -> Optional[_Metric]:
+    return self._metrics.get(name)
+
+  def render(self) -> str:
+    with self._lock:
+      metrics = list(self._metrics.values())
+    lines: List[str] = []
+    for metric in metrics:
+      lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(
+    Counter("http_requests_total", "HTTP requests by route template, method and status.", ("route", "method", "status"))
+)
+HTTP_LATENCY = REGISTRY.register(
+    Histogram("http_request_duration_seconds", "HTTP request latency by route template.", ("route", "method"))
+)
+HTTP_RESPONSE_BYTES = REGISTRY.register(
+    Counter("http_response_bytes_total", "Response bytes with a known Content-Length, by route template.", ("route",))
+)
+HTTP_INFLIGHT = REGISTRY.register(Gauge("http_requests_in_flight", "HTTP requests currently being served."))
+RATE_LIMIT_REJECTIONS = REGISTRY.register(
+    Counter("rate_limit_rejections_total", "Requests rejected by rate limits, budgets or admission.", ("reason",))
+)
+CACHE_LOOKUPS = REGISTRY.register(Counter("tts_cache_lookups_total", "Audio cache lookups by result.", ("result",)))
+CACHE_EVICTIONS = REGISTRY.register(Counter("tts_cache_evictions_total", "Cached audio files evicted for space."))
+SYNTHESIS_SECONDS = REGISTRY.register(
+    Histogram("tts_synthesis_duration_seconds", "Wall time of a cache-miss synthesis.", ("voice",), SYNTHESIS_BUCKETS)
+)
+SYNTHESIS_RTF = REGISTRY.register(
+    Histogram("tts_synthesis_real_time_factor", "Synthesis time divided by audio duration.", ("voice",), RTF_BUCKETS)
+)
+PIPER_SPAWN_SECONDS = REGISTRY.register(
+    Histogram("piper_worker_spawn_seconds", "Time to start a pooled Piper worker process.", buckets=LATENCY_BUCKETS)
+)
+
+ONLINE_ATTEMPTS = REGISTRY.register(
+    Counter("online_tts_attempts_total", "Upstream online TTS attempts by outcome.", ("outcome",))
+)
+ONLINE_LATENCY = REGISTRY.register(
+    Histogram("online_tts_attempt_duration_seconds", "Wall time of one upstream online TTS attempt.", buckets=LATENCY_BUCKETS)
+)
+ONLINE_HEDGES = REGISTRY.register(Counter("online_tts_hedged_requests_total", "Hedge requests sent after the hedge delay."))
+ONLINE_CIRCUIT_REJECTIONS = REGISTRY.register(
+    Counter("online_tts_circuit_rejections_total", "Online TTS calls refused while the upstream circuit was open.")
+)
+
+
+def record_synthesis(voice_id: str, seconds: float, audio_ms: Optional[int]) -> None:
+  SYNTHESIS_SECONDS.observe(seconds, voice=voice_id)
+  if audio_ms:
+    SYNTHESIS_RTF.observe(seconds / (audio_ms / 1000), voice=voice_id)
+
+
+def register_gauge(name: str, documentation: str, callback: Callable[[], float]) -> None:
+  """(Re)binds a scrape-time gauge; later bindings win so reloaded singletons are the ones read."""
+  gauge = REGISTRY.register(Gauge(name, documentation, callback=callback))
+  gauge.callback = callback
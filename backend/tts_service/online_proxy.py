@@ -0,0 +1,478 @@
+"""Online TTS proxy: one pooled async upstream client with retries, a circuit breaker and hedging.
+
+Upstream audio is fetched once into the local audio cache and served from ``/media`` after that.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from functools import lru_cache
+from pathlib import Path, PurePosixPath
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urljoin, urlsplit
+
+import anyio
+import httpx
+from fastapi import HTTPException, status
+
+from .audio_cache import build_cache_key, get_audio_index, sanitize_voice_id
+from .audio_codec import AUDIO_MEDIA_TYPES, read_duration_ms
+from .cache_eviction import get_cache_evictor
+from .metrics import ONLINE_ATTEMPTS, ONLINE_CIRCUIT_REJECTIONS, ONLINE_HEDGES, ONLINE_LATENCY
+from .settings import Settings, get_settings
+from .system import get_usage_counters
+from .tts import SingleFlight, TTSRequest
+
+LOGGER = logging.getLogger(__name__)
+
+# Upstream answers that mean "try again", as opposed to a definitive result or client error.
+RETRYABLE_STATUS = frozenset({429, 502, 503, 504})
+_BACKOFF_CAP_SECONDS = 2.0
+# Upstream audio larger than this is relayed by URL instead of cached.
+MAX_ONLINE_AUDIO_BYTES = 64 * 1024 * 1024
+# Cache extensions for upstream audio; anything else is relayed without caching. Ogg may carry
+# Vorbis as well as Opus, so it is only cached as ``.opus`` once the stream header says Opus.
+_CONTENT_TYPE_EXTENSIONS = {
+    "audio/mpeg": "mp3",
+    "audio/mp3": "mp3",
+    "audio/wav": "wav",
+    "audio/wave": "wav",
+    "audio/x-wav": "wav",
+    "audio/flac": "flac",
+    "audio/x-flac": "flac",
+    "audio/ogg": "ogg",
+    "audio/opus": "opus",
+}
+_URL_SUFFIX_EXTENSIONS = {"mp3": "mp3", "wav": "wav", "flac": "flac", "opus": "opus", "ogg": "ogg"}
+# Enough of an Ogg stream to cover the first page header, its segment table and the codec magic.
+_OGG_HEAD_BYTES = 27 + 255 + 8
+
+
+def _http2_available() -> bool:
+  # httpx only speaks HTTP/2 with the optional ``h2`` package installed.
+  return importlib.util.find_spec("h2") is not None
+
+
+def _cache_stem(settings: Settings, payload: TTSRequest) -> str:
+  # The provider tag keeps online audio apart from Piper output for the same text, and switching
+  # ONLINE_TTS_BASE_URL to another provider starts a fresh set of entries.
+  provider = "online:" + urlsplit(settings.online_tts_base_url or "").netloc.lower()
+  cache_key = build_cache_key(
+      [
+          provider,
+          payload.voice_id,
+          "" if payload.rate is None else str(payload.rate),
+          "" if payload.pitch is None else str(payload.pitch),
+          payload.text,
+      ]
+  )
+  return f"{cache_key}-{sanitize_voice_id(payload.voice_id)}"
+
+
+def _cached_file(settings: Settings, stem: str) -> Optional[Path]:
+  # The extension follows whatever format the upstream returned, so each one is probed.
+  for extension in AUDIO_MEDIA_TYPES:
+    file_path = settings.media_dir / f"{stem}.{extension}"
+    if file_path.is_file():
+      return file_path
+  return None
+
+
+def _audio_extension(content_type: Optional[str], audio_url: str) -> Optional[str]:
+  media_type = (content_type or "").split(";", 1)[0].strip().lower()
+  if media_type in _CONTENT_TYPE_EXTENSIONS:
+    return _CONTENT_TYPE_EXTENSIONS[media_type]
+  suffix = PurePosixPath(urlsplit(audio_url).path).suffix.lower().lstrip(".")
+  return _URL_SUFFIX_EXTENSIONS.get(suffix)
+
+
+def _origin(url: str) -> tuple:
+  parts = urlsplit(url)
+  scheme = parts.scheme.lower()
+  try:
+    port = parts.port
+  except ValueError:
+    return (scheme, None, None)
+  return (scheme, (parts.hostname or "").lower(), port or {"http": 80, "https": 443}.get(scheme))
+
+
+def _trusted_audio_url(settings: Settings, audio_url: str) -> bool:
+  # Only the upstream itself and the origins listed in ONLINE_TTS_AUDIO_ORIGINS are fetched from,
+  # so a compromised or misbehaving upstream cannot point the proxy at internal addresses.
+  origin = _origin(audio_url)
+  if origin[0] not in ("http", "https") or not origin[1]:
+    return False
+  trusted = [settings.online_tts_base_url or "", *settings.online_tts_audio_origins]
+  return any(origin == _origin(url) for url in trusted)
+
+
+def _is_ogg_opus(head: bytes) -> bool:
+  # The first Ogg page holds only the codec identification packet, right after the segment table.
+  if len(head) < 27 or not head.startswith(b"OggS"):
+    return False
+  start = 27 + head[26]
+  return head[start:start + 8] == b"OpusHead"
+
+
+def _local_result(settings: Settings, payload: TTSRequest, filename: str, duration_ms: Optional[int]) -> dict:
+  file_path = settings.media_dir / filename
+  if duration_ms is None:
+    duration_ms = read_duration_ms(file_path)
+  get_audio_index().add(payload.book_id, filename)
+  get_cache_evictor().record_access(filename, payload.book_id)
+  return {"audio_url": f"{settings.media_url_prefix}/{filename}", "duration_ms": duration_ms}
+
+
+def _is_failure(response: httpx.Response) -> bool:
+  return response.status_code >= 500 or response.status_code == 429
+
+
+class CircuitBreaker:
+  """Stops calling an upstream after ``failure_threshold`` consecutive failed calls.
+
+  While open, calls are refused for ``reset_seconds``; then a single probe is let through
+  (half-open) and its outcome closes or re-opens the circuit. A threshold of 0 disables it.
+  """
+
+  def __init__(self, failure_threshold: int, reset_seconds: float, clock: Callable[[], float] = time.monotonic):
+    self.failure_threshold = failure_threshold
+    self.reset_seconds = reset_seconds
+    self.clock = clock
+    self._failures = 0
+    self._opened_at: Optional[float] = None
+    self._probing = False
+    self._lock = threading.Lock()
+
+  @property
+  def state(self) -> str:
+    with self._lock:
+      if self._opened_at is None:
+        return "closed"
+      if self._probing or self.clock() - self._opened_at >= self.reset_seconds:
+        return "half_open"
+      return "open"
+
+  def allow(self) -> bool:
+    if self.failure_threshold <= 0:
+      return True
+    with self._lock:
+      if self._opened_at is None:
+        return True
+      if self._probing or self.clock() - self._opened_at < self.reset_seconds:
+        return False
+      self._probing = True
+      return True
+
+  def retry_after(self) -> float:
+    with self._lock:
+      if self._opened_at is None:
+        return 0.0
+      return max(0.0, self.reset_seconds - (self.clock() - self._opened_at))
+
+  def record_success(self) -> None:
+    with self._lock:
+      self._failures = 0
+      self._opened_at = None
+      self._probing = False
+
+  def record_failure(self) -> None:
+    with self._lock:
+      self._failures += 1
+      if self._probing or (self.failure_threshold > 0 and self._failures >= self.failure_threshold):
+        self._opened_at = self.clock()
+      self._probing = False
+
+  def release(self) -> None:
+    """Forgets an in-flight probe whose call ended without an outcome (e.g. the client left)."""
+    with self._lock:
+      self._probing = False
+
+
+class OnlineTTSClient:
+  """Forwards ``/tts/generate`` to the configured upstream over one pooled ``httpx.AsyncClient``.
+
+  Connections (and their TLS sessions) are kept alive across requests, using HTTP/2 when ``h2``
+  is installed. Each attempt is bounded by ``ONLINE_TTS_TIMEOUT_SECONDS``; connection errors,
+  timeouts and 429/502/503/504 are retried up to ``ONLINE_TTS_RETRIES`` times with full-jitter
+  exponential backoff, which is safe because generating speech for the same input is
+  idempotent. With ``ONLINE_TTS_HEDGE_MS`` set, an attempt still unanswered after that delay
+  gets a second identical request and the first usable answer wins.
+  """
+
+  def __init__(self, settings: Settings, transport: Optional[httpx.AsyncBaseTransport] = None):
+    self.settings = settings
+    self.transport = transport
+    self.breaker = CircuitBreaker(settings.online_tts_breaker_failures, settings.online_tts_breaker_reset_seconds)
+    self._client: Optional[httpx.AsyncClient] = None
+    self._loop: Optional[asyncio.AbstractEventLoop] = None
+    self._inflight = SingleFlight()
+    self._closing: set = set()
+
+  def _get_client(self) -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    if self._client is None or self._loop is not loop:
+      # Pooled connections belong to the event loop that opened them, so a new loop gets a new pool.
+      if self._client is not None:
+        self._close_stale(self._client, self._loop, loop)
+      max_connections = max(1, self.settings.online_tts_max_connections)
+      self._client = httpx.AsyncClient(
+          http2=_http2_available(),
+          limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+          timeout=httpx.Timeout(self.settings.online_tts_timeout_seconds),
+          transport=self.transport,
+      )
+      self._loop = loop
+    return self._client
+
+  def _close_stale(
+      self, client: httpx.AsyncClient, owner: Optional[asyncio.AbstractEventLoop], loop: asyncio.AbstractEventLoop
+  ) -> Optional[asyncio.Task]:
+    # Closed on the loop that owns its connections while that loop still runs; once it has gone,
+    # the current loop releases the pool and whatever sockets can still be shut. Returns the task
+    # when the close runs on the current loop.
+    if owner is not loop and owner is not None and owner.is_running() and not owner.is_closed():
+      try:
+        asyncio.run_coroutine_threadsafe(self._quiet_close(client), owner)
+        return None
+      except RuntimeError:
+        pass
+    task = loop.create_task(self._quiet_close(client))
+    self._closing.add(task)
+    task.add_done_callback(self._closing.discard)
+    return task
+
+  @staticmethod
+  async def _quiet_close(client: httpx.AsyncClient) -> None:
+    try:
+      await client.aclose()
+    except Exception as exc:  # sockets of a closed loop may refuse to shut cleanly
+      LOGGER.debug("Closing a stale online TTS client failed: %r", exc)
+
+  async def aclose(self) -> None:
+    client, self._client = self._client, None
+    if client is None:
+      return
+    if self._loop is asyncio.get_running_loop():
+      await client.aclose()
+      return
+    task = self._close_stale(client, self._loop, asyncio.get_running_loop())
+    if task is not None:
+      await task
+
+  async def generate(self, payload: TTSRequest) -> dict:
+    settings = self.settings
+    if not settings.enable_online_proxy or not settings.online_tts_base_url:
+      raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="online proxy disabled")
+    if not settings.online_tts_cache:
+      return await self._generate_upstream(payload)
+    stem = _cache_stem(settings, payload)
+    cached = await anyio.to_thread.run_sync(_cached_file, settings, stem)
+    get_usage_counters().record_lookup(cached is not None)
+    if cached is not None:
+      return await anyio.to_thread.run_sync(_local_result, settings, payload, cached.name, None)
+    outcome = await self._inflight.do_async(stem, lambda: self._generate_and_store(payload, stem))
+    if "filename" in outcome:
+      filename, duration_ms = outcome["filename"], outcome["duration_ms"]
+      return await anyio.to_thread.run_sync(_local_result, settings, payload, filename, duration_ms)
+    return outcome
+
+  async def _generate_and_store(self, payload: TTSRequest, stem: str) -> dict:
+    data = await self._generate_upstream(payload)
+    if not data.get("audio_url"):
+      return data
+    audio_url = urljoin(self.settings.online_tts_base_url.rstrip("/") + "/", data["audio_url"])
+    if not _trusted_audio_url(self.settings, audio_url):
+      LOGGER.warning("Not caching online TTS audio from untrusted origin %s", audio_url)
+      return data
+    try:
+      filename = await self._store_audio(audio_url, stem)
+    except (httpx.HTTPError, OSError, ValueError) as exc:
+      # Caching is an optimisation: the caller still gets the upstream URL.
+      LOGGER.warning("Unable to cache online TTS audio from %s: %s", audio_url, exc)
+      return data
+    if filename is None:
+      return data
+    return {"filename": filename, "duration_ms": data.get("duration_ms")}
+
+  async def _store_audio(self, audio_url: str, stem: str) -> Optional[str]:
+    headers = {}
+    base_url = self.settings.online_tts_base_url or ""
+    if self.settings.online_tts_api_key and _origin(audio_url) == _origin(base_url):
+      headers["Authorization"] = f"Bearer {self.settings.online_tts_api_key}"
+    async with self._get_client().stream("GET", audio_url, headers=headers) as response:
+      response.raise_for_status()
+      extension = _audio_extension(response.headers.get("content-type"), audio_url)
+      if extension is None:
+        LOGGER.info("Not caching online TTS audio of type %s", response.headers.get("content-type"))
+        return None
+      # File I/O runs in worker threads: a cached file can be tens of MiB.
+      tmp_path = anyio.Path(self.settings.media_dir / f"{stem}.{uuid.uuid4().hex[:8]}.tmp")
+      try:
+        size = 0
+        head = b""
+        async with await tmp_path.open("wb") as handle:
+          async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            if size > MAX_ONLINE_AUDIO_BYTES:
+              raise ValueError("online TTS audio exceeds the cache size limit")
+            if extension == "ogg":
+              head += chunk
+              if len(head) < _OGG_HEAD_BYTES:
+                continue
+              extension = self._ogg_extension(head)
+              if extension is None:
+                return None
+              chunk, head = head, b""
+            await handle.write(chunk)
+          if extension == "ogg":
+            # The whole stream was shorter than the probe.
+            extension = self._ogg_extension(head)
+            if extension is None:
+              return None
+            await handle.write(head)
+        file_path = self.settings.media_dir / f"{stem}.{extension}"
+        await tmp_path.replace(file_path)
+      finally:
+        await tmp_path.unlink(missing_ok=True)
+    get_usage_counters().cache_added(size)
+    return file_path.name
+
+  @staticmethod
+  def _ogg_extension(head: bytes) -> Optional[str]:
+    if _is_ogg_opus(head):
+      return "opus"
+    LOGGER.info("Not caching online TTS audio in an Ogg codec other than Opus")
+    return None
+
+  async def _generate_upstream(self, payload: TTSRequest) -> dict:
+    settings = self.settings
+    if not self.breaker.allow():
+      ONLINE_CIRCUIT_REJECTIONS.inc()
+      raise HTTPException(
+          status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+          detail="online TTS upstream unavailable",
+          headers={"Retry-After": str(max(1, math.ceil(self.breaker.retry_after())))},
+      )
+
+    endpoint = settings.online_tts_base_url.rstrip("/") + "/tts/generate"
+    headers = {"Content-Type": "application/json"}
+    if settings.online_tts_api_key:
+      headers["Authorization"] = f"Bearer {settings.online_tts_api_key}"
+    body = payload.model_dump(exclude_none=True)
+
+    failed: Optional[bool] = None
+    try:
+      upstream = await self._send_with_retries(endpoint, body, headers)
+      failed = _is_failure(upstream)
+    except HTTPException:
+      failed = True
+      raise
+    finally:
+      if failed is None:
+        self.breaker.release()
+      elif failed:
+        self.breaker.record_failure()
+      else:
+        self.breaker.record_success()
+    if upstream.status_code >= 400:
+      raise HTTPException(status_code=upstream.status_code, detail=upstream.text)
+    data = upstream.json()
+    return {"audio_url": data.get("audio_url"), "duration_ms": data.get("duration_ms")}
+
+  async def _send_with_retries(self, endpoint: str, body: Dict[str, Any], headers: Dict[str, str]) -> httpx.Response:
+    attempts = max(0, self.settings.online_tts_retries) + 1
+    for attempt in range(attempts):
+      last = attempt == attempts - 1
+      try:
+        response = await self._attempt(endpoint, body, headers)
+      except (httpx.TransportError, asyncio.TimeoutError) as exc:
+        if last:
+          timed_out = isinstance(exc, (httpx.TimeoutException, asyncio.TimeoutError))
+          LOGGER.warning("Online TTS upstream failed after %s attempts: %r", attempts, exc)
+          raise HTTPException(
+              status_code=status.HTTP_504_GATEWAY_TIMEOUT if timed_out else status.HTTP_502_BAD_GATEWAY,
+              detail="online TTS upstream timed out" if timed_out else "online TTS upstream unreachable",
+          ) from exc
+        delay = self._backoff(attempt)
+      else:
+        if last or response.status_code not in RETRYABLE_STATUS:
+          return response
+        delay = self._backoff(attempt, response.headers.get("retry-after"))
+      await asyncio.sleep(delay)
+    raise AssertionError("unreachable")  # pragma: no cover
+
+  def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+    ceiling = min(_BACKOFF_CAP_SECONDS, self.settings.online_tts_backoff_ms / 1000 * (2 ** attempt))
+    delay = random.uniform(0, ceiling)
+    if retry_after and retry_after.isdigit():
+      delay = max(delay, min(float(retry_after), _BACKOFF_CAP_SECONDS))
+    return delay
+
+  async def _attempt(self, endpoint: str, body: Dict[str, Any], headers: Dict[str, str]) -> httpx.Response:
+    hedge_delay = self.settings.online_tts_hedge_ms / 1000
+    if hedge_delay <= 0:
+      return await self._post(endpoint, body, headers)
+    primary = asyncio.ensure_future(self._post(endpoint, body, headers))
+    try:
+      done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+    except asyncio.CancelledError:
+      # The caller left before the hedge delay; stop the upstream call instead of orphaning it.
+      primary.cancel()
+      raise
+    if done:
+      return primary.result()
+    ONLINE_HEDGES.inc()
+    pending = {primary, asyncio.ensure_future(self._post(endpoint, body, headers))}
+    outcome: Any = None
+    try:
+      while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+          if task.exception() is not None:
+            outcome = outcome if isinstance(outcome, httpx.Response) else task.exception()
+          elif not _is_failure(task.result()):
+            return task.result()
+          else:
+            outcome = task.result()
+    finally:
+      for task in pending:
+        task.cancel()
+      await asyncio.gather(*pending, return_exceptions=True)
+    if isinstance(outcome, BaseException):
+      raise outcome
+    return outcome
+
+  async def _post(self, endpoint: str, body: Dict[str, Any], headers: Dict[str, str]) -> httpx.Response:
+    started = time.perf_counter()
+    try:
+      response = await asyncio.wait_for(
+          self._get_client().post(endpoint, json=body, headers=headers),
+          timeout=self.settings.online_tts_timeout_seconds,
+      )
+    except (asyncio.TimeoutError, httpx.TimeoutException):
+      ONLINE_ATTEMPTS.inc(outcome="timeout")
+      raise
+    except httpx.TransportError:
+      ONLINE_ATTEMPTS.inc(outcome="transport_error")
+      raise
+    finally:
+      ONLINE_LATENCY.observe(time.perf_counter() - started)
+    if response.status_code >= 500:
+      ONLINE_ATTEMPTS.inc(outcome="server_error")
+    elif response.status_code >= 400:
+      ONLINE_ATTEMPTS.inc(outcome="client_error")
+    else:
+      ONLINE_ATTEMPTS.inc(outcome="ok")
+    return response
+
+
+@lru_cache(maxsize=1)
+def get_online_client() -> OnlineTTSClient:
+  return OnlineTTSClient(get_settings())
@@ -0,0 +1,280 @@
+"""Warm Piper worker pool: long-lived processes fed JSON lines over stdin."""
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import selectors
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .metrics import PIPER_SPAWN_SECONDS
+from .settings import Settings, get_settings
+
+LOGGER = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+
+WorkerKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class PiperWorkerError(RuntimeError):
+  """Raised when a pooled worker cannot produce audio; callers fall back to one-shot Piper."""
+
+
+class PiperWorker:
+  """One resident Piper process with its voice model loaded."""
+
+  def __init__(self, piper_bin: Path, model_path: str, env_overrides: Dict[str, str]):
+    self.model_path = model_path
+    self.model_bytes = _model_size(model_path)
+    self.busy = False
+    self.last_used = time.monotonic()
+    env = os.environ.copy()
+    env.update(env_overrides)
+    self.process = subprocess.Popen(
+        [str(piper_bin), "--model", model_path, "--json-input"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        env=env,
+    )
+
+  @property
+  def pid(self) -> int:
+    return self.process.pid
+
+  def alive(self) -> bool:
+    return self.process.poll() is None
+
+  def synthesize(self, text: str, output_path: Path, timeout: float) -> None:
+    if not self.alive():
+      raise PiperWorkerError(f"worker {self.pid} exited with {self.process.returncode}")
+    request = json.dumps({"text": text, "output_file": str(output_path)}, ensure_ascii=False)
+    try:
+      self.process.stdin.write(request.encode("utf-8") + b"\n")
+      self.process.stdin.flush()
+    except (BrokenPipeError, OSError) as exc:
+      raise PiperWorkerError(f"worker {self.pid} stdin closed") from exc
+    line = self._read_line(timeout)
+    if not line:
+      raise PiperWorkerError(f"worker {self.pid} closed stdout")
+    if not output_path.exists():
+      raise PiperWorkerError(f"worker {self.pid} reported {line!r} but wrote no audio")
+    self.last_used = time.monotonic()
+
+  def _read_line(self, timeout: float) -> str:
+    with selectors.DefaultSelector() as selector:
+      selector.register(self.process.stdout, selectors.EVENT_READ)
+      if not selector.select(timeout):
+        raise PiperWorkerError(f"worker {self.pid} timed out after {timeout}s")
+    return self.process.stdout.readline().decode("utf-8", errors="replace").strip()
+
+  def close(self) -> None:
+    if self.alive():
+      try:
+        self.process.stdin.close()
+        self.process.wait(timeout=2)
+      except (OSError, subprocess.TimeoutExpired):
+        self.process.kill()
+        self.process.wait()
+    for stream in (self.process.stdin, self.process.stdout):
+      if stream and not stream.closed:
+        stream.close()
+
+
+def _model_size(model_path: str) -> int:
+  try:
+    return Path(model_path).stat().st_size
+  except OSError:
+    return 0
+
+
+class PiperPool:
+  """Keeps warm workers per (model, env) with a worker cap and an LRU model memory budget."""
+
+  def __init__(self, piper_bin: Path, max_workers: int, memory_budget_bytes: int, timeout_seconds: float):
+    self.piper_bin = piper_bin
+    self.max_workers = max(1, max_workers)
+    self.memory_budget_bytes = memory_budget_bytes
+    self.timeout_seconds = timeout_seconds
+    self._workers: "OrderedDict[WorkerKey, List[PiperWorker]]" = OrderedDict()
+    self._cond = threading.Condition()
+    self._closed = False
+    # Byte sizes of workers being spawned outside the lock; they already count against the caps.
+    self._pending: List[int] = []
+
+  def synthesize(self, model_path: str, env_overrides: Dict[str, str], text: str, output_path: Path) -> None:
+    key: WorkerKey = (model_path, tuple(sorted(env_overrides.items())))
+    last_error: Optional[PiperWorkerError] = None
+    # A crashed worker gets exactly one fresh replacement before the caller falls back.
+    for _ in range(2):
+      worker = self._acquire(key, env_overrides)
+      try:
+        worker.synthesize(text, output_path, self.timeout_seconds)
+      except PiperWorkerError as exc:
+        LOGGER.warning("Piper worker failed, restarting: %s", exc)
+        self._discard(key, worker)
+        output_path.unlink(missing_ok=True)
+        last_error = exc
+        continue
+      self._release(worker)
+      return
+    raise last_error or PiperWorkerError("piper worker unavailable")
+
+  def stats(self) -> dict:
+    with self._cond:
+      return {
+          "workers": self._worker_count(),
+          "busy": sum(1 for workers in self._workers.values() for worker in workers if worker.busy),
+          "models": len(self._workers),
+          "model_memory_mb": round(self._memory_in_use() / _MB, 2),
+      }
+
+  def health_check(self) -> int:
+    """Reap crashed idle workers; returns how many were removed."""
+    with self._cond:
+      reaped = [worker for key in list(self._workers) for worker in self._reap(key)]
+      self._cond.notify_all()
+    _close_workers(reaped)
+    return len(reaped)
+
+  def close(self) -> None:
+    with self._cond:
+      self._closed = True
+      workers = [worker for group in self._workers.values() for worker in group]
+      self._workers.clear()
+      self._cond.notify_all()
+    _close_workers(workers)
+
+  def _acquire(self, key: WorkerKey, env_overrides: Dict[str, str]) -> PiperWorker:
+    deadline = time.monotonic() + self.timeout_seconds
+    model_bytes = _model_size(key[0])
+    while True:
+      # Evicted and crashed workers are closed after the lock is released; close() can block.
+      retired: List[PiperWorker] = []
+      try:
+        with self._cond:
+          if self._closed:
+            raise PiperWorkerError("piper pool closed")
+          for group_key in list(self._workers):
+            retired.extend(self._reap(group_key))
+          for worker in self._workers.get(key, []):
+            if not worker.busy:
+              worker.busy = True
+              self._workers.move_to_end(key)
+              return worker
+          if self._make_room(model_bytes, retired):
+            self._pending.append(model_bytes)
+            break
+          remaining = deadline - time.monotonic()
+          if remaining <= 0:
+            raise PiperWorkerError("timed out waiting for a free piper worker")
+          if not retired:
+            self._cond.wait(timeout=remaining)
+      finally:
+        _close_workers(retired)
+    worker: Optional[PiperWorker] = None
+    try:
+      started = time.perf_counter()
+      worker = PiperWorker(self.piper_bin, key[0], env_overrides)
+      PIPER_SPAWN_SECONDS.observe(time.perf_counter() - started)
+    except OSError as exc:
+      raise PiperWorkerError(f"unable to spawn piper: {exc}") from exc
+    finally:
+      with self._cond:
+        self._pending.remove(model_bytes)
+        if worker is not None:
+          worker.busy = True
+          self._workers.setdefault(key, []).append(worker)
+          self._workers.move_to_end(key)
+        self._cond.notify_all()
+    return worker
+
+  def _release(self, worker: PiperWorker) -> None:
+    with self._cond:
+      worker.busy = False
+      self._cond.notify_all()
+
+  def _discard(self, key: WorkerKey, worker: PiperWorker) -> None:
+    with self._cond:
+      group = self._workers.get(key, [])
+      if worker in group:
+        group.remove(worker)
+      if not group:
+        self._workers.pop(key, None)
+      self._cond.notify_all()
+    worker.close()
+
+  def _reap(self, key: WorkerKey) -> List[PiperWorker]:
+    """Drop crashed idle workers from ``key``'s group; the caller closes them outside the lock."""
+    group = self._workers.get(key)
+    if not group:
+      return []
+    dead = [worker for worker in group if not worker.busy and not worker.alive()]
+    for worker in dead:
+      group.remove(worker)
+    if not group:
+      self._workers.pop(key, None)
+    return dead
+
+  def _make_room(self, model_bytes: int, victims: List[PiperWorker]) -> bool:
+    """Evict idle least-recently-used workers until a new one fits; False means wait.
+
+    Evicted workers are appended to ``victims`` for the caller to close once the lock is released.
+    """
+    while self._worker_count() >= self.max_workers or (
+        self._worker_count() and self._memory_in_use() + model_bytes > self.memory_budget_bytes
+    ):
+      victim = self._lru_idle_worker()
+      if victim is None:
+        return False
+      victim_key, worker = victim
+      self._workers[victim_key].remove(worker)
+      if not self._workers[victim_key]:
+        self._workers.pop(victim_key)
+      LOGGER.info("Evicting idle Piper worker for %s", victim_key[0])
+      victims.append(worker)
+    return True
+
+  def _lru_idle_worker(self) -> Optional[Tuple[WorkerKey, PiperWorker]]:
+    for key, group in self._workers.items():
+      for worker in group:
+        if not worker.busy:
+          return key, worker
+    return None
+
+  def _worker_count(self) -> int:
+    return sum(len(group) for group in self._workers.values()) + len(self._pending)
+
+  def _memory_in_use(self) -> int:
+    # Every worker is its own process, so each one holds a full copy of its model.
+    loaded = sum(worker.model_bytes for group in self._workers.values() for worker in group)
+    return loaded + sum(self._pending)
+
+
+def _close_workers(workers: List[PiperWorker]) -> None:
+  for worker in workers:
+    worker.close()
+
+
+@lru_cache(maxsize=1)
+def get_piper_pool() -> Optional[PiperPool]:
+  settings: Settings = get_settings()
+  if not settings.piper_pool_enabled or not (settings.piper_bin and settings.piper_bin.exists()):
+    return None
+  pool = PiperPool(
+      settings.piper_bin,
+      max_workers=settings.piper_pool_size,
+      memory_budget_bytes=settings.piper_pool_memory_mb * _MB,
+      timeout_seconds=settings.piper_timeout_seconds,
+  )
+  atexit.register(pool.close)
+  return pool
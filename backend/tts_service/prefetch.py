@@ -0,0 +1,162 @@
+"""Low-priority read-ahead: synthesizes upcoming paragraphs into the cache before they are requested."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+
+from .admission import AdmissionController, get_admission_controller, get_synthesis_costs
+from .settings import Settings, get_settings
+from .tts import TTSRequest, is_cached, synthesize
+from .workers import BackgroundWorkers
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class PrefetchJob:
+  id: str
+  book_id: Optional[str]
+  items: List[TTSRequest]
+  state: str = "queued"
+  next_index: int = 0
+  completed: int = 0
+  cached: int = 0
+  failed: int = 0
+  created_at: float = field(default_factory=time.time)
+
+  def as_dict(self) -> dict:
+    return {
+        "job_id": self.id,
+        "book_id": self.book_id,
+        "status": self.state,
+        "total": len(self.items),
+        "completed": self.completed,
+        "cached": self.cached,
+        "failed": self.failed,
+    }
+
+
+class Prefetcher:
+  """Runs prefetch jobs on daemon threads using only idle synthesis capacity.
+
+  Each item takes an admission slot through ``try_acquire``, which refuses while any foreground
+  request is queued and keeps one slot free for them, so read-ahead never delays what the reader
+  is waiting on. The newest job is served first, and a new job for a book supersedes that book's
+  older ones: the reader has moved on, so their remaining paragraphs are no longer needed.
+  Cancelling drops a job's pending items; an item already synthesizing finishes into the cache.
+  """
+
+  def __init__(
+      self,
+      settings: Settings,
+      admission: AdmissionController,
+      synthesize_item: Callable[[Settings, TTSRequest], object] = synthesize,
+      workers: int = 1,
+      poll_seconds: float = 0.05,
+      max_jobs: int = 256,
+  ):
+    self.settings = settings
+    self.admission = admission
+    self.synthesize_item = synthesize_item
+    self.workers = max(1, workers)
+    self.poll_seconds = poll_seconds
+    self.max_jobs = max_jobs
+    self._jobs: "OrderedDict[str, PrefetchJob]" = OrderedDict()
+    self._lock = threading.Lock()
+    self._workers = BackgroundWorkers(
+        "tts-prefetch", self._lock, self._next_item, lambda claimed: self._process(*claimed), limit=workers
+    )
+
+  def submit(self, book_id: Optional[str], items: List[TTSRequest]) -> PrefetchJob:
+    job = PrefetchJob(id=uuid.uuid4().hex, book_id=book_id, items=items)
+    with self._lock:
+      if book_id:
+        for other in self._jobs.values():
+          if other.book_id == book_id and other.state in ("queued", "running"):
+            other.state = "cancelled"
+      self._jobs[job.id] = job
+      self._trim()
+      self._workers.wake(self.workers)
+    return job
+
+  def get(self, job_id: str) -> Optional[dict]:
+    with self._lock:
+      job = self._jobs.get(job_id)
+      return job.as_dict() if job else None
+
+  def cancel(self, job_id: str) -> Optional[dict]:
+    with self._lock:
+      job = self._jobs.get(job_id)
+      if job is None:
+        return None
+      if job.state in ("queued", "running"):
+        job.state = "cancelled"
+      return job.as_dict()
+
+  def cancel_book(self, book_id: str) -> int:
+    with self._lock:
+      jobs = [job for job in self._jobs.values() if job.book_id == book_id and job.state in ("queued", "running")]
+      for job in jobs:
+        job.state = "cancelled"
+      return len(jobs)
+
+  def _trim(self) -> None:
+    finished = [job_id for job_id, job in self._jobs.items() if job.state in ("done", "cancelled")]
+    for job_id in finished[: max(0, len(self._jobs) - self.max_jobs)]:
+      del self._jobs[job_id]
+
+  def _next_item(self) -> Optional[Tuple[PrefetchJob, TTSRequest]]:
+    for job in reversed(self._jobs.values()):
+      if job.state not in ("queued", "running"):
+        continue
+      if job.next_index >= len(job.items):
+        continue
+      job.state = "running"
+      item = job.items[job.next_index]
+      job.next_index += 1
+      return job, item
+    return None
+
+  def _finish_item(self, job: PrefetchJob, outcome: str) -> None:
+    with self._lock:
+      if outcome == "cached":
+        job.cached += 1
+      elif outcome == "failed":
+        job.failed += 1
+      else:
+        job.completed += 1
+      done = job.completed + job.cached + job.failed
+      if job.state == "running" and done >= len(job.items):
+        job.state = "done"
+
+  def _process(self, job: PrefetchJob, item: TTSRequest) -> None:
+    if is_cached(self.settings, item):
+      self._finish_item(job, "cached")
+      return
+    cost_seconds = get_synthesis_costs().estimate_seconds(item.voice_id, len(item.text))
+    while not self.admission.try_acquire(cost_seconds):
+      if job.state == "cancelled":
+        return
+      time.sleep(self.poll_seconds)
+    try:
+      self.synthesize_item(self.settings, item)
+    except Exception:  # pragma: no cover - read-ahead is best effort
+      LOGGER.exception("prefetch synthesis failed")
+      self._finish_item(job, "failed")
+      return
+    finally:
+      self.admission.release(cost_seconds)
+    self._finish_item(job, "synthesized")
+
+
+@lru_cache(maxsize=1)
+def get_prefetcher() -> Prefetcher:
+  settings = get_settings()
+  return Prefetcher(settings, get_admission_controller(), workers=settings.prefetch_workers)
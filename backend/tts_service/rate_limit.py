@@ -1,38 +1,72 @@
-"""Simple in-memory rate limiter keyed by client IP."""
+"""In-memory rate limiter keyed by client IP (GCRA, constant state per client)."""
 
 from __future__ import annotations
 
+import math
 import time
-from collections import deque
 from dataclasses import dataclass
 from threading import Lock
-from typing import Deque, Dict
+from typing import Dict, List
 
 from fastapi import HTTPException, status
 
+from .metrics import RATE_LIMIT_REJECTIONS
 from .settings import get_settings
 
 
+class _Shard:
+  __slots__ = ("lock", "tat", "last_sweep")
+
+  def __init__(self, now: float):
+    self.lock = Lock()
+    # key → theoretical arrival time: when that client's bucket is next fully drained.
+    self.tat: Dict[str, float] = {}
+    self.last_sweep = now
+
+
 @dataclass
 class RateLimiter:
+  """Generic cell rate algorithm: ``max_requests`` per ``window_seconds``, burst of the same size.
+
+  Each client costs one float, keys are spread over ``shards`` independently locked dicts, and a
+  shard drops keys whose TAT has passed (they are indistinguishable from new clients) at most once
+  per ``window_seconds``, so scans and NAT churn cannot grow the table without bound.
+  """
+
   max_requests: int
   window_seconds: int
+  shards: int = 16
 
   def __post_init__(self) -> None:
-    self._hits: Dict[str, Deque[float]] = {}
-    self._lock = Lock()
+    self._interval = self.window_seconds / max(1, self.max_requests)
+    self._tolerance = self.window_seconds - self._interval
+    now = time.monotonic()
+    self._shards: List[_Shard] = [_Shard(now) for _ in range(max(1, self.shards))]
 
-  def allow(self, key: str) -> bool:
+  def __len__(self) -> int:
+    return sum(len(shard.tat) for shard in self._shards)
+
+  def reserve(self, key: str, cost: float = 1.0) -> float:
+    """Charges ``cost`` requests to ``key``; returns 0 when admitted, else seconds until it would be."""
     now = time.monotonic()
-    cutoff = now - self.window_seconds
-    with self._lock:
-      history = self._hits.setdefault(key, deque())
-      while history and history[0] < cutoff:
-        history.popleft()
-      if len(history) >= self.max_requests:
-        return False
-      history.append(now)
-      return True
+    shard = self._shards[hash(key) % len(self._shards)]
+    with shard.lock:
+      if now - shard.last_sweep >= self.window_seconds:
+        self._sweep(shard, now)
+      tat = max(shard.tat.get(key, now), now)
+      # Written relative to ``tat - now`` so a fresh key compares exactly 0 against the tolerance.
+      wait = (tat - now) + self._interval * (cost - 1) - self._tolerance
+      if wait > 0:
+        return wait
+      shard.tat[key] = tat + self._interval * cost
+      return 0.0
+
+  def allow(self, key: str) -> bool:
+    return self.reserve(key) == 0.0
+
+  def _sweep(self, shard: _Shard, now: float) -> None:
+    shard.tat = {key: tat for key, tat in shard.tat.items() if tat > now}
+    shard.last_sweep = now
 
 
 _rate_limiter: RateLimiter | None = None
@@ -49,7 +83,55 @@ def get_rate_limiter() -> RateLimiter:
   return _rate_limiter
 
 
+def _too_many(detail: str, wait: float) -> HTTPException:
+  return HTTPException(
+      status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+      detail=detail,
+      headers={"Retry-After": str(max(1, math.ceil(wait)))},
+  )
+
+
 def enforce_rate_limit(client_key: str) -> None:
   limiter = get_rate_limiter()
-  if not limiter.allow(client_key):
-    raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="rate limit exceeded")
+  wait = limiter.reserve(client_key)
+  if wait:
+    RATE_LIMIT_REJECTIONS.inc(reason="requests")
+    raise _too_many("rate limit exceeded", wait)
+
+
+class ClientBudgets:
+  """Per-client cost budgets (``name`` → units per window), one GCRA limiter each.
+
+  Requests are charged what they actually cost — characters for synthesis, bytes for uploads —
+  instead of counting as one call. A single charge larger than the whole budget is clamped to
+  it, so an oversized request still goes through once the client's budget is full again.
+  """
+
+  def __init__(self, limits: Dict[str, int], window_seconds: int):
+    self._limiters = {name: RateLimiter(limit, window_seconds) for name, limit in limits.items() if limit > 0}
+
+  def charge(self, budget: str, client_key: str, amount: float) -> None:
+    limiter = self._limiters.get(budget)
+    if limiter is None or amount <= 0:
+      return
+    wait = limiter.reserve(client_key, min(amount, limiter.max_requests))
+    if wait:
+      RATE_LIMIT_REJECTIONS.inc(reason=budget)
+      raise _too_many(f"{budget.replace('_', ' ')} budget exceeded", wait)
+
+
+_client_budgets: ClientBudgets | None = None
+_budgets_signature: tuple[int, int, int] | None = None
+
+
+def get_client_budgets() -> ClientBudgets:
+  global _client_budgets, _budgets_signature
+  settings = get_settings()
+  signature = (settings.tts_char_limit, settings.upload_byte_limit, settings.request_window_seconds)
+  if _client_budgets is None or _budgets_signature != signature:
+    _client_budgets = ClientBudgets(
+        {"tts_chars": settings.tts_char_limit, "upload_bytes": settings.upload_byte_limit},
+        settings.request_window_seconds,
+    )
+    _budgets_signature = signature
+  return _client_budgets
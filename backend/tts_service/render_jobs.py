@@ -0,0 +1,331 @@
+"""Background whole-book rendering into the audio cache, checkpointed so restarts resume."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException, status
+
+from .admission import AdmissionController, get_admission_controller, get_synthesis_costs
+from .book_text import BookParseError, parse_book, split_for_synthesis
+from .settings import Settings, get_settings
+from .tts import TTSRequest, is_cached, remove_cached_audio_for_book, synthesize
+from .workers import BackgroundWorkers
+
+LOGGER = logging.getLogger(__name__)
+
+ACTIVE_STATES = ("queued", "running")
+
+
+@dataclass
+class RenderJob:
+  id: str
+  book_id: str
+  source: str
+  voice_id: str
+  rate: Optional[float]
+  pitch: Optional[float]
+  state: str = "queued"
+  total: Optional[int] = None
+  completed: int = 0
+  failed: int = 0
+  # Every chunk before this index is finished; a restart resumes here.
+  checkpoint: int = 0
+  error: Optional[str] = None
+  created_at: float = field(default_factory=time.time)
+  updated_at: float = field(default_factory=time.time)
+  chunks: Optional[List[str]] = None
+  parsing: bool = False
+  next_index: int = 0
+  returned: List[int] = field(default_factory=list)
+  finished: Set[int] = field(default_factory=set)
+
+  def as_dict(self) -> dict:
+    progress = None
+    if self.total:
+      progress = round((self.completed + self.failed) / self.total, 4)
+    elif self.total == 0:
+      progress = 1.0
+    return {
+        "job_id": self.id,
+        "book_id": self.book_id,
+        "voice_id": self.voice_id,
+        "rate": self.rate,
+        "pitch": self.pitch,
+        "status": self.state,
+        "total": self.total,
+        "completed": self.completed,
+        "failed": self.failed,
+        "checkpoint": self.checkpoint,
+        "progress": progress,
+        "error": self.error,
+    }
+
+
+def render_job_id(book_id: str, voice_id: str, rate: Optional[float], pitch: Optional[float]) -> str:
+  # One job per book and voice settings, so resubmitting returns the job already under way.
+  key = "|".join([book_id, voice_id, "" if rate is None else str(rate), "" if pitch is None else str(pitch)])
+  return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+class RenderJobManager:
+  """Renders stored books chunk by chunk on worker threads, persisting progress in SQLite.
+
+  Workers take admission slots through ``try_acquire``, so rendering fills the cores foreground
+  synthesis is not using and backs off as soon as readers queue. Chunks finish out of order;
+  the stored checkpoint only advances past a contiguous run of finished chunks, and anything
+  after it is re-checked against the cache on resume, which makes a repeat nearly free. Audio is
+  synthesized with the job's ``book_id`` so it lands in the audio index under the book.
+  """
+
+  _SCHEMA_VERSION = 1
+
+  def __init__(
+      self,
+      settings: Settings,
+      db_path: Path,
+      admission: AdmissionController,
+      synthesize_item: Callable[[Settings, TTSRequest], object] = synthesize,
+      workers: int = 1,
+      max_jobs: int = 4,
+      poll_seconds: float = 0.05,
+  ):
+    self.settings = settings
+    self.admission = admission
+    self.synthesize_item = synthesize_item
+    self.workers = max(1, workers)
+    self.max_jobs = max(1, max_jobs)
+    self.poll_seconds = poll_seconds
+    self._lock = threading.Lock()
+    self._workers = BackgroundWorkers("book-render", self._lock, self._claim, self._work, limit=workers)
+    self._conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+    self._conn.execute("PRAGMA journal_mode=WAL")
+    self._ensure_schema()
+    self._jobs: Dict[str, RenderJob] = {}
+    for row in self._conn.execute(
+        "SELECT id, book_id, source, voice_id, rate, pitch, state, total, failed, checkpoint, error, created_at, updated_at"
+        " FROM render_jobs ORDER BY created_at"
+    ):
+      job = RenderJob(*row[:7], total=row[7], failed=row[8], checkpoint=row[9], error=row[10], created_at=row[11], updated_at=row[12])
+      if job.state == "running":
+        # Interrupted by a restart; the chunks list is rebuilt when a worker picks it up again.
+        job.state = "queued"
+      job.completed = max(0, job.checkpoint - job.failed)
+      job.next_index = job.checkpoint
+      self._jobs[job.id] = job
+
+  def _ensure_schema(self) -> None:
+    version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= self._SCHEMA_VERSION:
+      return
+    self._conn.execute(
+        "CREATE TABLE IF NOT EXISTS render_jobs ("
+        " id TEXT PRIMARY KEY, book_id TEXT NOT NULL, source TEXT NOT NULL, voice_id TEXT NOT NULL,"
+        " rate REAL, pitch REAL, state TEXT NOT NULL, total INTEGER, failed INTEGER NOT NULL DEFAULT 0,"
+        " checkpoint INTEGER NOT NULL DEFAULT 0, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+    )
+    self._conn.execute("CREATE INDEX IF NOT EXISTS render_jobs_by_book ON render_jobs (book_id)")
+    self._conn.execute(f"PRAGMA user_version = {self._SCHEMA_VERSION}")
+
+  def _save(self, job: RenderJob) -> None:
+    job.updated_at = time.time()
+    self._conn.execute(
+        "INSERT INTO render_jobs (id, book_id, source, voice_id, rate, pitch, state, total, failed, checkpoint, error,"
+        " created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        " ON CONFLICT (id) DO UPDATE SET state = excluded.state, total = excluded.total, failed = excluded.failed,"
+        " checkpoint = excluded.checkpoint, error = excluded.error, updated_at = excluded.updated_at",
+        (
+            job.id, job.book_id, job.source, job.voice_id, job.rate, job.pitch, job.state, job.total,
+            job.failed, job.checkpoint, job.error, job.created_at, job.updated_at,
+        ),
+    )
+
+  def _start_workers(self) -> None:
+    self._workers.wake(self.workers)
+
+  def resume_pending(self) -> int:
+    """Starts workers for jobs left queued by a previous run; returns how many there are."""
+    with self._lock:
+      pending = sum(1 for job in self._jobs.values() if job.state in ACTIVE_STATES)
+      if pending:
+        self._start_workers()
+      return pending
+
+  def submit(self, book_id: str, source: Path, voice_id: str, rate: Optional[float] = None, pitch: Optional[float] = None) -> dict:
+    job_id = render_job_id(book_id, voice_id, rate, pitch)
+    with self._lock:
+      job = self._jobs.get(job_id)
+      if job is not None and job.state in (*ACTIVE_STATES, "paused"):
+        return job.as_dict()
+      active = sum(1 for other in self._jobs.values() if other.state in (*ACTIVE_STATES, "paused"))
+      if active >= self.max_jobs:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="too many render jobs")
+      # New, or a finished/cancelled/failed job run again: start over; cached chunks are skipped quickly.
+      job = RenderJob(id=job_id, book_id=book_id, source=str(source), voice_id=voice_id, rate=rate, pitch=pitch)
+      self._jobs[job_id] = job
+      self._save(job)
+      self._start_workers()
+      return job.as_dict()
+
+  def get(self, job_id: str) -> Optional[dict]:
+    with self._lock:
+      job = self._jobs.get(job_id)
+      return job.as_dict() if job else None
+
+  def list_for_book(self, book_id: str) -> List[dict]:
+    with self._lock:
+      return [job.as_dict() for job in self._jobs.values() if job.book_id == book_id]
+
+  def _transition(self, job_id: str, allowed: Tuple[str, ...], target: str) -> Optional[dict]:
+    with self._lock:
+      job = self._jobs.get(job_id)
+      if job is None:
+        return None
+      if job.state not in allowed:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"render job is {job.state}")
+      job.state = target
+      if target == "queued" and job.total is not None and job.checkpoint >= job.total:
+        # Chunks in flight when it was paused finished the book.
+        job.state = "done"
+      self._save(job)
+      if job.state == "queued":
+        self._start_workers()
+      return job.as_dict()
+
+  def pause(self, job_id: str) -> Optional[dict]:
+    return self._transition(job_id, ACTIVE_STATES, "paused")
+
+  def resume(self, job_id: str) -> Optional[dict]:
+    return self._transition(job_id, ("paused",), "queued")
+
+  def cancel(self, job_id: str) -> Optional[dict]:
+    return self._transition(job_id, (*ACTIVE_STATES, "paused"), "cancelled")
+
+  def forget_book(self, book_id: str) -> int:
+    """Drops every job for a deleted book; chunks still in flight clean up after themselves."""
+    with self._lock:
+      jobs = [job for job in self._jobs.values() if job.book_id == book_id]
+      for job in jobs:
+        job.state = "cancelled"
+        del self._jobs[job.id]
+      self._conn.execute("DELETE FROM render_jobs WHERE book_id = ?", (book_id,))
+      return len(jobs)
+
+  def _claim(self) -> Optional[Tuple[RenderJob, Optional[int]]]:
+    """Next unit of work: ``(job, None)`` to parse the book, or ``(job, chunk index)``."""
+    for job in self._jobs.values():
+      if job.state not in ACTIVE_STATES or job.parsing:
+        continue
+      if job.chunks is None:
+        job.parsing = True
+        return job, None
+      if job.returned:
+        return job, job.returned.pop()
+      if job.next_index < len(job.chunks):
+        job.next_index += 1
+        return job, job.next_index - 1
+    return None
+
+  def _work(self, claimed: Tuple[RenderJob, Optional[int]]) -> None:
+    job, index = claimed
+    if index is None:
+      self._parse(job)
+    else:
+      self._render_chunk(job, index)
+
+  def _parse(self, job: RenderJob) -> None:
+    try:
+      book = parse_book(Path(job.source))
+      chunks = [chunk for paragraph in book.paragraphs for chunk in split_for_synthesis(paragraph, self.settings.max_chars)]
+      error = None
+    except (BookParseError, OSError) as exc:
+      chunks, error = [], str(exc)
+    with self._lock:
+      job.parsing = False
+      job.chunks = chunks
+      job.total = len(chunks)
+      if error is not None:
+        job.error = error
+        job.state = "failed"
+      elif job.state in ACTIVE_STATES:
+        job.state = "running" if chunks else "done"
+      if self._jobs.get(job.id) is job:
+        self._save(job)
+      # Its chunks are claimable now.
+      self._workers.wake(self.workers)
+
+  def _render_chunk(self, job: RenderJob, index: int) -> None:
+    item = TTSRequest(text=job.chunks[index], voice_id=job.voice_id, rate=job.rate, pitch=job.pitch, book_id=job.book_id)
+    cost_seconds: Optional[float] = None
+    if not is_cached(self.settings, item):
+      cost_seconds = get_synthesis_costs().estimate_seconds(item.voice_id, len(item.text))
+      if not self._admit(job, cost_seconds):
+        # Paused, cancelled or deleted while waiting for a slot; hand the chunk back for later.
+        with self._lock:
+          job.returned.append(index)
+        return
+    failed = False
+    try:
+      # Cached chunks still go through synthesize so the file is indexed under this book.
+      self.synthesize_item(self.settings, item)
+    except Exception as exc:  # one bad chunk should not stop the book
+      LOGGER.exception("render chunk %d of %s failed", index, job.id)
+      job.error = str(exc)
+      failed = True
+    finally:
+      if cost_seconds is not None:
+        self.admission.release(cost_seconds)
+    self._finish_chunk(job, index, failed)
+
+  def _admit(self, job: RenderJob, cost_seconds: float) -> bool:
+    """Waits for an idle synthesis slot; False, holding nothing, once the job stops being active."""
+    while not self.admission.try_acquire(cost_seconds):
+      if job.state not in ACTIVE_STATES:
+        return False
+      time.sleep(self.poll_seconds)
+    if job.state not in ACTIVE_STATES:
+      self.admission.release(cost_seconds)
+      return False
+    return True
+
+  def _finish_chunk(self, job: RenderJob, index: int, failed: bool) -> None:
+    with self._lock:
+      current = self._jobs.get(job.id)
+      if current is None:
+        # The book was deleted mid-chunk; remove what this chunk just added to the cache.
+        remove_cached_audio_for_book(self.settings, job.book_id)
+        return
+      if current is not job:
+        # Cancelled and resubmitted since; the new job tracks its own progress.
+        return
+      if failed:
+        job.failed += 1
+      else:
+        job.completed += 1
+      job.finished.add(index)
+      while job.checkpoint in job.finished:
+        job.finished.discard(job.checkpoint)
+        job.checkpoint += 1
+      if job.checkpoint >= job.total and job.state in ACTIVE_STATES:
+        job.state = "done"
+      self._save(job)
+
+
+@lru_cache(maxsize=1)
+def get_render_jobs() -> RenderJobManager:
+  settings = get_settings()
+  return RenderJobManager(
+      settings,
+      settings.render_jobs_db,
+      get_admission_controller(),
+      workers=settings.render_workers,
+      max_jobs=settings.render_max_jobs,
+  )
@@ -11,6 +11,8 @@ from typing import Optional
 
 from pydantic import BaseModel, Field
 
+from .audio_codec import resolve_cache_format
+
 
 def _bool_env(value: Optional[str], default: bool = False) -> bool:
   if value is None:
@@ -24,23 +26,61 @@ LOGGER = logging.getLogger(__name__)
 class Settings(BaseModel):
   media_dir: Path
   media_url_prefix: str = "/media"
+  audio_cache_format: str = "wav"
+  audio_cache_max_mb: int = 2048
+  audio_cache_max_entries: int = 0
+  audio_cache_policy: str = "lru"
+  audio_cache_book_idle_seconds: int = 86400
   audio_index_file: Path
+  audio_index_db: Path
   books_dir: Path
   library_metadata_file: Path
+  library_db_file: Path
+  library_tombstone_days: int = 30
   piper_bin: Optional[Path] = None
+  piper_pool_enabled: bool = True
+  piper_pool_size: int = Field(default_factory=lambda: os.cpu_count() or 1)
+  piper_pool_memory_mb: int = 1024
+  piper_timeout_seconds: int = 60
+  prefetch_paragraphs: int = 5
+  prefetch_workers: int = 1
+  render_jobs_db: Path
+  render_workers: int = 1
+  render_max_jobs: int = 4
+  sentence_cache: bool = True
+  sentence_silence_ms: int = 200
+  sentence_stitch_ttl_seconds: int = 600
+  synthesis_concurrency: int = Field(default_factory=lambda: os.cpu_count() or 1)
+  synthesis_queue_size: int = Field(default_factory=lambda: 4 * (os.cpu_count() or 1))
+  synthesis_backlog_seconds: float = 300.0
+  synthesis_seconds_per_char: float = 0.01
   voice_dir: Path
   voice_aliases: dict[str, str] = Field(default_factory=dict)
   max_chars: int = 5000
+  max_batch_items: int = 64
   max_upload_bytes: int = 25 * 1024 * 1024
   enable_online_proxy: bool = False
   online_tts_base_url: Optional[str] = None
   online_tts_api_key: Optional[str] = None
+  online_tts_timeout_seconds: float = 10.0
+  online_tts_retries: int = 2
+  online_tts_backoff_ms: int = 100
+  online_tts_hedge_ms: int = 0
+  online_tts_max_connections: int = 20
+  online_tts_breaker_failures: int = 5
+  online_tts_breaker_reset_seconds: float = 30.0
+  online_tts_cache: bool = True
+  online_tts_audio_origins: list[str] = Field(default_factory=list)
   request_limit: int = 60
   request_window_seconds: int = 60
+  status_reconcile_seconds: int = 300
+  tts_char_limit: int = 50000
+  upload_byte_limit: int = 4 * 25 * 1024 * 1024
   voice_manifest_path: Optional[Path] = None
   voice_manifest_json: Optional[str] = None
   voice_download_base_url: Optional[str] = None
   voice_download_timeout: int = 60
+  voice_download_concurrency: int = 2
 
   class Config:
     arbitrary_types_allowed = True
@@ -57,6 +97,8 @@ class Settings(BaseModel):
       return Path(value).expanduser().resolve() if value else None
 
     max_chars = int(os.environ.get("MAX_CHARS", "5000"))
+    max_batch_items = int(os.environ.get("MAX_BATCH_ITEMS", "64"))
+    synthesis_concurrency = int(os.environ.get("SYNTHESIS_CONCURRENCY", str(os.cpu_count() or 1)))
     max_upload_bytes = int(os.environ.get("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
     request_limit = int(os.environ.get("REQUEST_LIMIT", "60"))
     request_window = int(os.environ.get("REQUEST_WINDOW_SECONDS", "60"))
@@ -75,23 +117,63 @@ class Settings(BaseModel):
 
     settings = cls(
         media_dir=media_dir.resolve(),
+        audio_cache_format=resolve_cache_format(os.environ.get("AUDIO_CACHE_FORMAT", "wav")),
+        audio_cache_max_mb=int(os.environ.get("AUDIO_CACHE_MAX_MB", "2048")),
+        audio_cache_max_entries=int(os.environ.get("AUDIO_CACHE_MAX_ENTRIES", "0")),
+        audio_cache_policy=os.environ.get("AUDIO_CACHE_POLICY", "lru").strip().lower(),
+        audio_cache_book_idle_seconds=int(os.environ.get("AUDIO_CACHE_BOOK_IDLE_SECONDS", "86400")),
         books_dir=books_dir.resolve(),
         audio_index_file=(media_dir / "audio_index.json"),
+        audio_index_db=(media_dir / "audio_index.db"),
         library_metadata_file=(books_dir / "library.json"),
+        library_db_file=(books_dir / "library.db"),
+        library_tombstone_days=int(os.environ.get("LIBRARY_TOMBSTONE_DAYS", "30")),
         piper_bin=_path_from_env("PIPER_BIN"),
+        piper_pool_enabled=_bool_env(os.environ.get("PIPER_POOL"), True),
+        piper_pool_size=int(os.environ.get("PIPER_POOL_SIZE", str(os.cpu_count() or 1))),
+        piper_pool_memory_mb=int(os.environ.get("PIPER_POOL_MEMORY_MB", "1024")),
+        piper_timeout_seconds=int(os.environ.get("PIPER_TIMEOUT_SECONDS", "60")),
+        prefetch_paragraphs=int(os.environ.get("PREFETCH_PARAGRAPHS", "5")),
+        prefetch_workers=int(os.environ.get("PREFETCH_WORKERS", str(max(1, synthesis_concurrency // 2)))),
+        render_jobs_db=(media_dir / "render_jobs.db"),
+        render_workers=int(os.environ.get("RENDER_WORKERS", str(max(1, synthesis_concurrency - 1)))),
+        render_max_jobs=int(os.environ.get("RENDER_MAX_JOBS", "4")),
+        sentence_cache=_bool_env(os.environ.get("SENTENCE_CACHE"), True),
+        sentence_silence_ms=int(os.environ.get("SENTENCE_SILENCE_MS", "200")),
+        sentence_stitch_ttl_seconds=int(os.environ.get("SENTENCE_STITCH_TTL_SECONDS", "600")),
+        synthesis_concurrency=synthesis_concurrency,
+        synthesis_queue_size=int(os.environ.get("SYNTHESIS_QUEUE_SIZE", str(4 * synthesis_concurrency))),
+        synthesis_backlog_seconds=float(os.environ.get("SYNTHESIS_BACKLOG_SECONDS", "300")),
+        synthesis_seconds_per_char=float(os.environ.get("SYNTHESIS_SECONDS_PER_CHAR", "0.01")),
         voice_dir=voice_dir.resolve(),
         voice_aliases=voice_aliases,
         max_chars=max_chars,
+        max_batch_items=max_batch_items,
         max_upload_bytes=max_upload_bytes,
         enable_online_proxy=_bool_env(os.environ.get("ENABLE_ONLINE_PROXY"), False),
         online_tts_base_url=os.environ.get("ONLINE_TTS_BASE_URL"),
         online_tts_api_key=os.environ.get("ONLINE_TTS_API_KEY"),
+        online_tts_timeout_seconds=float(os.environ.get("ONLINE_TTS_TIMEOUT_SECONDS", "10")),
+        online_tts_retries=int(os.environ.get("ONLINE_TTS_RETRIES", "2")),
+        online_tts_backoff_ms=int(os.environ.get("ONLINE_TTS_BACKOFF_MS", "100")),
+        online_tts_hedge_ms=int(os.environ.get("ONLINE_TTS_HEDGE_MS", "0")),
+        online_tts_max_connections=int(os.environ.get("ONLINE_TTS_MAX_CONNECTIONS", "20")),
+        online_tts_breaker_failures=int(os.environ.get("ONLINE_TTS_BREAKER_FAILURES", "5")),
+        online_tts_breaker_reset_seconds=float(os.environ.get("ONLINE_TTS_BREAKER_RESET_SECONDS", "30")),
+        online_tts_cache=_bool_env(os.environ.get("ONLINE_TTS_CACHE"), True),
+        online_tts_audio_origins=[
+            origin.strip() for origin in os.environ.get("ONLINE_TTS_AUDIO_ORIGINS", "").split(",") if origin.strip()
+        ],
         request_limit=request_limit,
         request_window_seconds=request_window,
+        status_reconcile_seconds=int(os.environ.get("STATUS_RECONCILE_SECONDS", "300")),
+        tts_char_limit=int(os.environ.get("TTS_CHAR_LIMIT", "50000")),
+        upload_byte_limit=int(os.environ.get("UPLOAD_BYTE_LIMIT", str(4 * max_upload_bytes))),
         voice_manifest_path=_path_from_env("VOICE_MANIFEST_PATH"),
         voice_manifest_json=os.environ.get("VOICE_MANIFEST_JSON"),
         voice_download_base_url=os.environ.get("VOICE_DOWNLOAD_BASE_URL"),
         voice_download_timeout=int(os.environ.get("VOICE_DOWNLOAD_TIMEOUT", "60")),
+        voice_download_concurrency=int(os.environ.get("VOICE_DOWNLOAD_CONCURRENCY", "2")),
     )
     settings.audio_index_file.parent.mkdir(parents=True, exist_ok=True)
     settings.library_metadata_file.parent.mkdir(parents=True, exist_ok=True)
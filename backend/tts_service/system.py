@@ -2,30 +2,158 @@
 
 from __future__ import annotations
 
+import logging
 import shutil
+import threading
+import time
+from functools import lru_cache
 from pathlib import Path
+from typing import Optional, Tuple
 
-from .settings import Settings
+from .audio_codec import AUDIO_MEDIA_TYPES
+from .metrics import CACHE_LOOKUPS
+from .settings import Settings, get_settings
+
+LOGGER = logging.getLogger(__name__)
 
 _MB = 1024 * 1024
 
 
-def _sum_directory(path: Path) -> int:
+def _sum_directory(path: Path) -> Tuple[int, int]:
   if not path or not path.exists():
-    return 0
+    return 0, 0
   total = 0
+  files = 0
   for file_path in path.rglob('*'):
     if file_path.is_file():
       total += file_path.stat().st_size
-  return total
+      files += 1
+  return total, files
+
+
+def _scan_cache(media_dir: Path) -> Tuple[int, int]:
+  total = 0
+  entries = 0
+  for extension in AUDIO_MEDIA_TYPES:
+    for file_path in media_dir.glob(f'*.{extension}'):
+      try:
+        total += file_path.stat().st_size
+      except FileNotFoundError:
+        continue
+      entries += 1
+  return total, entries
+
+
+class UsageCounters:
+  """Cache and model usage kept current by the paths that write and delete files.
+
+  The first ``snapshot`` scans the directories once; after that the counters are adjusted in
+  place and a full rescan only runs in a background thread when the last one is older than
+  ``reconcile_seconds``, correcting drift from files changed behind the service's back.
+  """
+
+  def __init__(self, media_dir: Path, voice_dir: Path, reconcile_seconds: float):
+    self.media_dir = media_dir
+    self.voice_dir = voice_dir
+    self.reconcile_seconds = reconcile_seconds
+    self.cache_bytes = 0
+    self.cache_entries = 0
+    self.model_bytes = 0
+    self.model_files = 0
+    self.hits = 0
+    self.misses = 0
+    self._reconciled_at: Optional[float] = None
+    self._reconciling = False
+    self._lock = threading.Lock()
+
+  def cache_added(self, size: int) -> None:
+    with self._lock:
+      self.cache_bytes += size
+      self.cache_entries += 1
+
+  def cache_removed(self, size: int) -> None:
+    with self._lock:
+      self.cache_bytes = max(0, self.cache_bytes - size)
+      self.cache_entries = max(0, self.cache_entries - 1)
+
+  def model_added(self, size: int) -> None:
+    with self._lock:
+      self.model_bytes += size
+      self.model_files += 1
+
+  def model_removed(self, size: int) -> None:
+    with self._lock:
+      self.model_bytes = max(0, self.model_bytes - size)
+      self.model_files = max(0, self.model_files - 1)
+
+  def record_lookup(self, hit: bool) -> None:
+    CACHE_LOOKUPS.inc(result='hit' if hit else 'miss')
+    with self._lock:
+      if hit:
+        self.hits += 1
+      else:
+        self.misses += 1
+
+  def reconcile(self) -> None:
+    cache_bytes, cache_entries = _scan_cache(self.media_dir)
+    model_bytes, model_files = _sum_directory(self.voice_dir)
+    with self._lock:
+      self.cache_bytes, self.cache_entries = cache_bytes, cache_entries
+      self.model_bytes, self.model_files = model_bytes, model_files
+      self._reconciled_at = time.monotonic()
+      self._reconciling = False
+
+  def start_reconcile(self) -> None:
+    """Rescans the directories on a background thread unless a rescan is already running."""
+    with self._lock:
+      if self._reconciling:
+        return
+      self._reconciling = True
+    threading.Thread(target=self._reconcile_in_background, name='usage-reconcile', daemon=True).start()
+
+  def _reconcile_in_background(self) -> None:
+    try:
+      self.reconcile()
+    except OSError:  # pragma: no cover - keep serving the last counters
+      LOGGER.exception('usage reconciliation failed')
+      with self._lock:
+        self._reconciling = False
+
+  def snapshot(self) -> dict:
+    # Until the first scan lands (started at startup), the counters only cover writes since then.
+    with self._lock:
+      stale = self._reconciled_at is None or time.monotonic() - self._reconciled_at >= self.reconcile_seconds
+    if stale:
+      self.start_reconcile()
+    with self._lock:
+      lookups = self.hits + self.misses
+      return {
+          'cache_bytes': self.cache_bytes,
+          'cache_entries': self.cache_entries,
+          'model_bytes': self.model_bytes,
+          'model_files': self.model_files,
+          'cache_hits': self.hits,
+          'cache_misses': self.misses,
+          'cache_hit_rate': round(self.hits / lookups, 4) if lookups else None,
+      }
+
+
+@lru_cache(maxsize=1)
+def get_usage_counters() -> UsageCounters:
+  settings = get_settings()
+  return UsageCounters(settings.media_dir, settings.voice_dir, settings.status_reconcile_seconds)
 
 
 def get_system_status(settings: Settings) -> dict:
   usage = shutil.disk_usage(settings.media_dir)
-  cache_usage = sum(file_path.stat().st_size for file_path in settings.media_dir.glob('*.wav'))
-  model_usage = _sum_directory(settings.voice_dir)
+  counters = get_usage_counters().snapshot()
   return {
       'disk_free_mb': round(usage.free / _MB, 2),
-      'cache_usage_mb': round(cache_usage / _MB, 2),
-      'model_usage_mb': round(model_usage / _MB, 2),
+      'cache_usage_mb': round(counters['cache_bytes'] / _MB, 2),
+      'model_usage_mb': round(counters['model_bytes'] / _MB, 2),
+      'cache_entries': counters['cache_entries'],
+      'model_files': counters['model_files'],
+      'cache_hits': counters['cache_hits'],
+      'cache_misses': counters['cache_misses'],
+      'cache_hit_rate': counters['cache_hit_rate'],
   }
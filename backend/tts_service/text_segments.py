@@ -0,0 +1,50 @@
+"""Text normalization and sentence segmentation for cache keys."""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import List
+
+_WHITESPACE = re.compile(r"\s+")
+# Terminal punctuation, optionally followed by closing quotes/brackets, then whitespace.
+_BOUNDARY = re.compile(r"[.!?…]+[\"'”’»)\]]*(?=\s)")
+_ABBREVIATIONS = frozenset(
+    "mr mrs ms dr prof sr jr st mt vs etc e.g i.e cf no vol ch fig approx dept est inc ltd co".split()
+)
+
+
+def normalize_text(text: str) -> str:
+  """NFC-normalizes and collapses every run of whitespace (including NBSP and line breaks) to one
+  space, so text that differs only in encoding or layout maps to the same cache key."""
+  return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def _is_abbreviation(text: str, end: int) -> bool:
+  start = text.rfind(" ", 0, end) + 1
+  word = text[start:end].lstrip("\"'“‘(«[").lower()
+  # Single letters are initials ("J. R. R."); known short forms keep their period.
+  return (len(word) == 1 and word.isalpha()) or word in _ABBREVIATIONS
+
+
+def split_sentences(text: str) -> List[str]:
+  """Splits normalized text at sentence ends. Conservative: a boundary needs terminal punctuation
+  followed by whitespace and a next character that is not lowercase, and abbreviations and
+  initials never end a sentence, so an unsure split keeps the text together."""
+  sentences: List[str] = []
+  start = 0
+  for match in _BOUNDARY.finditer(text):
+    end = match.end()
+    following = text[end:].lstrip()
+    if not following or following[0].islower():
+      continue
+    if text[match.start()] == "." and _is_abbreviation(text, match.start()):
+      continue
+    sentence = text[start:end].strip()
+    if sentence:
+      sentences.append(sentence)
+    start = end
+  tail = text[start:].strip()
+  if tail:
+    sentences.append(tail)
+  return sentences
@@ -2,18 +2,26 @@
 
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
 import os
+import struct
 import subprocess
+import threading
+import time
+import uuid
 import wave
+from concurrent.futures import Future
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import AsyncContextManager, AsyncIterator, Awaitable, Callable, Dict, Generator, Iterator, List, Optional, Tuple, TypeVar, Union
 
-import httpx
+import anyio
 from fastapi import HTTPException, status
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
+from .audio_codec import AUDIO_MEDIA_TYPES, AudioCodecError, concat_wav, encode_wav_file, format_for_path, read_duration_ms, to_format, wav_duration_ms
 from .audio_cache import (
     AudioIndex,
     build_cache_key,
@@ -21,10 +29,18 @@ from .audio_cache import (
     resolve_cache_path,
     sanitize_voice_id,
 )
+from .admission import get_synthesis_costs
+from .cache_eviction import get_cache_evictor
+from .metrics import record_synthesis
+from .piper_pool import PiperWorkerError, get_piper_pool
 from .settings import Settings
+from .system import get_usage_counters
+from .text_segments import normalize_text, split_sentences
 
 LOGGER = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 
 class TTSRequest(BaseModel):
   text: str = Field(..., min_length=1)
@@ -33,6 +49,15 @@ class TTSRequest(BaseModel):
   pitch: Optional[float] = None
   book_id: Optional[str] = None
 
+  @field_validator("text")
+  @classmethod
+  def _normalize_text(cls, value: str) -> str:
+    # Normalized once here so cache keys, Piper input and sentence splits all see the same text.
+    value = normalize_text(value)
+    if not value:
+      raise ValueError("text must contain non-whitespace characters")
+    return value
+
 
 @dataclass
 class SynthesisResult:
@@ -42,30 +67,122 @@ class SynthesisResult:
   filename: str
 
 
-def _read_wav_duration_ms(file_path: Path) -> Optional[int]:
-  try:
-    with wave.open(str(file_path), "rb") as wav_file:
-      frames = wav_file.getnframes()
-      framerate = wav_file.getframerate()
-  except (wave.Error, FileNotFoundError):
-    LOGGER.warning("Unable to read WAV duration for %%s", file_path)
-    return None
-  if framerate:
-    return int(frames / framerate * 1000)
-  return None
+class SynthesisAborted(RuntimeError):
+  """The leading caller gave up (e.g. a streaming client disconnected); followers should retry."""
+
+
+class SingleFlight:
+  """Coalesces concurrent calls per key: the first caller runs, later ones share its outcome."""
+
+  def __init__(self) -> None:
+    self._lock = threading.Lock()
+    self._calls: Dict[str, Future] = {}
+
+  def claim(self, key: str) -> Tuple[Future, bool]:
+    with self._lock:
+      future = self._calls.get(key)
+      if future is not None:
+        return future, False
+      future = Future()
+      self._calls[key] = future
+      return future, True
+
+  def finish(self, key: str, future: Future, result: object = None, error: Optional[BaseException] = None) -> None:
+    with self._lock:
+      self._calls.pop(key, None)
+    if future.done():
+      return
+    if error is not None:
+      future.set_exception(error)
+    else:
+      future.set_result(result)
+
+  def do(self, key: str, fn: Callable[[], T]) -> T:
+    future, leader = self.claim(key)
+    while not leader:
+      try:
+        return future.result()
+      except SynthesisAborted:
+        future, leader = self.claim(key)
+    try:
+      result = fn()
+    except BaseException as exc:
+      self.finish(key, future, error=_leader_error(exc))
+      raise
+    self.finish(key, future, result)
+    return result
+
+  async def do_async(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+    future, leader = self.claim(key)
+    while not leader:
+      try:
+        # Shielded so a cancelled follower does not cancel the shared future for everyone.
+        return await asyncio.shield(asyncio.wrap_future(future))
+      except SynthesisAborted:
+        future, leader = self.claim(key)
+    try:
+      result = await fn()
+    except BaseException as exc:
+      self.finish(key, future, error=_leader_error(exc))
+      raise
+    self.finish(key, future, result)
+    return result
+
+
+def _leader_error(exc: BaseException) -> BaseException:
+  # Cancellation and generator shutdown are the leader's problem; waiters should retry.
+  if isinstance(exc, Exception):
+    return exc
+  return SynthesisAborted(f"leader stopped: {type(exc).__name__}")
+
+
+_inflight = SingleFlight()
+
+
+def _tmp_path(output_path: Path) -> Path:
+  # Unique per attempt so concurrent writers (other processes included) never share a temp file.
+  return output_path.with_name(f"{output_path.stem}.{uuid.uuid4().hex[:8]}.tmp")
+
+
+def _wav_header(framerate: int, data_bytes: int, channels: int = 1, sampwidth: int = 2) -> bytes:
+  byte_rate = framerate * channels * sampwidth
+  return struct.pack(
+      "<4sI4s4sIHHIIHH4sI",
+      b"RIFF",
+      36 + data_bytes,
+      b"WAVE",
+      b"fmt ",
+      16,
+      1,
+      channels,
+      framerate,
+      byte_rate,
+      channels * sampwidth,
+      sampwidth * 8,
+      b"data",
+      data_bytes,
+  )
+
+
+# Streamed responses advertise the largest size a RIFF header can hold; players read until EOF.
+_STREAMING_DATA_BYTES = 0xFFFFFFFF - 36
+_STUB_FRAMERATE = 22050
+_STREAM_CHUNK_BYTES = 4096
 
 
 def write_stub_wav(target: Path) -> int:
   target.parent.mkdir(parents=True, exist_ok=True)
-  framerate = 22050
+  framerate = _STUB_FRAMERATE
   duration_seconds = 0.5
   frames = int(framerate * duration_seconds)
   silence_frame = (0).to_bytes(2, byteorder="little", signed=True)
-  with wave.open(str(target), "wb") as wav_file:
+  tmp_path = _tmp_path(target)
+  with wave.open(str(tmp_path), "wb") as wav_file:
     wav_file.setnchannels(1)
     wav_file.setsampwidth(2)
     wav_file.setframerate(framerate)
     wav_file.writeframes(silence_frame * frames)
+  tmp_path.replace(target)
   return int(duration_seconds * 1000)
 
 
@@ -86,28 +203,49 @@ def _voice_model_path(settings: Settings, voice_id: str) -> str:
   return str(voice_path)
 
 
+def _piper_env(payload: TTSRequest) -> dict[str, str]:
+  env: dict[str, str] = {}
+  if payload.rate is not None:
+    env["PIPER_RATE"] = str(payload.rate)
+  if payload.pitch is not None:
+    env["PIPER_PITCH"] = str(payload.pitch)
+  return env
+
+
 def _run_piper(settings: Settings, payload: TTSRequest, output_path: Path) -> Optional[int]:
   if not (settings.piper_bin and settings.piper_bin.exists()):
     return write_stub_wav(output_path)
 
-  tmp_path = output_path.with_suffix(".tmp")
+  tmp_path = _tmp_path(output_path)
+  model_path = _voice_model_path(settings, payload.voice_id)
+  pool = get_piper_pool()
+  if pool is not None:
+    try:
+      pool.synthesize(model_path, _piper_env(payload), payload.text, tmp_path)
+      tmp_path.replace(output_path)
+      return wav_duration_ms(output_path)
+    except PiperWorkerError as exc:
+      LOGGER.warning("Piper worker pool unavailable, using one-shot Piper: %s", exc)
+      tmp_path.unlink(missing_ok=True)
+  return _run_piper_once(settings, payload, model_path, output_path)
+
+
+def _run_piper_once(settings: Settings, payload: TTSRequest, model_path: str, output_path: Path) -> Optional[int]:
+  tmp_path = _tmp_path(output_path)
   cmd = [
       str(settings.piper_bin),
       "--model",
-      _voice_model_path(settings, payload.voice_id),
+      model_path,
       "--output_file",
       str(tmp_path),
   ]
   env = os.environ.copy()
-  if payload.rate is not None:
-    env["PIPER_RATE"] = str(payload.rate)
-  if payload.pitch is not None:
-    env["PIPER_PITCH"] = str(payload.pitch)
+  env.update(_piper_env(payload))
 
   try:
-    subprocess.run(cmd, input=payload.text.encode("utf-8"), check=True, env=env)
+    subprocess.run(cmd, input=payload.text.encode("utf-8"), check=True, env=env, timeout=settings.piper_timeout_seconds)
     tmp_path.replace(output_path)
-    return _read_wav_duration_ms(output_path)
+    return wav_duration_ms(output_path)
   except Exception as exc:  # pragma: no cover - fallback path
     LOGGER.warning("Piper invocation failed, falling back to stub: %s", exc)
     if tmp_path.exists():
@@ -115,7 +253,90 @@ def _run_piper(settings: Settings, payload: TTSRequest, output_path: Path) -> Op
     return write_stub_wav(output_path)
 
 
-def synthesize(settings: Settings, payload: TTSRequest) -> SynthesisResult:
+def _encode_into_cache(wav_path: Path, file_path: Path) -> None:
+  """Moves a freshly synthesized WAV into the cache, encoding it first for compressed formats."""
+  fmt = format_for_path(file_path)
+  if fmt == "wav":
+    wav_path.replace(file_path)
+    return
+  tmp_path = _tmp_path(file_path)
+  try:
+    encode_wav_file(wav_path, tmp_path, fmt)
+    tmp_path.replace(file_path)
+  finally:
+    wav_path.unlink(missing_ok=True)
+    tmp_path.unlink(missing_ok=True)
+
+
+def _wav_work_path(file_path: Path) -> Path:
+  if format_for_path(file_path) == "wav":
+    return file_path
+  return _tmp_path(file_path).with_suffix(".wav")
+
+
+def _sentences(settings: Settings, payload: TTSRequest) -> List[str]:
+  """The sentences to cache separately, or ``[]`` to synthesize the text as one unit.
+
+  Only WAV caches are split: their segments can be spliced without re-encoding. Splitting also
+  needs the warm worker pool, since one-shot Piper would reload the model for every sentence.
+  """
+  if not settings.sentence_cache or settings.audio_cache_format != "wav" or get_piper_pool() is None:
+    return []
+  sentences = split_sentences(payload.text)
+  return sentences if len(sentences) > 1 else []
+
+
+def _sentence_payloads(payload: TTSRequest, sentences: List[str]) -> List[TTSRequest]:
+  return [payload.model_copy(update={"text": sentence}) for sentence in sentences]
+
+
+def _stitch_into_cache(settings: Settings, segments: List[SynthesisResult], file_path: Path) -> Optional[int]:
+  tmp_path = _tmp_path(file_path)
+  try:
+    duration = concat_wav([segment.file_path for segment in segments], tmp_path, settings.sentence_silence_ms)
+  except AudioCodecError as exc:
+    LOGGER.warning("Unable to stitch sentence audio, synthesizing as one unit: %s", exc)
+    tmp_path.unlink(missing_ok=True)
+    return None
+  tmp_path.replace(file_path)
+  _count_new_cache_file(file_path)
+  # The sentence entries already hold this audio; the spliced copy only serves repeats for a while.
+  get_cache_evictor().record_access(file_path.name, derived=True)
+  return duration
+
+
+def _synthesize_missing(settings: Settings, payload: TTSRequest, file_path: Path) -> Optional[int]:
+  # A previous leader may have finished between our exists() check and claiming the key.
+  if file_path.exists():
+    return None
+  sentences = _sentences(settings, payload)
+  if sentences:
+    # Each sentence is its own cache entry, so re-chunked or repeated text reuses them.
+    segments = [
+        _synthesize(settings, sentence, count_lookup=False) for sentence in _sentence_payloads(payload, sentences)
+    ]
+    duration = _stitch_into_cache(settings, segments, file_path)
+    if file_path.exists():
+      return duration
+  wav_path = _wav_work_path(file_path)
+  started = time.perf_counter()
+  duration = _run_piper(settings, payload, wav_path)
+  elapsed = time.perf_counter() - started
+  get_synthesis_costs().record(payload.voice_id, len(payload.text), elapsed, duration)
+  record_synthesis(payload.voice_id, elapsed, duration)
+  _encode_into_cache(wav_path, file_path)
+  _count_new_cache_file(file_path)
+  return duration
+
+
+def _count_new_cache_file(file_path: Path) -> None:
+  try:
+    get_usage_counters().cache_added(file_path.stat().st_size)
+  except FileNotFoundError:  # evicted or deleted already
+    pass
+
+
+def _cache_location(settings: Settings, payload: TTSRequest) -> Tuple[str, Path]:
   payload_parts = [
       payload.voice_id,
       "" if payload.rate is None else str(payload.rate),
@@ -123,43 +344,288 @@ def synthesize(settings: Settings, payload: TTSRequest) -> SynthesisResult:
       payload.text,
   ]
   cache_key = build_cache_key(payload_parts)
-  filename = f"{cache_key}-{sanitize_voice_id(payload.voice_id)}.wav"
+  filename = f"{cache_key}-{sanitize_voice_id(payload.voice_id)}.{settings.audio_cache_format}"
+  return filename, settings.media_dir / filename
+
+
+def _record_cache_use(payload: TTSRequest, filename: str) -> None:
+  """Ties a cache file to the requesting book and counts the hit for eviction."""
+  get_audio_index().add(payload.book_id, filename)
+  get_cache_evictor().record_access(filename, payload.book_id)
+
+
+def _synthesis_result(settings: Settings, payload: TTSRequest, filename: str, duration_ms: Optional[int]) -> SynthesisResult:
   file_path = settings.media_dir / filename
-  duration_ms: Optional[int] = None
-  if not file_path.exists():
-    duration_ms = _run_piper(settings, payload, file_path)
   if duration_ms is None:
-    duration_ms = _read_wav_duration_ms(file_path)
+    duration_ms = read_duration_ms(file_path)
   audio_url = f"{settings.media_url_prefix}/{filename}"
 
-  audio_index = get_audio_index()
-  audio_index.add(payload.book_id, filename)
+  _record_cache_use(payload, filename)
   return SynthesisResult(file_path=file_path, audio_url=audio_url, duration_ms=duration_ms, filename=filename)
 
 
-def forward_online_tts(settings: Settings, payload: TTSRequest) -> dict:
-  if not settings.enable_online_proxy or not settings.online_tts_base_url:
-    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="online proxy disabled")
+def is_cached(settings: Settings, payload: TTSRequest) -> bool:
+  return _cache_location(settings, payload)[1].exists()
+
+
+def uncached_chars(settings: Settings, payload: TTSRequest) -> int:
+  """Characters that still need synthesis; sentences already cached cost nothing."""
+  if is_cached(settings, payload):
+    return 0
+  sentences = _sentences(settings, payload)
+  if not sentences:
+    return len(payload.text)
+  return sum(len(item.text) for item in _sentence_payloads(payload, sentences) if not is_cached(settings, item))
+
+
+def synthesize(settings: Settings, payload: TTSRequest) -> SynthesisResult:
+  return _synthesize(settings, payload, count_lookup=True)
+
+
+def _synthesize(settings: Settings, payload: TTSRequest, count_lookup: bool) -> SynthesisResult:
+  # Sentences of a paragraph pass ``count_lookup=False``: the paragraph's lookup already counted.
+  filename, file_path = _cache_location(settings, payload)
+  duration_ms: Optional[int] = None
+  cached = file_path.exists()
+  if count_lookup:
+    get_usage_counters().record_lookup(cached)
+  if not cached:
+    duration_ms = _inflight.do(filename, lambda: _synthesize_missing(settings, payload, file_path))
+  return _synthesis_result(settings, payload, filename, duration_ms)
+
+
+async def synthesize_async(settings: Settings, payload: TTSRequest) -> SynthesisResult:
+  """``synthesize`` for the event loop: the blocking pipeline runs on a worker thread.
+
+  Followers of an in-flight synthesis wait on its future here rather than holding a thread each.
+  """
+  filename, file_path = _cache_location(settings, payload)
+  duration_ms: Optional[int] = None
+  cached = file_path.exists()
+  get_usage_counters().record_lookup(cached)
+  if not cached:
+    duration_ms = await _inflight.do_async(
+        filename, lambda: anyio.to_thread.run_sync(_synthesize_missing, settings, payload, file_path)
+    )
+  return await anyio.to_thread.run_sync(_synthesis_result, settings, payload, filename, duration_ms)
+
+
+async def synthesize_batch(
+    settings: Settings,
+    items: List[TTSRequest],
+    admit: Callable[[TTSRequest], AsyncContextManager[None]],
+    return_exceptions: bool = False,
+) -> AsyncIterator[Tuple[int, Union[SynthesisResult, Exception]]]:
+  """Yields ``(index, result)`` as items become ready: cache hits first, then misses as they finish.
+
+  Misses are drained by at most ``synthesis_concurrency`` workers, each taking an admission
+  slot sized for its item, so one batch never occupies more of the wait queue than a burst of
+  single calls. The first failed miss ends the batch with its exception, unless
+  ``return_exceptions`` is set: then it is yielded as that item's result and the rest go on.
+  """
+  misses: List[Tuple[int, TTSRequest]] = []
+  for index, item in enumerate(items):
+    if is_cached(settings, item):
+      yield index, await synthesize_async(settings, item)
+    else:
+      misses.append((index, item))
+  if not misses:
+    return
+
+  pending = iter(misses)
+  outcomes: asyncio.Queue = asyncio.Queue()
+
+  async def worker() -> None:
+    for index, item in pending:
+      try:
+        async with admit(item):
+          result = await synthesize_async(settings, item)
+      except Exception as exc:
+        await outcomes.put((index, exc))
+        if return_exceptions:
+          continue
+        return
+      await outcomes.put((index, result))
+
+  tasks = [asyncio.create_task(worker()) for _ in range(min(len(misses), settings.synthesis_concurrency))]
+  try:
+    for _ in range(len(misses)):
+      index, result = await outcomes.get()
+      if isinstance(result, Exception) and not return_exceptions:
+        raise result
+      yield index, result
+  finally:
+    for task in tasks:
+      task.cancel()
+
+
+@dataclass
+class SynthesisStream:
+  filename: str
+  audio_url: str
+  chunks: Generator[bytes, None, None]
+  cached: bool
+  media_type: str
+
+
+def _voice_sample_rate(model_path: str) -> int:
+  try:
+    config = json.loads(Path(model_path + ".json").read_text())
+    return int(config["audio"]["sample_rate"])
+  except (OSError, ValueError, KeyError, TypeError):
+    return _STUB_FRAMERATE
+
+
+def _iter_file(file_path: Path) -> Iterator[bytes]:
+  with file_path.open("rb") as handle:
+    while True:
+      chunk = handle.read(64 * 1024)
+      if not chunk:
+        return
+      yield chunk
+
+
+def _iter_as_wav(file_path: Path) -> Iterator[bytes]:
+  if format_for_path(file_path) == "wav":
+    yield from _iter_file(file_path)
+  else:
+    yield to_format(file_path, "wav")
+
 
-  endpoint = settings.online_tts_base_url.rstrip("/") + "/tts/generate"
-  headers = {"Content-Type": "application/json"}
-  if settings.online_tts_api_key:
-    headers["Authorization"] = f"Bearer {settings.online_tts_api_key}"
+def _stub_pcm(framerate: int) -> Iterator[bytes]:
+  remaining = framerate // 2 * 2
+  while remaining > 0:
+    size = min(_STREAM_CHUNK_BYTES, remaining)
+    remaining -= size
+    yield bytes(size)
 
-  with httpx.Client(timeout=30) as client:
-    upstream = client.post(endpoint, json=payload.model_dump(exclude_none=True), headers=headers)
-  if upstream.status_code >= 400:
-    raise HTTPException(status_code=upstream.status_code, detail=upstream.text)
-  data = upstream.json()
-  return {"audio_url": data.get("audio_url"), "duration_ms": data.get("duration_ms")}
+
+def _piper_pcm(settings: Settings, payload: TTSRequest, model_path: str) -> Iterator[bytes]:
+  env = os.environ.copy()
+  env.update(_piper_env(payload))
+  process = subprocess.Popen(
+      [str(settings.piper_bin), "--model", model_path, "--output_raw"],
+      stdin=subprocess.PIPE,
+      stdout=subprocess.PIPE,
+      stderr=subprocess.DEVNULL,
+      env=env,
+  )
+  try:
+    process.stdin.write(payload.text.encode("utf-8"))
+    process.stdin.close()
+    while True:
+      chunk = process.stdout.read1(_STREAM_CHUNK_BYTES)
+      if not chunk:
+        break
+      yield chunk
+    if process.wait(timeout=settings.piper_timeout_seconds) != 0:
+      raise RuntimeError(f"piper exited with {process.returncode}")
+  finally:
+    if process.poll() is None:
+      process.kill()
+      process.wait()
+    process.stdout.close()
+
+
+def _stream_and_cache(settings: Settings, payload: TTSRequest, file_path: Path) -> Iterator[bytes]:
+  """Yields a WAV header then PCM as Piper produces it, teeing the bytes into the cache file."""
+  filename = file_path.name
+  future, leader = _inflight.claim(filename)
+  while not leader:
+    try:
+      future.result()
+      _record_cache_use(payload, filename)
+      yield from _iter_as_wav(file_path)
+      return
+    except SynthesisAborted:
+      future, leader = _inflight.claim(filename)
+
+  if file_path.exists():
+    _inflight.finish(filename, future, None)
+    _record_cache_use(payload, filename)
+    yield from _iter_as_wav(file_path)
+    return
+
+  piper_available = bool(settings.piper_bin and settings.piper_bin.exists())
+  if piper_available:
+    model_path = _voice_model_path(settings, payload.voice_id)
+    framerate = _voice_sample_rate(model_path)
+    pcm = _piper_pcm(settings, payload, model_path)
+  else:
+    framerate = _STUB_FRAMERATE
+    pcm = _stub_pcm(framerate)
+
+  tmp_path = _tmp_path(file_path).with_suffix(".wav")
+  data_bytes = 0
+  # Only time spent waiting on Piper counts, not time the client takes to drain each chunk.
+  synthesis_seconds = 0.0
+  try:
+    with tmp_path.open("wb") as cache_file:
+      cache_file.write(_wav_header(framerate, 0))
+      try:
+        started = time.perf_counter()
+        chunk = next(pcm)
+        synthesis_seconds += time.perf_counter() - started
+      except (StopIteration, RuntimeError, OSError) as exc:
+        # Nothing reached the client yet, so fall back to the regular file-based path.
+        LOGGER.warning("Streaming Piper produced no audio, falling back: %s", exc)
+        cache_file.close()
+        tmp_path.unlink(missing_ok=True)
+        duration_ms = _synthesize_missing(settings, payload, file_path)
+        _inflight.finish(filename, future, duration_ms)
+        _record_cache_use(payload, filename)
+        yield from _iter_as_wav(file_path)
+        return
+      yield _wav_header(framerate, _STREAMING_DATA_BYTES)
+      while chunk:
+        cache_file.write(chunk)
+        data_bytes += len(chunk)
+        yield chunk
+        started = time.perf_counter()
+        chunk = next(pcm, b"")
+        synthesis_seconds += time.perf_counter() - started
+      cache_file.seek(0)
+      cache_file.write(_wav_header(framerate, data_bytes))
+    _encode_into_cache(tmp_path, file_path)
+    _count_new_cache_file(file_path)
+  except BaseException:
+    # Includes GeneratorExit when the client disconnects; waiters retry rather than fail.
+    tmp_path.unlink(missing_ok=True)
+    if not future.done():
+      _inflight.finish(filename, future, error=SynthesisAborted("stream ended before synthesis completed"))
+    raise
+  finally:
+    pcm.close()
+  duration_ms = int(data_bytes / 2 / framerate * 1000) if framerate else None
+  get_synthesis_costs().record(payload.voice_id, len(payload.text), synthesis_seconds, duration_ms)
+  record_synthesis(payload.voice_id, synthesis_seconds, duration_ms)
+  _record_cache_use(payload, filename)
+  _inflight.finish(filename, future, duration_ms)
+
+
+def stream_synthesis(settings: Settings, payload: TTSRequest) -> SynthesisStream:
+  filename, file_path = _cache_location(settings, payload)
+  cached = file_path.exists()
+  get_usage_counters().record_lookup(cached)
+  if cached:
+    _record_cache_use(payload, filename)
+    chunks = _iter_file(file_path)
+  else:
+    chunks = _stream_and_cache(settings, payload, file_path)
+  audio_url = f"{settings.media_url_prefix}/{filename}"
+  media_type = AUDIO_MEDIA_TYPES[format_for_path(file_path)] if cached else AUDIO_MEDIA_TYPES["wav"]
+  return SynthesisStream(filename=filename, audio_url=audio_url, chunks=chunks, cached=cached, media_type=media_type)
 
 
 def delete_cache_file(settings: Settings, filename: str) -> bool:
   audio_index = get_audio_index()
   file_path = resolve_cache_path(settings, filename)
   if file_path.exists():
+    size = file_path.stat().st_size
     file_path.unlink()
+    get_usage_counters().cache_removed(size)
     audio_index.remove(filename)
+    get_cache_evictor().forget(filename)
     return True
   return False
 
@@ -167,9 +633,13 @@ def delete_cache_file(settings: Settings, filename: str) -> bool:
 def remove_cached_audio_for_book(settings: Settings, book_id: str) -> int:
   audio_index = get_audio_index()
   removed = 0
+  evictor = get_cache_evictor()
   for filename in audio_index.pop_files_for_book(book_id):
+    evictor.forget(filename)
     file_path = resolve_cache_path(settings, filename)
     if file_path.exists():
+      size = file_path.stat().st_size
       file_path.unlink()
+      get_usage_counters().cache_removed(size)
       removed += 1
   return removed
@@ -0,0 +1,177 @@
+"""Background voice pack downloads with per-voice deduplication and progress reporting."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Set
+
+from fastapi import HTTPException
+
+from .settings import Settings, get_settings
+from .voices import VoiceDownloadCancelled, download_voice_pack, is_voice_installed
+from .workers import BackgroundWorkers
+
+LOGGER = logging.getLogger(__name__)
+
+ACTIVE_STATES = ("queued", "running")
+# Transfer rate is measured over windows of at least this long so it does not jitter per read.
+_RATE_WINDOW_SECONDS = 0.5
+
+
+@dataclass
+class VoiceDownloadJob:
+  id: str
+  voice_id: str
+  state: str = "queued"
+  bytes_done: int = 0
+  bytes_total: Optional[int] = None
+  bytes_per_second: float = 0.0
+  error: Optional[str] = None
+  created_at: float = field(default_factory=time.time)
+  finished_at: Optional[float] = None
+  _rate_mark: Optional[tuple] = None
+
+  def as_dict(self) -> dict:
+    progress = None
+    eta_seconds = None
+    if self.state == "done":
+      progress = 1.0
+    elif self.bytes_total:
+      progress = round(min(1.0, self.bytes_done / self.bytes_total), 4)
+      if self.bytes_per_second > 0:
+        eta_seconds = round((self.bytes_total - self.bytes_done) / self.bytes_per_second, 1)
+    return {
+        "job_id": self.id,
+        "voice_id": self.voice_id,
+        "status": self.state,
+        "bytes_done": self.bytes_done,
+        "bytes_total": self.bytes_total,
+        "progress": progress,
+        "bytes_per_second": round(self.bytes_per_second, 1),
+        "eta_seconds": eta_seconds,
+        "error": self.error,
+    }
+
+
+class VoiceDownloadManager:
+  """Runs voice downloads on at most ``workers`` daemon threads, oldest request first.
+
+  A voice has at most one queued or running job, so repeated requests share it instead of racing
+  on the same ``.download`` file. Cancelling a queued job drops it; a running one stops at its
+  next network read and removes the partial file.
+  """
+
+  def __init__(
+      self,
+      settings: Settings,
+      download: Callable[..., dict] = download_voice_pack,
+      workers: int = 2,
+      max_jobs: int = 64,
+  ):
+    self.settings = settings
+    self.download = download
+    self.workers = max(1, workers)
+    self.max_jobs = max_jobs
+    self._jobs: "OrderedDict[str, VoiceDownloadJob]" = OrderedDict()
+    self._lock = threading.Lock()
+    self._workers = BackgroundWorkers("voice-download", self._lock, self._claim, self._process, limit=workers)
+    # Voices a worker is still writing, including cancelled jobs that have not reached a read yet.
+    self._busy: Set[str] = set()
+
+  def submit(self, voice_id: str) -> VoiceDownloadJob:
+    installed = is_voice_installed(self.settings, voice_id)
+    with self._lock:
+      for job in self._jobs.values():
+        if job.voice_id == voice_id and job.state in ACTIVE_STATES:
+          return job
+      job = VoiceDownloadJob(id=uuid.uuid4().hex, voice_id=voice_id)
+      if installed:
+        job.state, job.finished_at = "done", job.created_at
+      self._jobs[job.id] = job
+      self._trim()
+      if not installed:
+        self._workers.wake()
+    return job
+
+  def get(self, job_id: str) -> Optional[dict]:
+    with self._lock:
+      job = self._jobs.get(job_id)
+      return job.as_dict() if job else None
+
+  def cancel(self, job_id: str) -> Optional[dict]:
+    with self._lock:
+      job = self._jobs.get(job_id)
+      if job is None:
+        return None
+      if job.state in ACTIVE_STATES:
+        job.state, job.finished_at = "cancelled", time.time()
+      return job.as_dict()
+
+  def cancel_voice(self, voice_id: str) -> int:
+    with self._lock:
+      jobs = [job for job in self._jobs.values() if job.voice_id == voice_id and job.state in ACTIVE_STATES]
+      for job in jobs:
+        job.state, job.finished_at = "cancelled", time.time()
+      return len(jobs)
+
+  def active_by_voice(self) -> Dict[str, dict]:
+    with self._lock:
+      return {job.voice_id: job.as_dict() for job in self._jobs.values() if job.state in ACTIVE_STATES}
+
+  def _trim(self) -> None:
+    finished = [job_id for job_id, job in self._jobs.items() if job.state not in ACTIVE_STATES]
+    for job_id in finished[: max(0, len(self._jobs) - self.max_jobs)]:
+      del self._jobs[job_id]
+
+  def _claim(self) -> Optional[VoiceDownloadJob]:
+    for job in self._jobs.values():
+      if job.state == "queued" and job.voice_id not in self._busy:
+        job.state = "running"
+        self._busy.add(job.voice_id)
+        return job
+    return None
+
+  def _process(self, job: VoiceDownloadJob) -> None:
+    def on_progress(done: int, total: Optional[int]) -> None:
+      now = time.monotonic()
+      with self._lock:
+        if job.state == "cancelled":
+          raise VoiceDownloadCancelled(job.voice_id)
+        job.bytes_done, job.bytes_total = done, total
+        if job._rate_mark is None:
+          job._rate_mark = (now, done)
+        elif now - job._rate_mark[0] >= _RATE_WINDOW_SECONDS:
+          job.bytes_per_second = (done - job._rate_mark[1]) / (now - job._rate_mark[0])
+          job._rate_mark = (now, done)
+
+    state, error = "done", None
+    try:
+      self.download(self.settings, job.voice_id, on_progress=on_progress)
+    except VoiceDownloadCancelled:
+      state = "cancelled"
+    except HTTPException as exc:
+      state, error = "failed", str(exc.detail)
+    except Exception as exc:  # pragma: no cover - defensive
+      LOGGER.exception("voice download failed")
+      state, error = "failed", str(exc)
+    with self._lock:
+      # A cancel that lands after the last byte is too late: the voice is installed.
+      job.state = state
+      job.error = error
+      job.finished_at = time.time()
+      if state == "done" and job.bytes_total is not None:
+        job.bytes_done = job.bytes_total
+      # This thread claims again next, so a job that waited on this voice is picked up.
+      self._busy.discard(job.voice_id)
+
+
+@lru_cache(maxsize=1)
+def get_voice_downloads() -> VoiceDownloadManager:
+  settings = get_settings()
+  return VoiceDownloadManager(settings, workers=settings.voice_download_concurrency)
@@ -2,15 +2,21 @@
 
 from __future__ import annotations
 
+import hashlib
 import json
 import logging
+import os
+import re
+import threading
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 import httpx
 from fastapi import HTTPException, status
 
-from .settings import Settings
+from .settings import Settings, get_settings
+from .system import get_usage_counters
 
 LOGGER = logging.getLogger(__name__)
 
@@ -76,30 +82,148 @@ def _parse_manifest(raw: str) -> List[Dict[str, Any]]:
   return normalized
 
 
-def _load_manifest(settings: Settings) -> List[Dict[str, Any]]:
-  if settings.voice_manifest_path and settings.voice_manifest_path.exists():
+def _language_key(language: str) -> str:
+  # Manifests and callers mix 'en_US' and 'en-US'; both index and look up as 'en-us'.
+  return language.replace('_', '-').lower()
+
+
+class VoiceCatalog:
+  """Parsed voice manifest indexed by id and language, with the set of installed model files.
+
+  The manifest is re-read only when the file's mtime or size changes (and re-parsed only when its
+  SHA-1 changes too), so a busy ``/voices`` costs one ``stat`` instead of a parse. Installed
+  flags come from one scan of ``voice_dir``, updated in place by ``mark_installed`` and
+  ``mark_removed`` from the download and delete paths; the directory is rescanned only when its
+  mtime moves, which catches models copied in behind the service's back.
+  """
+
+  def __init__(self, settings: Settings):
+    self.settings = settings
+    self._lock = threading.Lock()
+    self._manifest_stamp: Optional[Tuple[int, int]] = None
+    self._manifest_hash: Optional[str] = None
+    self._entries: List[Dict[str, Any]] = []
+    self._by_id: Dict[str, Dict[str, Any]] = {}
+    self._by_language: Dict[str, List[Dict[str, Any]]] = {}
+    self._installed: Set[str] = set()
+    self._voice_dir_mtime: Optional[int] = None
+
+  def _read_source(self) -> Optional[str]:
+    path = self.settings.voice_manifest_path
+    if path:
+      try:
+        info = path.stat()
+      except FileNotFoundError:
+        info = None
+      except OSError:
+        LOGGER.warning('Unable to read voice manifest file %s', path)
+        info = None
+      if info is not None:
+        stamp = (info.st_mtime_ns, info.st_size)
+        if stamp == self._manifest_stamp:
+          return None
+        try:
+          raw = path.read_text()
+        except OSError:
+          LOGGER.warning('Unable to read voice manifest file %s', path)
+          raw = ''
+        self._manifest_stamp = stamp
+        return raw
+    self._manifest_stamp = None
+    return self.settings.voice_manifest_json or ''
+
+  def _refresh_manifest(self) -> None:
+    raw = self._read_source()
+    if raw is None:
+      return
+    digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    if digest == self._manifest_hash:
+      return
+    entries = _parse_manifest(raw) if raw else []
+    if not entries:
+      entries = [dict(item) for item in DEFAULT_VOICE_CATALOG]
+    by_language: Dict[str, List[Dict[str, Any]]] = {}
+    for entry in entries:
+      language = _language_key(str(entry.get('language') or 'und'))
+      keys = {language, language.split('-', 1)[0]}
+      for key in keys:
+        by_language.setdefault(key, []).append(entry)
+    self._entries = entries
+    self._by_id = {}
+    for entry in entries:
+      self._by_id.setdefault(entry['id'], entry)
+    self._by_language = by_language
+    self._manifest_hash = digest
+
+  def _refresh_installed(self) -> None:
+    voice_dir = self.settings.voice_dir
     try:
-      return _parse_manifest(settings.voice_manifest_path.read_text()) or [dict(item) for item in DEFAULT_VOICE_CATALOG]
+      mtime = voice_dir.stat().st_mtime_ns
     except OSError:
-      LOGGER.warning('Unable to read voice manifest file %s', settings.voice_manifest_path)
-  if settings.voice_manifest_json:
-    parsed = _parse_manifest(settings.voice_manifest_json)
-    if parsed:
-      return parsed
-  return [dict(item) for item in DEFAULT_VOICE_CATALOG]
+      self._installed, self._voice_dir_mtime = set(), None
+      return
+    if mtime == self._voice_dir_mtime:
+      return
+    with os.scandir(voice_dir) as scan:
+      self._installed = {item.name for item in scan if item.is_file()}
+    self._voice_dir_mtime = mtime
+
+  def _installed_flag(self, entry: Dict[str, Any]) -> bool:
+    filename = _voice_filename(entry)
+    if '/' in filename or os.sep in filename:
+      return (self.settings.voice_dir / filename).exists()
+    return filename in self._installed
+
+  def voices(self, language: Optional[str] = None) -> List[Tuple[Dict[str, Any], bool]]:
+    with self._lock:
+      self._refresh_manifest()
+      self._refresh_installed()
+      if language:
+        entries = self._by_language.get(_language_key(language), [])
+      else:
+        entries = self._entries
+      return [(entry, self._installed_flag(entry)) for entry in entries]
+
+  def get(self, voice_id: str) -> Tuple[Dict[str, Any], bool]:
+    with self._lock:
+      self._refresh_manifest()
+      entry = self._by_id.get(voice_id)
+      if entry is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='voice not found')
+      self._refresh_installed()
+      return entry, self._installed_flag(entry)
+
+  def mark_installed(self, filename: str) -> None:
+    with self._lock:
+      self._installed.add(filename)
+
+  def mark_removed(self, filename: str) -> None:
+    with self._lock:
+      self._installed.discard(filename)
+
+
+@lru_cache(maxsize=1)
+def get_voice_catalog() -> VoiceCatalog:
+  return VoiceCatalog(get_settings())
+
+
+def _catalog(settings: Settings) -> VoiceCatalog:
+  catalog = get_voice_catalog()
+  return catalog if catalog.settings is settings else VoiceCatalog(settings)
+
+
+def _voice_filename(entry: Dict[str, Any]) -> str:
+  return entry.get('filename') or f"{entry['id']}.onnx"
 
 
 def _voice_file_path(settings: Settings, entry: Dict[str, Any]) -> Path:
-  filename = entry.get('filename') or f"{entry['id']}.onnx"
-  return settings.voice_dir / filename
+  return settings.voice_dir / _voice_filename(entry)
 
 
-def list_voices(settings: Settings) -> List[Dict[str, Any]]:
-  catalog = _load_manifest(settings)
+def list_voices(settings: Settings, language: Optional[str] = None) -> List[Dict[str, Any]]:
   voices: List[Dict[str, Any]] = []
-  for entry in catalog:
+  for entry, installed in _catalog(settings).voices(language):
     voice_id = entry['id']
-    file_path = _voice_file_path(settings, entry)
     voices.append(
         {
             'id': voice_id,
@@ -108,12 +232,18 @@ def list_voices(settings: Settings) -> List[Dict[str, Any]]:
             'gender': entry.get('gender'),
             'sample_url': entry.get('sample_url'),
             'size_mb': entry.get('size_mb'),
-            'installed': file_path.exists(),
+            'installed': installed,
+            'status': 'installed' if installed else 'available',
         }
     )
   return voices
 
 
+def is_voice_installed(settings: Settings, voice_id: str) -> bool:
+  return _catalog(settings).get(voice_id)[1]
+
+
+
 def _resolve_download_url(settings: Settings, entry: Dict[str, Any]) -> str:
   url = entry.get('download_url')
   if not url:
@@ -132,13 +262,125 @@ def _resolve_download_url(settings: Settings, entry: Dict[str, Any]) -> str:
 
 
 def _get_entry(settings: Settings, voice_id: str) -> Dict[str, Any]:
-  for entry in _load_manifest(settings):
-    if entry.get('id') == voice_id:
-      return entry
-  raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='voice not found')
+  return _catalog(settings).get(voice_id)[0]
+
+
+class VoiceDownloadCancelled(Exception):
+  """Raised from a progress callback to abandon a download; the partial file is removed."""
+
+
+_DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+_DOWNLOAD_ATTEMPTS = 3
+_CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+|\*)')
+_UNSATISFIED_RANGE = re.compile(r'bytes \*/(\d+)')
+
+
+def _download_path(target: Path) -> Path:
+  if target.suffix:
+    return target.with_suffix(target.suffix + '.download')
+  return target.with_name(target.name + '.download')
 
 
-def download_voice_pack(settings: Settings, voice_id: str) -> Dict[str, Any]:
+def _validator_path(tmp_path: Path) -> Path:
+  return tmp_path.with_name(tmp_path.name + '.validator')
+
+
+def _discard_partial(tmp_path: Path) -> None:
+  tmp_path.unlink(missing_ok=True)
+  _validator_path(tmp_path).unlink(missing_ok=True)
+
+
+def _response_validator(response: httpx.Response) -> Optional[str]:
+  # If-Range only accepts a strong ETag or a date.
+  etag = response.headers.get('etag', '')
+  if etag and not etag.startswith('W/'):
+    return etag
+  return response.headers.get('last-modified') or None
+
+
+def _retryable_status(status_code: int) -> bool:
+  return status_code == 429 or status_code >= 500
+
+
+def _hash_partial(tmp_path: Path) -> Tuple[Any, int]:
+  digest = hashlib.sha256()
+  size = 0
+  if tmp_path.exists():
+    with tmp_path.open('rb') as handle:
+      for chunk in iter(lambda: handle.read(_DOWNLOAD_CHUNK_BYTES), b''):
+        digest.update(chunk)
+        size += len(chunk)
+  return digest, size
+
+
+ProgressCallback = Callable[[int, Optional[int]], None]
+
+
+def _fetch_to(client: httpx.Client, url: str, tmp_path: Path, on_progress: Optional[ProgressCallback] = None) -> Any:
+  """Streams ``url`` into ``tmp_path``, resuming from whatever a previous attempt left there.
+
+  Returns the SHA-256 of the whole file. Network errors propagate with the partial file kept,
+  so the next call continues with a ``Range`` request instead of starting over. The resume sends
+  the ETag or Last-Modified the partial was started with as ``If-Range``, so a file that changed
+  upstream comes back whole rather than spliced onto stale bytes.
+  """
+  digest, offset = _hash_partial(tmp_path)
+  headers = {}
+  if offset:
+    headers['Range'] = f'bytes={offset}-'
+    validator_path = _validator_path(tmp_path)
+    if validator_path.exists():
+      headers['If-Range'] = validator_path.read_text()
+  with client.stream('GET', url, headers=headers) as response:
+    if response.status_code != 416 or not offset:
+      if response.status_code >= 400:
+        raise HTTPException(status_code=response.status_code, detail='voice download failed')
+      return _write_body(response, tmp_path, digest, offset, on_progress)
+    match = _UNSATISFIED_RANGE.fullmatch(response.headers.get('content-range', ''))
+    if match and int(match.group(1)) == offset:
+      # Nothing left to send: the previous attempt already got every byte.
+      return digest
+  # The partial is longer than the file the server has now, so it belongs to another version.
+  _discard_partial(tmp_path)
+  return _fetch_to(client, url, tmp_path, on_progress)
+
+
+def _write_body(response: httpx.Response, tmp_path: Path, digest: Any, offset: int, on_progress: Optional[ProgressCallback]) -> Any:
+  total: Optional[int] = None
+  match = _CONTENT_RANGE.fullmatch(response.headers.get('content-range', ''))
+  tmp_path.parent.mkdir(parents=True, exist_ok=True)
+  if response.status_code == 206 and match and int(match.group(1)) == offset:
+    mode = 'ab'
+    total = int(match.group(3)) if match.group(3) != '*' else None
+  else:
+    # The server ignored the range, or the file changed since the partial was started.
+    digest, offset, mode = hashlib.sha256(), 0, 'wb'
+    length = response.headers.get('content-length')
+    total = int(length) if length and length.isdigit() else None
+    validator = _response_validator(response)
+    if validator:
+      _validator_path(tmp_path).write_text(validator)
+    else:
+      _validator_path(tmp_path).unlink(missing_ok=True)
+  with tmp_path.open(mode) as handle:
+    # Unsized iteration writes each network read straight through, so a dropped connection
+    # loses nothing that already arrived (a sized chunker would discard its partial buffer).
+    for chunk in response.iter_bytes():
+      handle.write(chunk)
+      digest.update(chunk)
+      offset += len(chunk)
+      if on_progress is not None:
+        on_progress(offset, total)
+  if total is not None and offset < total:
+    raise httpx.ReadError(f'connection closed after {offset} of {total} bytes')
+  return digest
+
+
+def download_voice_pack(
+    settings: Settings,
+    voice_id: str,
+    on_progress: Optional[ProgressCallback] = None,
+) -> Dict[str, Any]:
   entry = _get_entry(settings, voice_id)
   target = _voice_file_path(settings, entry)
   if target.exists():
@@ -146,27 +388,57 @@ def download_voice_pack(settings: Settings, voice_id: str) -> Dict[str, Any]:
   url = _resolve_download_url(settings, entry)
   if not url:
     raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='voice missing download url')
-  if target.suffix:
-    tmp_path = target.with_suffix(target.suffix + '.download')
-  else:
-    tmp_path = target.with_name(target.name + '.download')
+  tmp_path = _download_path(target)
+  expected_sha256 = (entry.get('sha256') or '').strip().lower()
   try:
-    with httpx.Client(timeout=settings.voice_download_timeout) as client:
-      response = client.get(url)
-    if response.status_code >= 400:
-      raise HTTPException(status_code=response.status_code, detail='voice download failed')
-    target.parent.mkdir(parents=True, exist_ok=True)
-    tmp_path.write_bytes(response.content)
+    with httpx.Client(timeout=settings.voice_download_timeout, follow_redirects=True) as client:
+      for attempt in range(1, _DOWNLOAD_ATTEMPTS + 1):
+        try:
+          digest = _fetch_to(client, url, tmp_path, on_progress)
+          break
+        except httpx.TransportError as exc:
+          if attempt == _DOWNLOAD_ATTEMPTS:
+            raise
+          LOGGER.info('Voice download interrupted (%s); resuming', exc)
+    if expected_sha256 and digest.hexdigest() != expected_sha256:
+      _discard_partial(tmp_path)
+      raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail='voice download failed checksum verification')
     tmp_path.replace(target)
-  except HTTPException:
-    tmp_path.unlink(missing_ok=True)
+    _validator_path(tmp_path).unlink(missing_ok=True)
+    get_usage_counters().model_added(target.stat().st_size)
+    _catalog(settings).mark_installed(target.name)
+  except HTTPException as exc:
+    # Throttling and server errors are worth retrying later, so their partial stays to resume.
+    if not _retryable_status(exc.status_code):
+      _discard_partial(tmp_path)
+    raise
+  except VoiceDownloadCancelled:
+    _discard_partial(tmp_path)
     raise
   except httpx.HTTPError as exc:  # pragma: no cover - network failure path
-    tmp_path.unlink(missing_ok=True)
-    LOGGER.warning('Voice download request failed: %%s', exc)
+    # The partial file stays so the next attempt resumes where this one stopped.
+    LOGGER.warning('Voice download request failed: %s', exc)
     raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail='voice download request failed') from exc
   except OSError as exc:  # pragma: no cover - filesystem error path
-    tmp_path.unlink(missing_ok=True)
-    LOGGER.warning('Voice file write failed: %%s', exc)
+    _discard_partial(tmp_path)
+    LOGGER.warning('Voice file write failed: %s', exc)
     raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail='unable to write voice file') from exc
   return {'status': 'ready', 'voice_id': voice_id, 'size_mb': entry.get('size_mb'), 'installed': True}
+
+
+def delete_voice_pack(settings: Settings, voice_id: str) -> Dict[str, Any]:
+  entry = _get_entry(settings, voice_id)
+  target = _voice_file_path(settings, entry)
+  try:
+    size = target.stat().st_size
+    target.unlink()
+  except FileNotFoundError:
+    size = None
+  except OSError as exc:  # pragma: no cover - filesystem error path
+    LOGGER.warning('Voice file delete failed: %s', exc)
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail='unable to delete voice file') from exc
+  _discard_partial(_download_path(target))
+  if size is not None:
+    get_usage_counters().model_removed(size)
+  _catalog(settings).mark_removed(target.name)
+  return {'status': 'available', 'voice_id': voice_id, 'size_mb': entry.get('size_mb'), 'installed': False}
@@ -0,0 +1,65 @@
+"""Daemon worker threads that start on demand and exit once idle."""
+
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Callable, Generic, List, Optional, TypeVar
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class BackgroundWorkers(Generic[T]):
+  """Up to ``limit`` daemon threads draining work that is claimed under a shared lock.
+
+  ``claim`` runs with the lock held and returns the next unit of work or ``None``; ``process``
+  runs without it. A thread gives up after ``idle_seconds`` without work (unless ``keep_alive``,
+  also called under the lock, says to keep waiting), but only after claiming once more and
+  leaving the thread list while still holding the lock. Work queued just as a thread times out
+  therefore either reaches that thread or finds it gone and starts a new one.
+  """
+
+  def __init__(
+      self,
+      name: str,
+      lock: threading.Lock,
+      claim: Callable[[], Optional[T]],
+      process: Callable[[T], None],
+      limit: int = 1,
+      idle_seconds: float = 60.0,
+      keep_alive: Optional[Callable[[], bool]] = None,
+  ):
+    self.name = name
+    self.limit = max(1, limit)
+    self.idle_seconds = idle_seconds
+    self._claim = claim
+    self._process = process
+    self._keep_alive = keep_alive
+    self._cond = threading.Condition(lock)
+    self._threads: List[threading.Thread] = []
+
+  def wake(self, count: int = 1) -> None:
+    """Starts up to ``count`` more threads within the limit and signals as many; hold the lock."""
+    for _ in range(min(count, self.limit - len(self._threads))):
+      thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+      self._threads.append(thread)
+      thread.start()
+    self._cond.notify(count)
+
+  def _run(self) -> None:
+    current = threading.current_thread()
+    while True:
+      with self._cond:
+        work = self._claim()
+        while work is None:
+          timed_out = not self._cond.wait(timeout=self.idle_seconds)
+          work = self._claim()
+          if work is None and timed_out and not (self._keep_alive and self._keep_alive()):
+            self._threads.remove(current)
+            return
+      try:
+        self._process(work)
+      except Exception:  # pragma: no cover - keep the worker alive on unexpected errors
+        LOGGER.exception("%s worker failed", self.name)
@@ -23,6 +23,18 @@ describe('voice providers', () => {
     expect(res.duration_ms).toBe(123)
   })
 
+  it('offline synthesizeBatch posts all chunks in one request', async () => {
+    const provider = new OfflineVoiceProvider({ configPromise: Promise.resolve({ OFFLINE_TTS_URL: 'http://localhost:8750' }) })
+    global.fetch.mockResolvedValue({
+      ok: true,
+      json: async () => ({ results: [{ audio_url: '/media/a.wav', duration_ms: 1 }, { audio_url: '/media/b.wav', duration_ms: 2 }] }),
+    })
+    const res = await provider.synthesizeBatch(['a', 'b'], { voiceId: 'en_US' })
+    expect(global.fetch).toHaveBeenCalledTimes(1)
+    expect(global.fetch.mock.calls[0][0]).toBe('http://localhost:8750/tts/batch')
+    expect(res.map((item) => item.audioUrl)).toEqual(['http://localhost:8750/media/a.wav', 'http://localhost:8750/media/b.wav'])
+  })
+
   it('online provider throws when base url not configured', async () => {
     const online = new OnlineVoiceProvider({ configPromise: Promise.resolve({ ONLINE_TTS_BASE_URL: '' }) })
     await expect(online.getBaseUrl()).rejects.toThrow()
@@ -20,6 +20,16 @@ describe('OfflineVoiceProvider', () => {
     expect(res.status).toBe('ready')
   })
 
+  it('polls a background download job until the voice is installed', async () => {
+    fetch
+      .mockResolvedValueOnce({ ok: true, json: () => Promise.resolve({ job_id: 'j1', status: 'running' }) })
+      .mockResolvedValueOnce({ ok: true, json: () => Promise.resolve({ job_id: 'j1', status: 'done' }) })
+    const p = new OfflineVoiceProvider({ configPromise: Promise.resolve({ OFFLINE_TTS_URL: 'http://localhost:8750' }) })
+    const res = await p.downloadVoice('en_US')
+    expect(res.status).toBe('done')
+    expect(fetch).toHaveBeenLastCalledWith('http://localhost:8750/voices/download/j1')
+  })
+
   it('synthesizes text and returns absolute url', async () => {
     fetch.mockResolvedValueOnce({ ok: true, json: () => Promise.resolve({ audio_url: '/media/a.wav', duration_ms: 123 }) })
     const p = new OfflineVoiceProvider({ configPromise: Promise.resolve({ OFFLINE_TTS_URL: 'http://localhost:8750' }) })
@@ -8,12 +8,19 @@ export const DEFAULT_VOICES = [
   { id: 'zh_CN_female', name: '中文（女声）· Mandarin', locale: 'zh-CN', installed: true },
 ];
 
+const DOWNLOAD_POLL_MS = 500;
+
 function normalizeBaseUrl(value, fallback) {
   const base = value || fallback;
   if (!base) return '';
   return base.endsWith('/') ? base.slice(0, -1) : base;
 }
 
+function absoluteAudioUrl(base, audioUrl) {
+  if (/^https?:/i.test(audioUrl)) return audioUrl;
+  return `${base}${audioUrl?.startsWith('/') ? '' : '/'}${audioUrl}`;
+}
+
 export class VoiceProvider {
   constructor(id, label, { configPromise, telemetry } = {}) {
     this.id = id;
@@ -89,7 +96,18 @@ export class OfflineVoiceProvider extends VoiceProvider {
     if (!response.ok) {
       throw new Error(`download failed with ${response.status}`);
     }
-    return response.json().catch(() => ({ status: 'ok' }));
+    let job = await response.json().catch(() => ({ status: 'ok' }));
+    // Downloads run as background jobs; poll until the voice is installed.
+    while (job?.job_id && (job.status === 'queued' || job.status === 'running')) {
+      await new Promise((resolve) => setTimeout(resolve, DOWNLOAD_POLL_MS));
+      const poll = await fetch(`${base}/voices/download/${job.job_id}`);
+      if (!poll.ok) throw new Error(`download status failed with ${poll.status}`);
+      job = await poll.json();
+    }
+    if (job?.status === 'failed' || job?.status === 'cancelled') {
+      throw new Error(`download ${job.status}${job.error ? `: ${job.error}` : ''}`);
+    }
+    return job;
   }
 
   async synthesize(text, { voiceId, rate, pitch, bookId } = {}) {
@@ -104,10 +122,26 @@ export class OfflineVoiceProvider extends VoiceProvider {
       throw new Error(`Offline TTS failed with ${response.status}`);
     }
     const payload = await response.json();
-    const audioUrl = /^https?:/i.test(payload.audio_url)
-      ? payload.audio_url
-      : `${base}${payload.audio_url?.startsWith('/') ? '' : '/'}${payload.audio_url}`;
-    return { audioUrl, duration_ms: payload.duration_ms };
+    return { audioUrl: absoluteAudioUrl(base, payload.audio_url), duration_ms: payload.duration_ms };
+  }
+
+  async synthesizeBatch(texts, { voiceId, rate, pitch, bookId } = {}) {
+    const base = await this.getBaseUrl();
+    if (!base) throw new Error('offline provider unavailable');
+    const items = texts.map((text) => ({ text, voice_id: voiceId, rate, pitch, book_id: bookId }));
+    const response = await fetch(`${base}/tts/batch`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ items }),
+    });
+    if (!response.ok) {
+      throw new Error(`Offline TTS batch failed with ${response.status}`);
+    }
+    const payload = await response.json();
+    return (payload.results || []).map((item) => ({
+      audioUrl: absoluteAudioUrl(base, item.audio_url),
+      duration_ms: item.duration_ms,
+    }));
   }
 }
 
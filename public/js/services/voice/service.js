@@ -71,16 +71,27 @@ export class VoiceService {
     const limit = options.maxCharacters || DEFAULT_MAX_CHARS;
     const chunks = chunkText(text, limit);
     const responses = [];
-    for (const chunk of chunks) {
-      const payload = await provider.synthesize(chunk, options);
-      responses.push(payload);
+    if (chunks.length > 1 && typeof provider.synthesizeBatch === 'function') {
+      try {
+        responses.push(...(await provider.synthesizeBatch(chunks, options)));
+      } catch (err) {
+        console.warn('batch synthesis unavailable, falling back to per-chunk requests', err);
+      }
+    }
+    if (responses.length !== chunks.length) {
+      responses.length = 0;
+      for (const chunk of chunks) {
+        responses.push(await provider.synthesize(chunk, options));
+      }
+    }
+    chunks.forEach((chunk, index) => {
       this.telemetry.recordSynth({
         provider: provider.id,
         characters: chunk.length,
-        durationMs: payload.duration_ms,
+        durationMs: responses[index].duration_ms,
         bookId: options.bookId,
       });
-    }
+    });
     return responses;
   }
 }